@@ -1,10 +1,32 @@
+import numpy as np
 import pandas as pd
 
+# Model inputs, in order. All but amount come from the feature store
+# (app/services/feature_service.py) and default to 0 when unknown.
+FEATURE_COLUMNS = [
+    "amount",
+    "log_amount",
+    "vendor_frequency",
+    "vendor_amount_zscore",
+    "vendor_rejection_rate",
+    "project_spend_velocity",
+    "project_budget_utilization",
+    "amount_to_budget",
+]
+
 
 def build_feature_matrix(df: pd.DataFrame):
     """
-    Example preprocessor for ML model.
-    Expect columns: amount, project_id, vendor_frequency, etc.
+    Preprocessor for the risk model.
+    Expect columns: amount, plus the feature-store columns of FEATURE_COLUMNS
+    (vendor_frequency, per-project spend, ...); missing ones are filled with 0.
     """
-    features = df[["amount"]].copy()
+    features = pd.DataFrame(index=df.index)
+    for column in FEATURE_COLUMNS:
+        if column == "log_amount":
+            features[column] = np.log1p(df["amount"].astype(float).clip(lower=0))
+        elif column in df:
+            features[column] = df[column].astype(float).fillna(0)
+        else:
+            features[column] = 0.0
     return features
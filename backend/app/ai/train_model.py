@@ -1,28 +1,219 @@
+"""
+Train the invoice risk model (IsolationForest) on the invoice history
+Run this with: python -m app.ai.train_model [--chunk-size 20000] [--max-samples 200000]
+
+Invoices are streamed from the database in id order, a chunk at a time. Admin decisions
+are the (weak) labels: approved => normal, rejected/flagged => suspicious. Each invoice
+is hashed into the training or the held-out set, and both are kept as fixed-size uniform
+samples (reservoir sampling), so memory stays bounded however many years of invoices
+there are. The fitted model is saved as a versioned artifact with a JSON metadata file,
+then published to MODEL_PATH, where ai_service picks it up.
+"""
+import argparse
+from datetime import datetime
+import json
+import time
+
 import joblib
+import numpy as np
 import pandas as pd
+import sklearn
 from sklearn.ensemble import IsolationForest
-from pathlib import Path
+from sklearn.metrics import average_precision_score, roc_auc_score
+
+from app.ai.preprocess import FEATURE_COLUMNS, build_feature_matrix
+from app.config.database import SessionLocal
+from app.models.invoice_model import Invoice
+from app.services.ai_service import MODEL_PATH, decision_to_risk
+from app.services.feature_service import get_invoice_features
+
+# Every trained version is kept here: risk-model-<version>.pkl and .json
+MODEL_DIR = MODEL_PATH.parent / "models"
+
+# Invoice statuses used as labels (1 = suspicious); pending invoices are not used
+LABELS = {"approved": 0, "rejected": 1, "flagged": 1}
+
+# Rows fetched and featurized per round trip
+DEFAULT_CHUNK_SIZE = 20000
+# Most invoices kept for fitting; the held-out set keeps HOLDOUT_FRACTION of this
+DEFAULT_MAX_SAMPLES = 200000
+HOLDOUT_FRACTION = 0.2
+# Refuse to publish a model fitted on less history than this
+MIN_TRAINING_ROWS = 50
+
+N_ESTIMATORS = 200
+# Share of suspicious invoices assumed when fitting, clipped to this range
+CONTAMINATION_RANGE = (0.01, 0.3)
+RANDOM_STATE = 42
+
+
+class Reservoir:
+    """Uniform sample of at most `size` feature rows out of a stream of unknown length"""
+
+    def __init__(self, size: int, seed: int):
+        self.size = size
+        self.seen = 0
+        self.X = np.empty((size, len(FEATURE_COLUMNS)), dtype=np.float32)
+        self.y = np.empty(size, dtype=np.int8)
+        self.rng = np.random.default_rng(seed)
+
+    def add(self, X: np.ndarray, y: np.ndarray):
+        # Fill the free slots first, then each later row i replaces slot j ~ U[0, i]
+        # when j lands inside the reservoir (Algorithm R, vectorized per chunk)
+        free = min(self.size - min(self.seen, self.size), len(X))
+        if free:
+            self.X[self.seen:self.seen + free] = X[:free]
+            self.y[self.seen:self.seen + free] = y[:free]
+        rest = len(X) - free
+        if rest:
+            positions = np.arange(self.seen + free, self.seen + len(X))
+            slots = (self.rng.random(rest) * (positions + 1)).astype(np.int64)
+            keep = slots < self.size
+            self.X[slots[keep]] = X[free:][keep]
+            self.y[slots[keep]] = y[free:][keep]
+        self.seen += len(X)
+
+    def sample(self) -> tuple[np.ndarray, np.ndarray]:
+        count = min(self.seen, self.size)
+        return self.X[:count], self.y[:count]
+
+
+def _is_holdout(ids: np.ndarray) -> np.ndarray:
+    """Deterministic split by invoice id, so retraining never leaks test rows into training"""
+    hashed = ids.astype(np.uint64) * np.uint64(2654435761) % np.uint64(2**32)
+    return hashed / 2**32 < HOLDOUT_FRACTION
 
-from app.ai.preprocess import build_feature_matrix
 
-MODEL_PATH = Path("app/ai/model.pkl")
+def stream_labelled_history(db, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """Yield (invoice ids, feature DataFrame, labels) per chunk of labelled invoices"""
+    last_id = 0
+    while True:
+        rows = db.query(
+            Invoice.id, Invoice.project_id, Invoice.vendor_name, Invoice.amount, Invoice.status
+        ).filter(
+            Invoice.status.in_(list(LABELS)), Invoice.id > last_id
+        ).order_by(Invoice.id).limit(chunk_size).all()
+        if not rows:
+            return
 
+        invoices = [
+            {"amount": float(row.amount), "project_id": row.project_id, "vendor_name": row.vendor_name, "status": row.status}
+            for row in rows
+        ]
+        features = get_invoice_features(db, invoices, stored=True)
+        df = pd.DataFrame([{**invoice, **extra} for invoice, extra in zip(invoices, features)])
 
-def train():
-    # TODO: Replace with real training data
-    data = {
-        "amount": [10000, 15000, 12000, 900000, 17500, 11000, 2000000],
+        yield (
+            np.array([row.id for row in rows], dtype=np.int64),
+            build_feature_matrix(df),
+            df["status"].map(LABELS).to_numpy(dtype=np.int8),
+        )
+        last_id = rows[-1].id
+        # Chunks are read-only: drop the identity map so it doesn't grow with the history
+        db.expunge_all()
+
+
+def evaluate(model, X: np.ndarray, y: np.ndarray) -> dict:
+    """Held-out metrics of the served 0-100 risk score against the admin labels"""
+    if not len(y):
+        return {"rows": 0}
+
+    risk = decision_to_risk(model.decision_function(pd.DataFrame(X, columns=FEATURE_COLUMNS)))
+    predicted = risk >= 50
+    suspicious = y == 1
+    true_positives = int(np.sum(predicted & suspicious))
+    metrics = {
+        "rows": int(len(y)),
+        "suspicious": int(suspicious.sum()),
+        "precision_at_50": true_positives / int(predicted.sum()) if predicted.any() else None,
+        "recall_at_50": true_positives / int(suspicious.sum()) if suspicious.any() else None,
+        "roc_auc": None,
+        "average_precision": None,
+    }
+    # Ranking metrics need both classes in the held-out set
+    if 0 < suspicious.sum() < len(y):
+        metrics["roc_auc"] = float(roc_auc_score(y, risk))
+        metrics["average_precision"] = float(average_precision_score(y, risk))
+    return metrics
+
+
+def _publish(model, metadata: dict):
+    """Write the versioned artifact, then swap it into MODEL_PATH atomically"""
+    MODEL_DIR.mkdir(parents=True, exist_ok=True)
+    artifact = MODEL_DIR / f"risk-model-{metadata['version']}.pkl"
+    joblib.dump(model, artifact)
+    artifact.with_suffix(".json").write_text(json.dumps(metadata, indent=2))
+
+    # ai_service reloads on mtime: never let it see a half-written file
+    tmp = MODEL_PATH.with_suffix(".pkl.tmp")
+    joblib.dump(model, tmp)
+    tmp.replace(MODEL_PATH)
+    MODEL_PATH.with_suffix(".json").write_text(json.dumps(metadata, indent=2))
+    return artifact
+
+
+def train(chunk_size: int = DEFAULT_CHUNK_SIZE, max_samples: int = DEFAULT_MAX_SAMPLES, n_jobs: int = -1) -> dict:
+    """Fit the risk model on the labelled invoice history; returns the saved model's metadata"""
+    started = time.monotonic()
+    training = Reservoir(max_samples, RANDOM_STATE)
+    holdout = Reservoir(max(int(max_samples * HOLDOUT_FRACTION), 1), RANDOM_STATE + 1)
+
+    db = SessionLocal()
+    try:
+        for ids, X, y in stream_labelled_history(db, chunk_size):
+            X = X.to_numpy(dtype=np.float32)
+            test = _is_holdout(ids)
+            training.add(X[~test], y[~test])
+            holdout.add(X[test], y[test])
+    finally:
+        db.close()
+
+    X_train, y_train = training.sample()
+    if len(y_train) < MIN_TRAINING_ROWS:
+        raise ValueError(
+            f"Only {len(y_train)} labelled invoices to train on (need {MIN_TRAINING_ROWS}): "
+            "approve or reject more invoices first"
+        )
+
+    suspicious_rate = float(y_train.mean())
+    contamination = float(np.clip(suspicious_rate, *CONTAMINATION_RANGE))
+    model = IsolationForest(
+        n_estimators=N_ESTIMATORS,
+        contamination=contamination,
+        random_state=RANDOM_STATE,
+        n_jobs=n_jobs,
+    )
+    model.fit(pd.DataFrame(X_train, columns=FEATURE_COLUMNS))
+
+    trained_at = datetime.utcnow()
+    metadata = {
+        "version": f"{trained_at:%Y%m%d-%H%M%S}",
+        "trained_at": trained_at.isoformat(),
+        "sklearn_version": sklearn.__version__,
+        "feature_columns": FEATURE_COLUMNS,
+        "labels": LABELS,
+        "params": {"n_estimators": N_ESTIMATORS, "contamination": contamination, "random_state": RANDOM_STATE},
+        "rows_streamed": training.seen + holdout.seen,
+        "training_rows": int(len(y_train)),
+        "training_suspicious_rate": suspicious_rate,
+        "evaluation": evaluate(model, *holdout.sample()),
+        "duration_seconds": round(time.monotonic() - started, 1),
     }
-    df = pd.DataFrame(data)
-    X = build_feature_matrix(df)
+    artifact = _publish(model, metadata)
+    print(f"Model {metadata['version']} saved to {artifact} and published to {MODEL_PATH}")
+    return metadata
+
 
-    model = IsolationForest(contamination=0.1, random_state=42)
-    model.fit(X)
+def main():
+    parser = argparse.ArgumentParser(description="Train the invoice risk model from the invoice history")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--max-samples", type=int, default=DEFAULT_MAX_SAMPLES, help="most invoices kept for fitting")
+    parser.add_argument("--n-jobs", type=int, default=-1, help="parallel jobs (-1 = all cores)")
+    args = parser.parse_args()
 
-    MODEL_PATH.parent.mkdir(parents=True, exist_ok=True)
-    joblib.dump(model, MODEL_PATH)
-    print(f"Model saved to {MODEL_PATH}")
+    metadata = train(args.chunk_size, args.max_samples, args.n_jobs)
+    print(json.dumps(metadata["evaluation"], indent=2))
 
 
 if __name__ == "__main__":
-    train()
+    main()
@@ -1,16 +1,217 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+import threading
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
 from app.config.settings import settings
 
-engine = create_engine(settings.DATABASE_URL, echo=False, future=True)
+
+def _engine_options(url: str) -> dict:
+    """create_engine() options for the backend in `url`"""
+    url = make_url(url)
+    if url.get_backend_name() == "sqlite":
+        return {
+            # Sessions move between the event loop and threadpool threads
+            "connect_args": {"check_same_thread": False, "timeout": settings.DB_SQLITE_BUSY_TIMEOUT_MS / 1000},
+            "pool_size": settings.DB_POOL_SIZE,
+            "max_overflow": settings.DB_MAX_OVERFLOW,
+            "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+        } if url.database not in (None, "", ":memory:") else {"connect_args": {"check_same_thread": False}}
+
+    connect_args = {}
+    if url.get_backend_name() == "postgresql":
+        connect_args["connect_timeout"] = settings.DB_CONNECT_TIMEOUT_SECONDS
+    return {
+        "connect_args": connect_args,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+        # Drop connections the server or a proxy may have closed while idle
+        "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+        "pool_pre_ping": True,
+        # Reuse the most recent connection so surplus ones idle out and get recycled
+        "pool_use_lifo": True,
+    }
+
+
+# Async drivers for each sync backend
+ASYNC_DRIVERS = {"sqlite": "aiosqlite", "postgresql": "asyncpg"}
+
+
+def _async_engine_args(url: str) -> tuple:
+    """(URL, create_async_engine() options): the sync profile translated to the async driver"""
+    url = make_url(url)
+    options = _engine_options(url)
+    backend = url.get_backend_name()
+    async_url = url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}")
+
+    if backend == "sqlite":
+        # aiosqlite runs each connection on its own thread already
+        options["connect_args"] = {"timeout": settings.DB_SQLITE_BUSY_TIMEOUT_MS / 1000}
+    elif backend == "postgresql":
+        connect_args = {"timeout": settings.DB_CONNECT_TIMEOUT_SECONDS}
+        # asyncpg takes libpq's sslmode as its `ssl` argument
+        if "sslmode" in async_url.query:
+            connect_args["ssl"] = async_url.query["sslmode"]
+            async_url = async_url.difference_update_query(["sslmode"])
+        options["connect_args"] = connect_args
+    return async_url, options
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    # WAL lets readers run while a write is in progress; NORMAL is durable in WAL mode
+    # except for the last transactions on power loss
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.close()
+
+
+# ------------------------------
+# Statement timeout for request sessions only (the get_*db dependencies): exports,
+# re-scoring, background jobs and migrations open their own sessions and run unbounded
+# ------------------------------
+REQUEST_SESSION = {"statement_timeout": True}
+
+
+@event.listens_for(Session, "after_begin")
+def _set_statement_timeout(session, transaction, connection):
+    if (
+        session.info.get("statement_timeout")
+        and settings.DB_STATEMENT_TIMEOUT_MS
+        and connection.dialect.name == "postgresql"
+    ):
+        # SET LOCAL ends with the transaction, so pooled connections come back unbounded
+        connection.exec_driver_sql(f"SET LOCAL statement_timeout = {int(settings.DB_STATEMENT_TIMEOUT_MS)}")
+
+
+# ------------------------------
+# Pool metrics (see get_pool_stats)
+# ------------------------------
+_pool_counters = {}
+_pool_counters_lock = threading.Lock()
+
+
+def _track_pool(engine, name: str):
+    counters = _pool_counters[name] = {
+        "connects": 0, "checkouts": 0, "invalidations": 0, "peak_checked_out": 0,
+    }
+
+    def bump(key: str):
+        with _pool_counters_lock:
+            counters[key] += 1
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        bump("connects")
+
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        bump("checkouts")
+        checked_out = engine.pool.checkedout() if hasattr(engine.pool, "checkedout") else 0
+        with _pool_counters_lock:
+            counters["peak_checked_out"] = max(counters["peak_checked_out"], checked_out)
+
+    @event.listens_for(engine, "invalidate")
+    def _on_invalidate(dbapi_connection, connection_record, exception):
+        bump("invalidations")
+
+
+def _create_engine(url: str, name: str):
+    engine = create_engine(url, echo=False, future=True, **_engine_options(url))
+    if engine.dialect.name == "sqlite":
+        event.listen(engine, "connect", _set_sqlite_pragmas)
+    _track_pool(engine, name)
+    return engine
+
+
+def _create_async_engine(url: str, name: str):
+    async_url, options = _async_engine_args(url)
+    engine = create_async_engine(async_url, echo=False, **options)
+    # Pool and connect events live on the sync engine the async one wraps
+    if engine.dialect.name == "sqlite":
+        event.listen(engine.sync_engine, "connect", _set_sqlite_pragmas)
+    _track_pool(engine.sync_engine, name)
+    return engine
+
+
+engine = _create_engine(settings.DATABASE_URL, "primary")
+# Optional read replica for list/dashboard reads; the primary when none is configured
+read_engine = (
+    _create_engine(settings.DATABASE_REPLICA_URL, "replica")
+    if settings.DATABASE_REPLICA_URL else engine
+)
+
+# Async engines for the read-heavy endpoints, so they don't hold threadpool threads
+async_engine = _create_async_engine(settings.DATABASE_URL, "async_primary")
+async_read_engine = (
+    _create_async_engine(settings.DATABASE_REPLICA_URL, "async_replica")
+    if settings.DATABASE_REPLICA_URL else async_engine
+)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+# expire_on_commit=False: attributes of returned objects must never lazy-load (no implicit IO)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+AsyncReadSessionLocal = async_sessionmaker(async_read_engine, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
 
 def get_db():
-    db = SessionLocal()
+    db = SessionLocal(info=dict(REQUEST_SESSION))
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def get_read_db():
+    """
+    Session for read-only endpoints, on the read replica when one is configured.
+    Replicas lag slightly: use get_db to read back something the client just wrote.
+    """
+    db = ReadSessionLocal(info=dict(REQUEST_SESSION))
     try:
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal(info=dict(REQUEST_SESSION)) as db:
+        yield db
+
+
+async def get_async_read_db():
+    """Async get_read_db: the read replica when one is configured"""
+    async with AsyncReadSessionLocal(info=dict(REQUEST_SESSION)) as db:
+        yield db
+
+
+async def dispose_async_engines():
+    await async_engine.dispose()
+    if async_read_engine is not async_engine:
+        await async_read_engine.dispose()
+
+
+def get_pool_stats() -> dict:
+    """Current pool occupancy plus lifetime counters, per engine"""
+    engines = {"primary": engine, "async_primary": async_engine.sync_engine}
+    if read_engine is not engine:
+        engines["replica"] = read_engine
+        engines["async_replica"] = async_read_engine.sync_engine
+
+    stats = {}
+    for name, pool_engine in engines.items():
+        pool = pool_engine.pool
+        with _pool_counters_lock:
+            stats[name] = {
+                "pool": type(pool).__name__,
+                "size": pool.size() if hasattr(pool, "size") else None,
+                "checked_out": pool.checkedout() if hasattr(pool, "checkedout") else None,
+                "idle": pool.checkedin() if hasattr(pool, "checkedin") else None,
+                "overflow": max(pool.overflow(), 0) if hasattr(pool, "overflow") else None,
+                **_pool_counters[name],
+            }
+    return stats
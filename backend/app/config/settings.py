@@ -3,10 +3,89 @@ from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
     DATABASE_URL: str
+    # Optional read replica for the list/dashboard GET endpoints
+    DATABASE_REPLICA_URL: str | None = None
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60
 
+    # Connection pool per engine: kept connections, extra ones under load, wait for a
+    # free one; PostgreSQL only: connection age limit, connect timeout and the statement
+    # timeout of request sessions (exports, re-scoring and migrations are exempt; 0 = none)
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT_SECONDS: int = 30
+    DB_POOL_RECYCLE_SECONDS: int = 1800
+    DB_CONNECT_TIMEOUT_SECONDS: int = 10
+    DB_STATEMENT_TIMEOUT_MS: int = 30000
+    # SQLite: how long a writer waits on a locked database before failing
+    DB_SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    # Apply pending schema migrations when the API starts; turn off to run
+    # `python migrate.py` as a separate deploy step instead
+    AUTO_MIGRATE: bool = True
+
+    # Users behind valid tokens are cached per process; role/email changes and token
+    # revocations made by other workers apply within these delays
+    AUTH_USER_CACHE_SIZE: int = 2048
+    AUTH_USER_CACHE_TTL_SECONDS: int = 60
+    AUTH_REVOCATION_REFRESH_SECONDS: int = 5
+
+    # Password hashing: bcrypt cost (hashes with another cost are upgraded on login),
+    # threads, max running + queued hashes overall / per client IP / per email,
+    # 429 Retry-After
+    PASSWORD_BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_PENDING: int = 64
+    PASSWORD_HASH_MAX_PER_IP: int = 16
+    PASSWORD_HASH_MAX_PER_EMAIL: int = 2
+    PASSWORD_HASH_RETRY_AFTER_SECONDS: int = 2
+
+    # Largest accepted invoice upload, and largest POST /invoices/batch request (all files)
+    MAX_UPLOAD_BYTES: int = 25 * 1024 * 1024
+    MAX_BATCH_UPLOAD_BYTES: int = 1024 * 1024 * 1024
+
+    # OCR backend: "auto" (in-process tesserocr when installed), "tesserocr" or "pytesseract"
+    OCR_BACKEND: str = "auto"
+    OCR_LANGUAGES: str = "eng"
+
+    # Page normalization before OCR (A4 at 300 DPI is 2480 px wide)
+    OCR_TARGET_WIDTH: int = 2480
+    OCR_MAX_DESKEW_DEGREES: float = 10.0
+
+    # PDF invoices: raster DPI, OCR threads per document, pages considered
+    OCR_PDF_DPI: int = 200
+    OCR_PDF_PAGE_WORKERS: int = 4
+    OCR_PDF_MAX_PAGES: int = 20
+
+    # Near-duplicate images: max differing bits of the 256-bit perceptual hash.
+    # Keep it tight: invoices printed from one template differ in only a few bits
+    IMAGE_HASH_MAX_DISTANCE: int = 8
+
+    # Fraud summary cache: rebuilt on invoice writes, and at least this often
+    # to pick up writes from other workers
+    FRAUD_SUMMARY_TTL_SECONDS: int = 30
+
+    # Ingestion job owners heartbeat this often; jobs whose owner has been silent for
+    # INGESTION_STALE_JOB_MINUTES are failed (the worker died or restarted)
+    INGESTION_HEARTBEAT_SECONDS: int = 30
+    INGESTION_STALE_JOB_MINUTES: int = 5
+
+    # Most invoices accepted by one POST /invoices/batch, and processed at once per batch
+    BATCH_MAX_ITEMS: int = 500
+    BATCH_MAX_IN_FLIGHT: int = 4
+
+    # OCR worker pool: processes, max running + queued interactive jobs, 429 Retry-After
+    OCR_WORKERS: int = 2
+    OCR_MAX_PENDING: int = 8
+    OCR_RETRY_AFTER_SECONDS: int = 10
+    # Running + queued jobs of async uploads and batches, which wait rather than get a 429;
+    # below OCR_WORKERS so a worker is always left for interactive uploads
+    OCR_BACKGROUND_MAX_PENDING: int = 1
+
+    # OCR result cache keyed by file hash (0 disables it)
+    OCR_CACHE_PATH: str = "uploads/ocr_cache.db"
+    OCR_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+
     class Config:
         env_file = ".env"
 
@@ -0,0 +1 @@
+# Versioned schema migrations (see runner.py; run with: python migrate.py)
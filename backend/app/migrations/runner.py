@@ -0,0 +1,204 @@
+"""
+Versioned schema migrations for SQLite and PostgreSQL.
+
+Each module in app/migrations/versions (mNNNN_<name>.py) is one migration: its docstring
+describes it and upgrade(op) applies it. Applied versions are recorded in
+schema_migrations, so every migration runs once per database. Migrations with
+CONCURRENT = True build indexes and run outside a transaction, which lets PostgreSQL
+use CREATE INDEX CONCURRENTLY without locking writes; the others run in a transaction.
+Steps are written to be safe to re-run (a migration interrupted halfway is retried).
+Runners are serialized (a PostgreSQL advisory lock, a lock file next to a SQLite
+database), so several workers starting at once migrate only once, and migrations run
+with no statement timeout: long index builds and backfills are expected here.
+Work that scales with stored files rather than rows belongs in an offline command.
+"""
+from contextlib import contextmanager
+import importlib
+import os
+import pkgutil
+import time
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, MetaData, String, Table, inspect, select, text
+from sqlalchemy.engine import Connection, Engine
+
+from app.config.database import engine as default_engine
+from app.migrations import versions
+
+# Arbitrary key for the PostgreSQL advisory lock that serializes concurrent runners
+ADVISORY_LOCK_KEY = 7302514
+# Lock file next to a SQLite database, for the same purpose
+SQLITE_LOCK_SUFFIX = ".migrate.lock"
+
+_metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations",
+    _metadata,
+    Column("version", String, primary_key=True),
+    Column("description", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+class MigrationOps:
+    """What upgrade(op) works with: the connection plus idempotent DDL helpers"""
+
+    def __init__(self, connection: Connection, concurrent: bool = False):
+        self.connection = connection
+        self.dialect = connection.dialect.name
+        self.concurrent = concurrent and self.dialect == "postgresql"
+
+    def execute(self, sql: str, params: dict = None):
+        return self.connection.execute(text(sql), params or {})
+
+    def has_table(self, table: str) -> bool:
+        return inspect(self.connection).has_table(table)
+
+    def has_column(self, table: str, column: str) -> bool:
+        return any(existing["name"] == column for existing in inspect(self.connection).get_columns(table))
+
+    def add_column(self, table: str, column: Column):
+        """ALTER TABLE ... ADD COLUMN unless the column exists (SQLite has no IF NOT EXISTS here)"""
+        if self.has_column(table, column.name):
+            return
+        sql = f"ALTER TABLE {table} ADD COLUMN {column.name} {column.type.compile(dialect=self.connection.dialect)}"
+        if column.server_default is not None:
+            sql += f" DEFAULT {column.server_default.arg}"
+        self.execute(sql)
+        print(f"  ✓ Added column: {table}.{column.name}")
+
+    def create_index(self, name: str, table: str, columns: list[str]):
+        """CREATE INDEX IF NOT EXISTS, concurrently on PostgreSQL in CONCURRENT migrations"""
+        if self.concurrent:
+            # A failed concurrent build leaves an INVALID index that IF NOT EXISTS would keep
+            invalid = self.execute(
+                "SELECT 1 FROM pg_index JOIN pg_class ON pg_class.oid = pg_index.indexrelid "
+                "WHERE pg_class.relname = :name AND NOT pg_index.indisvalid",
+                {"name": name},
+            ).first()
+            if invalid:
+                self.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+            self.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} ({', '.join(columns)})")
+        else:
+            self.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})")
+        print(f"  ✓ Index: {name}")
+
+
+def _unbounded(connection: Connection, local: bool = False):
+    """No statement timeout on this migration connection (PostgreSQL roles may set one)"""
+    if connection.dialect.name == "postgresql":
+        connection.execute(text(f"SET {'LOCAL ' if local else ''}statement_timeout = 0"))
+
+
+@contextmanager
+def _file_lock(path: str):
+    """Exclusive lock on `path` for the block; waits while another process holds it"""
+    with open(path, "a+b") as lock_file:
+        if os.name == "nt":
+            import msvcrt
+            lock_file.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+                    break
+                except OSError:
+                    time.sleep(0.2)
+            try:
+                yield
+            finally:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+@contextmanager
+def migration_lock(bind: Engine):
+    """Serialize migration runners: one migrates, the others wait and then find nothing to do"""
+    if bind.dialect.name == "postgresql":
+        with bind.connect().execution_options(isolation_level="AUTOCOMMIT") as lock:
+            _unbounded(lock)
+            lock.execute(text("SELECT pg_advisory_lock(:key)"), {"key": ADVISORY_LOCK_KEY})
+            try:
+                yield
+            finally:
+                lock.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": ADVISORY_LOCK_KEY})
+                lock.execute(text("RESET statement_timeout"))
+        return
+
+    database = bind.url.database if bind.dialect.name == "sqlite" else None
+    if database and database != ":memory:" and not database.startswith("file:"):
+        with _file_lock(database + SQLITE_LOCK_SUFFIX):
+            yield
+        return
+    yield
+
+
+def load_migrations() -> list:
+    """Migration modules in version order"""
+    names = sorted(
+        module.name for module in pkgutil.iter_modules(versions.__path__)
+        if module.name[0] == "m" and module.name[1:5].isdigit()
+    )
+    return [importlib.import_module(f"{versions.__name__}.{name}") for name in names]
+
+
+def _version(migration) -> str:
+    return migration.__name__.rsplit(".", 1)[-1]
+
+
+def _description(migration) -> str:
+    return (migration.__doc__ or "").strip().splitlines()[0] if migration.__doc__ else ""
+
+
+def applied_versions(bind: Engine = default_engine) -> set[str]:
+    with bind.begin() as connection:
+        _metadata.create_all(connection, checkfirst=True)
+        return set(connection.execute(select(schema_migrations.c.version)).scalars())
+
+
+def pending_migrations(bind: Engine = default_engine) -> list:
+    applied = applied_versions(bind)
+    return [migration for migration in load_migrations() if _version(migration) not in applied]
+
+
+def _record(connection: Connection, migration):
+    connection.execute(schema_migrations.insert().values(
+        version=_version(migration),
+        description=_description(migration),
+        applied_at=datetime.utcnow(),
+    ))
+
+
+def _apply(bind: Engine, migration):
+    if getattr(migration, "CONCURRENT", False):
+        with bind.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            _unbounded(connection)
+            try:
+                migration.upgrade(MigrationOps(connection, concurrent=True))
+                _record(connection, migration)
+            finally:
+                if connection.dialect.name == "postgresql":
+                    # Back to the server default before the connection returns to the pool
+                    connection.execute(text("RESET statement_timeout"))
+    else:
+        with bind.begin() as connection:
+            _unbounded(connection, local=True)
+            migration.upgrade(MigrationOps(connection))
+            _record(connection, migration)
+
+
+def run_migrations(bind: Engine = default_engine) -> list[str]:
+    """Apply every pending migration in order; returns the versions applied"""
+    applied = []
+    with migration_lock(bind):
+        for migration in pending_migrations(bind):
+            print(f"Applying migration {_version(migration)}: {_description(migration)}")
+            _apply(bind, migration)
+            applied.append(_version(migration))
+    return applied
@@ -0,0 +1 @@
+# One module per migration: mNNNN_<name>.py, applied in order
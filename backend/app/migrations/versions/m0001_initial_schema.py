@@ -0,0 +1,103 @@
+"""Create missing tables (the schema as of this migration)
+
+New databases get every table here; the later migrations then find their columns already
+present and only fill in data. Existing databases (created by create_all before
+migrations existed) get the tables they lack, e.g. vendor_stats or token_revocations.
+The tables are a frozen copy, not the models: migrations must keep building the same
+schema however the application changes. The invoices indexes come from m0008.
+"""
+from sqlalchemy import JSON, Column, DateTime, Float, ForeignKey, Integer, MetaData, Numeric, String, Table
+
+metadata = MetaData()
+
+Table(
+    "users", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("name", String, nullable=False),
+    Column("email", String, unique=True, index=True, nullable=False),
+    Column("password", String, nullable=False),
+    Column("role", String, nullable=False),
+)
+
+Table(
+    "projects", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("name", String, nullable=False),
+    Column("location", String, nullable=False),
+    Column("budget", Numeric, nullable=False),
+    Column("utilized", Numeric),
+    Column("status", String),
+)
+
+Table(
+    "invoices", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("project_id", Integer, ForeignKey("projects.id"), nullable=False),
+    Column("invoice_number", String, nullable=False),
+    Column("vendor_name", String, nullable=False),
+    Column("amount", Numeric, nullable=False),
+    Column("risk_score", Integer),
+    Column("risk_level", String),
+    Column("fraud_category", String),
+    Column("amount_mismatch_percentage", Numeric),
+    Column("file_path", String, nullable=False),
+    Column("uploaded_by", String),
+    Column("status", String),
+    Column("submitted_by_user_id", Integer, ForeignKey("users.id")),
+    Column("verified_by_user_id", Integer, ForeignKey("users.id")),
+    Column("created_at", DateTime),
+    Column("verified_at", DateTime),
+    Column("admin_notes", String),
+    Column("invoice_number_key", String),
+    Column("vendor_key", String),
+    Column("fraud_score", Integer),
+    Column("ocr_fields", JSON),
+    Column("image_hash", String),
+)
+
+Table(
+    "invoice_jobs", metadata,
+    Column("id", String, primary_key=True, index=True),
+    Column("invoice_id", Integer, ForeignKey("invoices.id"), nullable=False, index=True),
+    Column("stage", String),
+    Column("progress", Integer),
+    Column("error", String),
+    Column("result", JSON),
+    Column("created_at", DateTime),
+    Column("updated_at", DateTime),
+)
+
+Table(
+    "vendor_stats", metadata,
+    Column("vendor_key", String, primary_key=True),
+    Column("invoice_count", Integer, nullable=False),
+    Column("amount_mean", Float, nullable=False),
+    Column("amount_var", Float, nullable=False),
+    Column("approved_count", Integer, nullable=False),
+    Column("rejected_count", Integer, nullable=False),
+    Column("flagged_count", Integer, nullable=False),
+    Column("updated_at", DateTime),
+)
+
+Table(
+    "project_stats", metadata,
+    Column("project_id", Integer, ForeignKey("projects.id"), primary_key=True),
+    Column("invoice_count", Integer, nullable=False),
+    Column("amount_total", Float, nullable=False),
+    Column("window_start", DateTime),
+    Column("window_spend", Float, nullable=False),
+    Column("updated_at", DateTime),
+)
+
+Table(
+    "token_revocations", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("jti", String),
+    Column("user_id", Integer),
+    Column("revoked_at", DateTime, nullable=False),
+    Column("expires_at", DateTime, nullable=False, index=True),
+)
+
+
+def upgrade(op):
+    metadata.create_all(op.connection, checkfirst=True)
@@ -0,0 +1,15 @@
+"""Add the contractor/admin workflow fields to invoices"""
+from sqlalchemy import Column, DateTime, Integer, String, text
+
+
+def upgrade(op):
+    op.add_column("invoices", Column("uploaded_by", String, server_default=text("'contractor'")))
+    op.add_column("invoices", Column("status", String, server_default=text("'pending'")))
+    op.add_column("invoices", Column("submitted_by_user_id", Integer))
+    op.add_column("invoices", Column("verified_by_user_id", Integer))
+    op.add_column("invoices", Column("created_at", DateTime))
+    op.add_column("invoices", Column("verified_at", DateTime))
+    op.add_column("invoices", Column("admin_notes", String))
+
+    # Keyset pagination needs a value to compare against
+    op.execute("UPDATE invoices SET created_at = CURRENT_TIMESTAMP WHERE created_at IS NULL")
@@ -0,0 +1,7 @@
+"""Add fraud_category and amount_mismatch_percentage to invoices"""
+from sqlalchemy import Column, Numeric, String
+
+
+def upgrade(op):
+    op.add_column("invoices", Column("fraud_category", String))
+    op.add_column("invoices", Column("amount_mismatch_percentage", Numeric))
@@ -0,0 +1,47 @@
+"""Add the normalized duplicate-check keys to invoices and backfill them"""
+import re
+
+from sqlalchemy import Column, String, text
+
+BACKFILL_ROWS = 5000
+
+
+# Frozen copies of app.utils.normalize as of this migration
+def _invoice_number_key(value) -> str:
+    digits = re.sub(r'[^\d]', '', str(value or ""))
+    if digits:
+        return digits.lstrip("0") or "0"
+    return re.sub(r'[^a-z]', '', str(value or "").lower())
+
+
+def _vendor_key(value) -> str:
+    return " ".join(str(value or "").lower().split())
+
+
+def upgrade(op):
+    op.add_column("invoices", Column("invoice_number_key", String))
+    op.add_column("invoices", Column("vendor_key", String))
+
+    # Same keys the Invoice validators set on new rows
+    last_id = 0
+    while True:
+        rows = op.execute(
+            "SELECT id, invoice_number, vendor_name FROM invoices "
+            "WHERE id > :last_id AND (invoice_number_key IS NULL OR vendor_key IS NULL) "
+            "ORDER BY id LIMIT :limit",
+            {"last_id": last_id, "limit": BACKFILL_ROWS},
+        ).all()
+        if not rows:
+            break
+        op.connection.execute(
+            text("UPDATE invoices SET invoice_number_key = :number_key, vendor_key = :vendor_key WHERE id = :id"),
+            [
+                {
+                    "id": invoice_id,
+                    "number_key": _invoice_number_key(invoice_number),
+                    "vendor_key": _vendor_key(vendor_name),
+                }
+                for invoice_id, invoice_number, vendor_name in rows
+            ],
+        )
+        last_id = rows[-1][0]
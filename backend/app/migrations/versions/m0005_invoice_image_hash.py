@@ -0,0 +1,11 @@
+"""Add image_hash (near-duplicate detection) to invoices
+
+Stored files are hashed by the offline `python hash_images.py`, not here: decoding every
+invoice file would hold up startup (and every other worker) for as long as that takes.
+"""
+from sqlalchemy import Column, String
+
+
+def upgrade(op):
+    # Set for invoices uploaded from now on; older ones once hash_images.py has run
+    op.add_column("invoices", Column("image_hash", String))
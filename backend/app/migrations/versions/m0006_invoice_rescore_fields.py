@@ -0,0 +1,8 @@
+"""Add the re-scoring inputs (fraud_score, ocr_fields) to invoices"""
+from sqlalchemy import JSON, Column, Integer
+
+
+def upgrade(op):
+    # Set for invoices uploaded from now on (see rescore_service)
+    op.add_column("invoices", Column("fraud_score", Integer))
+    op.add_column("invoices", Column("ocr_fields", JSON))
@@ -0,0 +1,62 @@
+"""Fill the risk-model feature store (vendor_stats, project_stats) from the invoices
+
+A frozen copy of the full rebuild in feature_service (exact mean and variance per vendor,
+spend over the last 30 days per project), so the backfill stays what it was when this
+migration was written.
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import DateTime, bindparam, text
+
+VELOCITY_WINDOW = timedelta(days=30)
+
+AMOUNT = "CAST(amount AS FLOAT)"
+AMOUNT_VAR = f"AVG({AMOUNT} * {AMOUNT}) - AVG({AMOUNT}) * AVG({AMOUNT})"
+
+VENDOR_STATS = f"""
+INSERT INTO vendor_stats (
+    vendor_key, invoice_count, amount_mean, amount_var,
+    approved_count, rejected_count, flagged_count, updated_at
+)
+SELECT
+    vendor_key,
+    COUNT(id),
+    COALESCE(AVG({AMOUNT}), 0),
+    CASE WHEN {AMOUNT_VAR} > 0 THEN {AMOUNT_VAR} ELSE 0 END,
+    SUM(CASE WHEN status = 'approved' THEN 1 ELSE 0 END),
+    SUM(CASE WHEN status = 'rejected' THEN 1 ELSE 0 END),
+    SUM(CASE WHEN status = 'flagged' THEN 1 ELSE 0 END),
+    :now
+FROM invoices
+WHERE vendor_key IS NOT NULL
+GROUP BY vendor_key
+"""
+
+PROJECT_STATS = f"""
+INSERT INTO project_stats (
+    project_id, invoice_count, amount_total, window_start, window_spend, updated_at
+)
+SELECT
+    project_id,
+    COUNT(id),
+    COALESCE(SUM({AMOUNT}), 0),
+    MIN(CASE WHEN created_at > :window_open THEN created_at END),
+    SUM(CASE WHEN created_at > :window_open THEN {AMOUNT} ELSE 0 END),
+    :now
+FROM invoices
+GROUP BY project_id
+"""
+
+
+def upgrade(op):
+    now = datetime.utcnow()
+    op.execute("DELETE FROM vendor_stats")
+    op.execute("DELETE FROM project_stats")
+    op.connection.execute(
+        text(VENDOR_STATS).bindparams(bindparam("now", type_=DateTime)),
+        {"now": now},
+    )
+    op.connection.execute(
+        text(PROJECT_STATS).bindparams(bindparam("now", type_=DateTime), bindparam("window_open", type_=DateTime)),
+        {"now": now, "window_open": now - VELOCITY_WINDOW},
+    )
@@ -0,0 +1,24 @@
+"""Add the indexes behind invoice listing, filters, duplicate checks and the dashboards
+
+Built concurrently on PostgreSQL, so writes to invoices continue during the build.
+status, project_id and created_at are served by the composite listing indexes, which
+lead with those columns; a single-column index on each would only slow writes down.
+"""
+CONCURRENT = True
+
+INDEXES = [
+    ("ix_invoices_created_at_id", ["created_at", "id"]),
+    ("ix_invoices_status_created_at", ["status", "created_at", "id"]),
+    ("ix_invoices_project_created_at", ["project_id", "created_at", "id"]),
+    ("ix_invoices_risk_score", ["risk_score"]),
+    ("ix_invoices_risk_level", ["risk_level"]),
+    ("ix_invoices_fraud_category", ["fraud_category"]),
+    ("ix_invoices_submitted_by_user_id", ["submitted_by_user_id"]),
+    ("ix_invoices_duplicate_key", ["vendor_key", "invoice_number_key", "status"]),
+    ("ix_invoices_image_hash", ["image_hash"]),
+]
+
+
+def upgrade(op):
+    for name, columns in INDEXES:
+        op.create_index(name, "invoices", columns)
@@ -0,0 +1,20 @@
+"""Store every invoice timestamp in the one SQLite text format, so they compare in time order
+
+SQLite keeps DATETIME as text and compares it as text. Rows written before the ORM managed
+these columns hold "YYYY-MM-DD HH:MM:SS" without the ".ffffff" the ORM writes and binds,
+so they sorted before equal or later times and broke the (created_at, id) keyset cursor
+and the date filters. PostgreSQL stores real timestamps and needs nothing.
+"""
+COLUMNS = ["created_at", "verified_at"]
+
+
+def upgrade(op):
+    if op.dialect != "sqlite":
+        return
+    for column in COLUMNS:
+        fixed = op.execute(
+            f"UPDATE invoices SET {column} = replace({column}, 'T', ' ') || '.000000' "
+            f"WHERE length({column}) = 19"
+        ).rowcount
+        if fixed:
+            print(f"  ✓ Normalized {fixed} invoices.{column} value(s)")
@@ -0,0 +1,8 @@
+"""Add the owning worker and its heartbeat to invoice_jobs (recovery of orphaned jobs)"""
+from sqlalchemy import Column, DateTime, String
+
+
+def upgrade(op):
+    # Jobs from before this migration have neither; recovery falls back to updated_at
+    op.add_column("invoice_jobs", Column("owner", String))
+    op.add_column("invoice_jobs", Column("heartbeat_at", DateTime))
@@ -2,5 +2,8 @@ from app.config.database import Base
 from app.models.user_model import User
 from app.models.project_model import Project
 from app.models.invoice_model import Invoice
+from app.models.invoice_job_model import InvoiceJob
+from app.models.feature_store_model import VendorStats, ProjectStats
+from app.models.token_revocation_model import TokenRevocation
 
-__all__ = ["User", "Project", "Invoice", "Base"]
+__all__ = ["User", "Project", "Invoice", "InvoiceJob", "VendorStats", "ProjectStats", "TokenRevocation", "Base"]
@@ -0,0 +1,29 @@
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime
+from datetime import datetime
+from app.config.database import Base
+
+
+class VendorStats(Base):
+    """Running per-vendor statistics for the risk model, updated on every invoice write"""
+    __tablename__ = "vendor_stats"
+
+    vendor_key = Column(String, primary_key=True)  # Invoice.vendor_key
+    invoice_count = Column(Integer, nullable=False, default=0)
+    amount_mean = Column(Float, nullable=False, default=0)  # exponentially weighted (rolling)
+    amount_var = Column(Float, nullable=False, default=0)
+    approved_count = Column(Integer, nullable=False, default=0)
+    rejected_count = Column(Integer, nullable=False, default=0)
+    flagged_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
+class ProjectStats(Base):
+    """Running per-project spend statistics for the risk model"""
+    __tablename__ = "project_stats"
+
+    project_id = Column(Integer, ForeignKey("projects.id"), primary_key=True)
+    invoice_count = Column(Integer, nullable=False, default=0)
+    amount_total = Column(Float, nullable=False, default=0)
+    window_start = Column(DateTime, nullable=True)  # current spend-velocity window
+    window_spend = Column(Float, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,18 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, JSON
+from datetime import datetime
+from app.config.database import Base
+
+
+class InvoiceJob(Base):
+    __tablename__ = "invoice_jobs"
+
+    id = Column(String, primary_key=True, index=True)  # uuid4 hex, returned to the client
+    invoice_id = Column(Integer, ForeignKey("invoices.id"), nullable=False, index=True)
+    stage = Column(String, default="queued")  # queued, ocr, verifying, scoring, completed, failed
+    progress = Column(Integer, default=0)  # 0-100
+    error = Column(String, nullable=True)
+    result = Column(JSON, nullable=True)  # OCR fields, verification and risk once completed
+    owner = Column(String, nullable=True)  # worker process running the job (host:pid:boot)
+    heartbeat_at = Column(DateTime, nullable=True)  # refreshed by the owner while it is alive
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -1,7 +1,8 @@
-from sqlalchemy import Column, Integer, String, Numeric, ForeignKey, DateTime
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Numeric, ForeignKey, DateTime, Index, JSON
+from sqlalchemy.orm import relationship, validates
 from datetime import datetime
 from app.config.database import Base
+from app.utils.normalize import normalize_invoice_number, normalize_vendor_name
 
 
 class Invoice(Base):
@@ -27,5 +28,38 @@ class Invoice(Base):
     verified_at = Column(DateTime, nullable=True)
     admin_notes = Column(String, nullable=True)
 
+    # Normalized duplicate-check keys, kept in sync by the validators below
+    invoice_number_key = Column(String, nullable=True)
+    vendor_key = Column(String, nullable=True)
+    # Inputs for re-scoring without re-running OCR (see rescore_service)
+    fraud_score = Column(Integer, nullable=True)  # verification mismatch score, 0-100
+    ocr_fields = Column(JSON, nullable=True)
+
+    # Perceptual hash of the invoice image (near-duplicate detection)
+    image_hash = Column(String, nullable=True, index=True)
+
+    __table_args__ = (
+        Index("ix_invoices_duplicate_key", "vendor_key", "invoice_number_key", "status"),
+        # Listing: keyset order (created_at, id), alone or behind the common equality filters
+        Index("ix_invoices_created_at_id", "created_at", "id"),
+        Index("ix_invoices_status_created_at", "status", "created_at", "id"),
+        Index("ix_invoices_project_created_at", "project_id", "created_at", "id"),
+        Index("ix_invoices_risk_score", "risk_score"),
+        # Dashboard filters and "my invoices"
+        Index("ix_invoices_risk_level", "risk_level"),
+        Index("ix_invoices_fraud_category", "fraud_category"),
+        Index("ix_invoices_submitted_by_user_id", "submitted_by_user_id"),
+    )
+
+    @validates("invoice_number")
+    def _set_invoice_number_key(self, key, value):
+        self.invoice_number_key = normalize_invoice_number(value)
+        return value
+
+    @validates("vendor_name")
+    def _set_vendor_key(self, key, value):
+        self.vendor_key = normalize_vendor_name(value)
+        return value
+
     # Optional relationship
     # project = relationship("Project", backref="invoices")
@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Integer, String, DateTime
+from datetime import datetime
+from app.config.database import Base
+
+
+class TokenRevocation(Base):
+    """
+    Revoked access tokens: one token (jti, e.g. on logout), or every token of a user
+    issued before revoked_at (user_id, e.g. after a role or password change)
+    """
+    __tablename__ = "token_revocations"
+
+    id = Column(Integer, primary_key=True, index=True)
+    jti = Column(String, nullable=True)
+    user_id = Column(Integer, nullable=True)  # no foreign key: outlives a deleted user
+    revoked_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)  # row is useless after this
@@ -0,0 +1,106 @@
+import threading
+
+import numpy as np
+import pytesseract
+from PIL import Image
+
+# Optional in-process backend (needs libtesseract); pytesseract stays the fallback
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
+
+TSV_COLUMNS = [
+    "level", "page_num", "block_num", "par_num", "line_num", "word_num",
+    "left", "top", "width", "height", "conf", "text",
+]
+
+
+def _to_pil(img) -> Image.Image:
+    """Convert an OpenCV (BGR or grayscale) array to a PIL image"""
+    if isinstance(img, Image.Image):
+        return img
+    if img.ndim == 2:
+        return Image.fromarray(img)
+    return Image.fromarray(np.ascontiguousarray(img[:, :, ::-1]))
+
+
+def _parse_tsv(tsv: str) -> dict:
+    """Parse Tesseract TSV rows into the same dict shape as pytesseract's Output.DICT"""
+    data = {column: [] for column in TSV_COLUMNS}
+    for row in tsv.splitlines():
+        values = row.split("\t")
+        if len(values) < len(TSV_COLUMNS) - 1 or values[0] == "level":
+            continue
+        if len(values) == len(TSV_COLUMNS) - 1:
+            values.append("")  # structural rows have no text column
+
+        for column, value in zip(TSV_COLUMNS[:-2], values):
+            data[column].append(int(value))
+        data["conf"].append(float(values[10]))
+        data["text"].append(values[11])
+    return data
+
+
+class PytesseractBackend:
+    """Runs the tesseract binary per call (writes a temp image, parses its TSV output)"""
+
+    name = "pytesseract"
+
+    def __init__(self, lang: str = "eng"):
+        self.lang = lang
+
+    def probe(self) -> tuple[str, list[str]]:
+        version = str(pytesseract.get_tesseract_version())
+        languages = sorted(pytesseract.get_languages(config=""))
+        return version, languages
+
+    def image_to_data(self, img) -> dict:
+        return pytesseract.image_to_data(img, lang=self.lang, output_type=pytesseract.Output.DICT)
+
+    def image_to_string(self, img) -> str:
+        return pytesseract.image_to_string(img, lang=self.lang)
+
+
+class TesserocrBackend:
+    """Keeps a loaded Tesseract API handle per thread and reuses it across pages"""
+
+    name = "tesserocr"
+
+    def __init__(self, lang: str = "eng"):
+        if tesserocr is None:
+            raise RuntimeError("tesserocr is not installed")
+        self.lang = lang
+        self._local = threading.local()
+
+    def _api(self):
+        api = getattr(self._local, "api", None)
+        if api is None:
+            # Loading the language model is the expensive part; do it once per thread
+            api = tesserocr.PyTessBaseAPI(lang=self.lang)
+            self._local.api = api
+        return api
+
+    def probe(self) -> tuple[str, list[str]]:
+        version = tesserocr.tesseract_version().split()[1]
+        languages = sorted(tesserocr.get_languages()[1])
+        self._api()
+        return version, languages
+
+    def image_to_data(self, img) -> dict:
+        api = self._api()
+        api.SetImage(_to_pil(img))
+        api.Recognize()
+        return _parse_tsv(api.GetTSVText(0))
+
+    def image_to_string(self, img) -> str:
+        api = self._api()
+        api.SetImage(_to_pil(img))
+        return api.GetUTF8Text()
+
+
+def create_backend(name: str, lang: str = "eng"):
+    """Build the configured backend: "tesserocr", "pytesseract" or "auto" (tesserocr when installed)"""
+    if name == "tesserocr" or (name == "auto" and tesserocr is not None):
+        return TesserocrBackend(lang)
+    return PytesseractBackend(lang)
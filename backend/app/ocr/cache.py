@@ -0,0 +1,125 @@
+import hashlib
+import json
+import sqlite3
+import time
+from pathlib import Path
+
+from app.config.settings import settings
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def file_sha256(filepath: str) -> str:
+    """Hash a file in chunks so large scans are never fully loaded"""
+    digest = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _prepare(path: Path):
+    """Create the cache database and switch it to WAL (a persistent setting)"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=5)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS ocr_cache (
+                file_hash TEXT NOT NULL,
+                version TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (file_hash, version)
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_ocr_cache_last_access ON ocr_cache (last_access)")
+    finally:
+        conn.close()
+
+
+# Cache database this process has already set up
+_prepared_path: Path | None = None
+
+
+def _connect() -> sqlite3.Connection:
+    global _prepared_path
+    path = Path(settings.OCR_CACHE_PATH)
+    if path != _prepared_path:
+        _prepare(path)
+        _prepared_path = path
+    return sqlite3.connect(path, timeout=5)
+
+
+def get_cached_ocr(file_hash: str, version: str) -> dict | None:
+    """Return the cached OCR output for this file and engine version, if any"""
+    if not file_hash or settings.OCR_CACHE_MAX_BYTES <= 0:
+        return None
+
+    try:
+        conn = _connect()
+        try:
+            row = conn.execute(
+                "SELECT payload FROM ocr_cache WHERE file_hash = ? AND version = ?",
+                (file_hash, version),
+            ).fetchone()
+            if row is None:
+                return None
+
+            with conn:
+                conn.execute(
+                    "UPDATE ocr_cache SET last_access = ? WHERE file_hash = ? AND version = ?",
+                    (time.time(), file_hash, version),
+                )
+            return json.loads(row[0])
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        print(f"OCR cache read error: {str(e)}")
+        return None
+
+
+def store_cached_ocr(file_hash: str, version: str, ocr_output: dict):
+    """Cache OCR output and evict least recently used entries beyond OCR_CACHE_MAX_BYTES"""
+    if not file_hash or settings.OCR_CACHE_MAX_BYTES <= 0:
+        return
+
+    payload = json.dumps({
+        "ocr_fields": ocr_output["ocr_fields"],
+        "ocr_table": ocr_output["ocr_table"],
+        "ocr_status": ocr_output.get("ocr_status", "ok"),
+        "image_hash": ocr_output.get("image_hash"),
+    })
+
+    try:
+        conn = _connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO ocr_cache (file_hash, version, payload, size, last_access) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (file_hash, version, payload, len(payload), time.time()),
+                )
+
+                # Entries of other engine versions stay: workers on either side of an
+                # upgrade share this file, and unused versions age out like any entry
+                total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM ocr_cache").fetchone()[0]
+                while total > settings.OCR_CACHE_MAX_BYTES:
+                    rows = conn.execute(
+                        "SELECT file_hash, version, size FROM ocr_cache ORDER BY last_access LIMIT 100"
+                    ).fetchall()
+                    for row_hash, row_version, size in rows:
+                        if total <= settings.OCR_CACHE_MAX_BYTES:
+                            break
+                        conn.execute(
+                            "DELETE FROM ocr_cache WHERE file_hash = ? AND version = ?",
+                            (row_hash, row_version),
+                        )
+                        total -= size
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        print(f"OCR cache write error: {str(e)}")
@@ -0,0 +1,127 @@
+from concurrent.futures import ThreadPoolExecutor
+import os
+import platform
+import shutil
+
+import pytesseract
+
+from app.config.settings import settings
+from app.ocr.backends import PytesseractBackend, create_backend
+
+# Engine state is detected once per process (API process and each OCR worker)
+_engine_state = None
+_backend = None
+# Page threads for PDF invoices; long-lived so each keeps its warm backend handle
+_page_pool = None
+
+
+def _find_tesseract_cmd() -> str | None:
+    """Locate the tesseract binary based on OS and environment"""
+    if platform.system() == "Windows":
+        # Try multiple common Tesseract installation paths for Windows
+        possible_paths = [
+            r"C:\Program Files\Tesseract-OCR\tesseract.exe",
+            r"C:\Program Files (x86)\Tesseract-OCR\tesseract.exe",
+            r"C:\Users\{}\AppData\Local\Programs\Tesseract-OCR\tesseract.exe".format(os.getenv('USERNAME')),
+        ]
+        for path in possible_paths:
+            if os.path.exists(path):
+                return path
+        return None
+
+    # For Linux/Unix (Production on Render)
+    # Check if tesseract is in PATH or set explicit path
+    tesseract_path = shutil.which(os.getenv('TESSERACT_CMD', 'tesseract'))
+    if tesseract_path:
+        return tesseract_path
+
+    # Try common Linux paths
+    linux_paths = [
+        '/usr/bin/tesseract',
+        '/usr/local/bin/tesseract',
+        '/app/.apt/usr/bin/tesseract',  # Render specific
+    ]
+    for path in linux_paths:
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def bootstrap_engine(force: bool = False) -> dict:
+    """Pick the OCR backend and detect the tesseract version and installed languages once"""
+    global _engine_state, _backend
+    if _engine_state is not None and not force:
+        return _engine_state
+
+    cmd = _find_tesseract_cmd()
+    if cmd:
+        pytesseract.pytesseract.tesseract_cmd = cmd
+
+    backend = None
+    try:
+        try:
+            backend = create_backend(settings.OCR_BACKEND, settings.OCR_LANGUAGES)
+            version, languages = backend.probe()
+        except Exception as e:
+            if isinstance(backend, PytesseractBackend):
+                raise
+            # In-process backend failed to load, fall back to the tesseract binary
+            print(f"{settings.OCR_BACKEND} backend unavailable ({str(e)}), using pytesseract")
+            backend = PytesseractBackend(settings.OCR_LANGUAGES)
+            version, languages = backend.probe()
+
+        _engine_state = {
+            "available": True,
+            "backend": backend.name,
+            "cmd": pytesseract.pytesseract.tesseract_cmd,
+            "version": version,
+            "languages": languages,
+            "error": None,
+        }
+        print(f"✅ Tesseract {version} ready ({backend.name} backend)")
+    except Exception as e:
+        _engine_state = {
+            "available": False,
+            "backend": backend.name,
+            "cmd": cmd,
+            "version": None,
+            "languages": [],
+            "error": str(e),
+        }
+        print(f"Tesseract not found: {str(e)}")
+        print("Please install Tesseract OCR from: https://github.com/UB-Mannheim/tesseract/wiki")
+
+    _backend = backend
+    get_page_pool()
+    return _engine_state
+
+
+def get_engine_state() -> dict:
+    return bootstrap_engine()
+
+
+def is_engine_available() -> bool:
+    return get_engine_state()["available"]
+
+
+def get_page_pool() -> ThreadPoolExecutor:
+    """Threads that OCR the pages of one PDF in parallel (created by bootstrap_engine)"""
+    global _page_pool
+    if _page_pool is None:
+        _page_pool = ThreadPoolExecutor(
+            max_workers=max(1, settings.OCR_PDF_PAGE_WORKERS), thread_name_prefix="ocr-page"
+        )
+    return _page_pool
+
+
+def shutdown_page_pool():
+    global _page_pool
+    if _page_pool is not None:
+        _page_pool.shutdown(wait=False, cancel_futures=True)
+        _page_pool = None
+
+
+def get_ocr_backend():
+    """The backend chosen by bootstrap_engine (image_to_data / image_to_string)"""
+    bootstrap_engine()
+    return _backend
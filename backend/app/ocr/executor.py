@@ -0,0 +1,102 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.config.settings import settings
+from app.ocr.cache import file_sha256, get_cached_ocr, store_cached_ocr
+from app.ocr.engine import bootstrap_engine, shutdown_page_pool
+from app.ocr.invoice_ocr import get_ocr_cache_version, process_invoice_ocr
+
+
+class OcrQueueFull(Exception):
+    """Raised when the OCR pool already holds its maximum number of pending jobs"""
+
+
+_pool = None
+_slots = None
+_background_slots = None
+
+
+def get_ocr_pool() -> ProcessPoolExecutor:
+    """Create the OCR worker pool on first use"""
+    global _pool
+    if _pool is None:
+        # spawn keeps DB connections and event-loop threads out of the workers
+        _pool = ProcessPoolExecutor(
+            max_workers=settings.OCR_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=bootstrap_engine,
+        )
+    return _pool
+
+
+def _get_slots() -> asyncio.Semaphore:
+    global _slots
+    if _slots is None:
+        _slots = asyncio.Semaphore(settings.OCR_MAX_PENDING)
+    return _slots
+
+
+def _get_background_slots() -> asyncio.Semaphore:
+    global _background_slots
+    if _background_slots is None:
+        _background_slots = asyncio.Semaphore(settings.OCR_BACKGROUND_MAX_PENDING)
+    return _background_slots
+
+
+def is_ocr_saturated() -> bool:
+    """True when every interactive pending slot (running + queued jobs) is taken"""
+    return _get_slots().locked()
+
+
+async def run_ocr(fn, *args, background: bool = False):
+    """
+    Run `fn(*args)` on the OCR worker pool without blocking the event loop.
+    Interactive callers raise OcrQueueFull when their slots are all taken. Background
+    callers (async jobs, batches) wait for one of their own OCR_BACKGROUND_MAX_PENDING
+    slots instead, so a large batch never takes the slots of interactive uploads.
+    """
+    global _pool
+    slots = _get_background_slots() if background else _get_slots()
+    if not background and slots.locked():
+        raise OcrQueueFull()
+
+    async with slots:
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(get_ocr_pool(), fn, *args)
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM on a huge scan); start a fresh pool next time
+            _pool = None
+            raise
+
+
+async def run_invoice_ocr(file_path: str, file_hash: str = None, background: bool = False) -> dict:
+    """
+    OCR an invoice file, serving repeated uploads of the same content from the
+    cache so only the cheap verification step runs again.
+    """
+    if file_hash is None:
+        file_hash = await run_in_threadpool(file_sha256, file_path)
+
+    version = get_ocr_cache_version()
+    cached = await run_in_threadpool(get_cached_ocr, file_hash, version)
+    if cached is not None:
+        return cached
+
+    ocr_output = await run_ocr(process_invoice_ocr, file_path, background=background)
+    if ocr_output.get("ocr_status") == "ok":
+        await run_in_threadpool(store_cached_ocr, file_hash, version, ocr_output)
+    return ocr_output
+
+
+def shutdown_ocr_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+    # PDFs OCR'd in this process (the sync upload path) use its own page pool
+    shutdown_page_pool()
@@ -1,11 +1,11 @@
 from pathlib import Path
 from typing import Dict, Any
 from PIL import Image
-import pytesseract
+from app.ocr.engine import get_ocr_backend
 from app.ocr.preprocess import preprocess_image
 
 
 def extract_text(image_path: str) -> str:
     img = Image.open(Path(image_path))
     img = preprocess_image(img)
-    return pytesseract.image_to_string(img)
+    return get_ocr_backend().image_to_string(img)
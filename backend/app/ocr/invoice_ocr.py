@@ -1,62 +1,33 @@
 import cv2
-import pytesseract
 import numpy as np
 import re
-import platform
-import os
-
-# Set tesseract path based on OS and environment
-if platform.system() == "Windows":
-    # Try multiple common Tesseract installation paths for Windows
-    possible_paths = [
-        r"C:\Program Files\Tesseract-OCR\tesseract.exe",
-        r"C:\Program Files (x86)\Tesseract-OCR\tesseract.exe",
-        r"C:\Users\{}\AppData\Local\Programs\Tesseract-OCR\tesseract.exe".format(os.getenv('USERNAME')),
-    ]
-    
-    for path in possible_paths:
-        if os.path.exists(path):
-            pytesseract.pytesseract.tesseract_cmd = path
-            break
-else:
-    # For Linux/Unix (Production on Render)
-    # Check if tesseract is in PATH or set explicit path
-    tesseract_cmd = os.getenv('TESSERACT_CMD', 'tesseract')
-    
-    # Try to find tesseract
-    import shutil
-    tesseract_path = shutil.which(tesseract_cmd)
-    
-    if tesseract_path:
-        pytesseract.pytesseract.tesseract_cmd = tesseract_path
-        print(f"✅ Tesseract found at: {tesseract_path}")
-    else:
-        # Try common Linux paths
-        linux_paths = [
-            '/usr/bin/tesseract',
-            '/usr/local/bin/tesseract',
-            '/app/.apt/usr/bin/tesseract',  # Render specific
-        ]
-        for path in linux_paths:
-            if os.path.exists(path):
-                pytesseract.pytesseract.tesseract_cmd = path
-                print(f"✅ Tesseract found at: {path}")
-                break
+
+from app.config.settings import settings
+from app.ocr.engine import get_engine_state, get_page_pool, is_engine_available
+from app.ocr.layout import TokenIndex, run_layout, layout_words
+from app.ocr.pdf import is_pdf, open_pdf, render_page, text_layer_layout, text_layer_words
+from app.ocr.phash import dhash
+from app.ocr.preprocess import load_page, normalize_page
+
+# Bump whenever extraction logic changes so cached OCR results are not reused
+OCR_PIPELINE_VERSION = "layout-v4"
+
+
+def get_ocr_cache_version() -> str:
+    """Identifies the OCR engine configuration that produced a result"""
+    state = get_engine_state()
+    return (
+        f"{OCR_PIPELINE_VERSION}:{state['backend']}:tesseract-{state['version']}:{settings.OCR_LANGUAGES}"
+        f":w{settings.OCR_TARGET_WIDTH}:deskew{settings.OCR_MAX_DESKEW_DEGREES}:pdf{settings.OCR_PDF_DPI}"
+    )
 
 # ------------------------------
 # Extract Key Fields
 # ------------------------------
-def extract_key_fields(img):
-    """Extract invoice number, vendor name, and amount from image"""
-    # Get OCR data with position information
-    data = pytesseract.image_to_data(img, output_type=pytesseract.Output.DICT)
-    
+def extract_key_fields(layout):
+    """Extract invoice number, vendor name, and amount from the page layout"""
     # Clean OCR data
-    ocr_data = [
-        {"text": data['text'][i], "left": data['left'][i], "top": data['top'][i], "conf": int(data['conf'][i])}
-        for i in range(len(data['text']))
-        if data['text'][i].strip() and int(data['conf'][i]) > 40
-    ]
+    ocr_data = layout_words(layout, min_conf=40)
     
     # Define keywords to search for
     keywords = {
@@ -71,81 +42,72 @@ def extract_key_fields(img):
         "amount_ocr": ""
     }
     
+    # Column arrays with a row index for vectorized same-line range queries
+    tokens = TokenIndex(ocr_data)
+    is_no = np.array([text.upper() == "NO" for text in tokens.text], dtype=bool)
+    has_three_digits = np.array([bool(re.search(r'\d{3}', text)) for text in tokens.text], dtype=bool)
+
     # Function to find keyword and extract nearby value
     def find_value_near_keyword(keyword_variants, key_type):
         for keyword in keyword_variants:
-            keyword_parts = keyword.split()
+            keyword_length = len(keyword.split())
             
             # Find keyword match
-            for i in range(len(ocr_data) - len(keyword_parts) + 1):
-                consecutive_match = all(
-                    ocr_data[i + j]['text'].lower() == keyword_parts[j].lower()
-                    for j in range(len(keyword_parts))
-                )
+            for i in tokens.find_phrase(keyword):
+                keyword_left = tokens.left[i + keyword_length - 1]
+                keyword_top = tokens.top[i]
+
+                # Tokens on the same line, in reading order
+                candidates = tokens.same_line(keyword_top, 15)
+                horizontal_distance = tokens.left[candidates] - keyword_left
                 
-                if consecutive_match:
-                    keyword_left = ocr_data[i + len(keyword_parts) - 1]['left']
-                    keyword_top = ocr_data[i]['top']
+                # Find text to the right of keyword
+                # For amounts, collect all consecutive numbers on the same line
+                if key_type == "amount":
+                    in_range = (horizontal_distance > 0) & (horizontal_distance < 400)
+                    candidates = candidates[in_range & tokens.has_digit[candidates]]
                     
-                    # Find text to the right of keyword
-                    # For amounts, collect all consecutive numbers on the same line
-                    if key_type == "amount":
-                        candidates_on_line = []
-                        for candidate in ocr_data:
-                            vertical_distance = abs(candidate['top'] - keyword_top)
-                            horizontal_distance = candidate['left'] - keyword_left
-                            
-                            if vertical_distance < 15 and horizontal_distance > 0 and horizontal_distance < 400:
-                                # Check if it contains numbers
-                                if re.search(r'\d', candidate['text']):
-                                    candidates_on_line.append((candidate['left'], candidate['text']))
-                        
-                        if candidates_on_line:
-                            # Sort by position and concatenate all numbers
-                            candidates_on_line.sort(key=lambda x: x[0])
-                            amount_parts = []
-                            for _, text in candidates_on_line:
-                                cleaned = re.sub(r'[^\d]', '', text)
-                                if cleaned:
-                                    amount_parts.append(cleaned)
-                            
-                            if amount_parts:
-                                # Join all parts to form complete amount (e.g., "4" + "800" = "4800")
-                                full_amount = ''.join(amount_parts)
-                                try:
-                                    if int(full_amount) >= 100:
-                                        return full_amount
-                                except:
-                                    pass
-                    else:
-                        # For invoice and vendor, find closest single value
-                        closest_value = ""
-                        min_distance = float('inf')
+                    if len(candidates):
+                        # Sort by position and concatenate all numbers
+                        candidates = candidates[np.argsort(tokens.left[candidates], kind="stable")]
+                        amount_parts = []
+                        for index in candidates:
+                            cleaned = re.sub(r'[^\d]', '', tokens.text[index])
+                            if cleaned:
+                                amount_parts.append(cleaned)
                         
-                        for candidate in ocr_data:
-                            vertical_distance = abs(candidate['top'] - keyword_top)
-                            horizontal_distance = candidate['left'] - keyword_left
-                            
-                            if vertical_distance < 15 and horizontal_distance > 0 and horizontal_distance < 300:
-                                # Skip "NO" if looking for invoice number
-                                if key_type == "invoice" and candidate['text'].upper() == "NO":
-                                    continue
-                                
-                                if horizontal_distance < min_distance:
-                                    min_distance = horizontal_distance
-                                    closest_value = candidate['text']
+                        if amount_parts:
+                            # Join all parts to form complete amount (e.g., "4" + "800" = "4800")
+                            full_amount = ''.join(amount_parts)
+                            try:
+                                if int(full_amount) >= 100:
+                                    return full_amount
+                            except:
+                                pass
+                else:
+                    # For invoice and vendor, find closest single value
+                    in_range = (horizontal_distance > 0) & (horizontal_distance < 300)
+                    # Skip "NO" if looking for invoice number
+                    if key_type == "invoice":
+                        in_range &= ~is_no[candidates]
+                    
+                    closest_value = ""
+                    if in_range.any():
+                        # argmin keeps the first token in reading order on ties
+                        closest = candidates[in_range][np.argmin(horizontal_distance[in_range])]
+                        closest_value = tokens.text[closest]
+                    
+                    if closest_value:
+                        # Clean based on type
+                        if key_type == "invoice":
+                            # Only keep if it has digits
+                            if re.search(r'\d', closest_value):
+                                closest_value = re.sub(r'[^\w\-\/]', '', closest_value)
+                            else:
+                                closest_value = ""
                         
                         if closest_value:
-                            # Clean based on type
-                            if key_type == "invoice":
-                                # Only keep if it has digits
-                                if re.search(r'\d', closest_value):
-                                    closest_value = re.sub(r'[^\w\-\/]', '', closest_value)
-                                else:
-                                    closest_value = ""
-                            
-                            if closest_value:
-                                return closest_value
+                            return closest_value
         
         return ""
     
@@ -157,17 +119,13 @@ def extract_key_fields(img):
         text_lower = item['text'].lower()
         if "company" in text_lower or "llc" in text_lower or "ltd" in text_lower or "inc" in text_lower:
             # Get only words on the same line (tight vertical tolerance)
-            company_parts = []
-            item_top = item['top']
-            for candidate in ocr_data:
-                if abs(candidate['top'] - item_top) < 10:  # Stricter tolerance for same line
-                    # Skip if it looks like an address (contains numbers like "123" or "111-222")
-                    if not re.search(r'\d{3}', candidate['text']):
-                        company_parts.append((candidate['left'], candidate['text']))
+            # Skip if it looks like an address (contains numbers like "123" or "111-222")
+            company_parts = tokens.same_line(item['top'], 10)  # Stricter tolerance for same line
+            company_parts = company_parts[~has_three_digits[company_parts]]
             
-            if company_parts:
-                company_parts.sort(key=lambda x: x[0])
-                vendor_name = " ".join([part[1] for part in company_parts])
+            if len(company_parts):
+                company_parts = company_parts[np.argsort(tokens.left[company_parts], kind="stable")]
+                vendor_name = " ".join(tokens.text[index] for index in company_parts)
                 # Limit to reasonable length (first 50 characters)
                 results["vendor_name_ocr"] = vendor_name[:50].strip()
                 break
@@ -176,7 +134,7 @@ def extract_key_fields(img):
     results["amount_ocr"] = find_value_near_keyword(keywords["amount"], "amount")
     
     # Fallback: Use regex on full text for better extraction
-    full_text = pytesseract.image_to_string(img)
+    full_text = layout["text"]
     
     if not results["invoice_number_ocr"] or results["invoice_number_ocr"].lower() in ["number", "no"]:
         # Try multiple patterns for invoice number
@@ -224,52 +182,45 @@ def extract_key_fields(img):
 # ------------------------------
 # Extract Table
 # ------------------------------
-def extract_table(image_path):
-    """Extract table data from invoice image"""
-    try:
-        img = cv2.imread(image_path)
-        if img is None:
-            return []
+# Table detection thresholds as fractions of the page width, so they hold at any
+# resolution (they were tuned as 400 x 150 px and 10 px row bands on ~1130 px wide scans)
+TABLE_MIN_WIDTH_FRACTION = 0.35
+TABLE_MIN_HEIGHT_FRACTION = 0.13
+TABLE_ROW_BAND_FRACTION = 0.009
 
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
 
-        # Apply adaptive thresholding
-        thresh = cv2.adaptiveThreshold(
-            gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-            cv2.THRESH_BINARY_INV, 15, 8
-        )
+def extract_table(binary, layout):
+    """Extract table data from the normalized page's binarized image and layout"""
+    try:
+        page_width = binary.shape[1]
+        min_width = TABLE_MIN_WIDTH_FRACTION * page_width
+        min_height = TABLE_MIN_HEIGHT_FRACTION * page_width
+        row_band = max(int(round(TABLE_ROW_BAND_FRACTION * page_width)), 1)
 
         # Find contours
-        contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
         
         if not contours:
             return []
 
         # Find table-like region (large rectangular area)
-        table_roi = None
+        table_region = None
         for contour in contours:
             x, y, w, h = cv2.boundingRect(contour)
-            if w > 400 and h > 150:  # Table size threshold
-                table_roi = img[y:y+h, x:x+w]
+            if w > min_width and h > min_height:  # Table size threshold
+                table_region = (x, y, w, h)
                 break
         
-        if table_roi is None:
+        if table_region is None:
             return []
 
-        # Extract text with position data from table ROI
-        data = pytesseract.image_to_data(table_roi, output_type=pytesseract.Output.DICT)
-
-        # Clean and structure OCR data
-        ocr_data = [
-            {"text": data['text'][i], "left": data['left'][i], "top": data['top'][i], "conf": int(data['conf'][i])}
-            for i in range(len(data['text']))
-            if data['text'][i].strip() and int(data['conf'][i]) > 50
-        ]
+        # Reuse the page layout: keep words inside the table region, relative to it
+        ocr_data = layout_words(layout, min_conf=50, region=table_region)
 
         # Group text into rows using 'top' coordinate
         rows_dict = {}
         for item in ocr_data:
-            row_key = item['top'] // 10  # Group rows with 10-pixel tolerance
+            row_key = item['top'] // row_band  # Group rows within one band
             if row_key not in rows_dict:
                 rows_dict[row_key] = []
             rows_dict[row_key].append((item['left'], item['text']))
@@ -308,18 +259,93 @@ def extract_table(image_path):
         print(f"Table extraction error: {str(e)}")
         return []
 
+# ------------------------------
+# PDF Invoices
+# ------------------------------
+def analyze_page(page, layout=None):
+    """Fields and table for one normalized page; OCR only runs when no layout is given"""
+    if layout is None:
+        layout = run_layout(page["gray"])
+    return extract_key_fields(layout), extract_table(page["binary"], layout)
+
+
+def process_pdf_ocr(filepath):
+    """
+    Extract fields + table from a (multi-page) PDF. Pages are rasterized lazily
+    and OCR'd in parallel waves; embedded text layers skip OCR entirely.
+    Stops once invoice number, vendor and amount have all been found.
+    """
+    fields = {
+        "invoice_number_ocr": "",
+        "vendor_name_ocr": "",
+        "amount_ocr": ""
+    }
+    table = []
+    image_hash = None
+    workers = max(1, settings.OCR_PDF_PAGE_WORKERS)
+    dpi = settings.OCR_PDF_DPI
+
+    # The process-wide page pool: its threads keep their tesseract handles between PDFs
+    pool = get_page_pool()
+    with open_pdf(filepath) as doc:
+        page_total = min(doc.page_count, settings.OCR_PDF_MAX_PAGES)
+        if page_total == 0:
+            return None
+
+        for wave_start in range(0, page_total, workers):
+            # PyMuPDF is not thread-safe: rasterize here, OCR on the threads
+            futures = []
+            for page_number in range(wave_start, min(wave_start + workers, page_total)):
+                pdf_page = doc[page_number]
+                words = text_layer_words(pdf_page)
+                page = normalize_page(render_page(pdf_page, dpi), deskew=words is None)
+                if page_number == 0:
+                    image_hash = dhash(page["gray"])
+                layout = text_layer_layout(words, dpi / 72 * page["scale"]) if words else None
+                futures.append(pool.submit(analyze_page, page, layout))
+
+            # Merge in page order: the first page that yields a field wins
+            for future in futures:
+                page_fields, page_table = future.result()
+                for key, value in page_fields.items():
+                    if not fields[key]:
+                        fields[key] = value
+                table.extend(page_table)
+
+            if all(fields.values()):
+                break
+
+    return {
+        "ocr_fields": fields,
+        "ocr_table": table,
+        "ocr_status": "ok",
+        "image_hash": image_hash
+    }
+
+
+def compute_image_hash(filepath):
+    """Perceptual hash of the invoice image (first page of a PDF); None if unreadable"""
+    try:
+        if is_pdf(filepath):
+            with open_pdf(filepath) as doc:
+                if doc.page_count == 0:
+                    return None
+                page = normalize_page(render_page(doc[0], settings.OCR_PDF_DPI), deskew=False)
+        else:
+            page = load_page(filepath)
+        return dhash(page["gray"]) if page is not None else None
+    except Exception as e:
+        print(f"Image hash error: {str(e)}")
+        return None
+
 # ------------------------------
 # Main OCR Driver
 # ------------------------------
 def process_invoice_ocr(filepath):
-    """Process invoice and extract fields + table"""
+    """Process invoice (image or PDF) and extract fields + table"""
     try:
-        # Check if Tesseract is available
-        try:
-            pytesseract.get_tesseract_version()
-        except Exception as e:
-            print(f"Tesseract not found: {str(e)}")
-            print("Please install Tesseract OCR from: https://github.com/UB-Mannheim/tesseract/wiki")
+        # Check if Tesseract is available (detected once per process)
+        if not is_engine_available():
             # Return empty results if Tesseract is not installed
             return {
                 "ocr_fields": {
@@ -327,26 +353,40 @@ def process_invoice_ocr(filepath):
                     "vendor_name_ocr": "Tesseract not installed",
                     "amount_ocr": "0"
                 },
-                "ocr_table": []
+                "ocr_table": [],
+                "ocr_status": "unavailable",
+                # Near-duplicate detection doesn't need Tesseract
+                "image_hash": compute_image_hash(filepath)
             }
         
-        img = cv2.imread(filepath)
-        if img is None:
+        page = None
+        if is_pdf(filepath):
+            result = process_pdf_ocr(filepath)
+            if result is not None:
+                return result
+        else:
+            # Decode, downscale, deskew and binarize once for every consumer
+            page = load_page(filepath)
+
+        if page is None:
             return {
                 "ocr_fields": {
                     "invoice_number_ocr": "",
                     "vendor_name_ocr": "",
                     "amount_ocr": ""
                 },
-                "ocr_table": []
+                "ocr_table": [],
+                "ocr_status": "unreadable"
             }
 
-        fields = extract_key_fields(img)
-        table = extract_table(filepath)
+        # Single Tesseract pass shared by field and table extraction
+        fields, table = analyze_page(page)
 
         return {
             "ocr_fields": fields,
-            "ocr_table": table
+            "ocr_table": table,
+            "ocr_status": "ok",
+            "image_hash": dhash(page["gray"])
         }
 
     except Exception as e:
@@ -357,5 +397,6 @@ def process_invoice_ocr(filepath):
                 "vendor_name_ocr": "",
                 "amount_ocr": ""
             },
-            "ocr_table": []
+            "ocr_table": [],
+            "ocr_status": "error"
         }
@@ -0,0 +1,136 @@
+import re
+
+import numpy as np
+
+from app.ocr.engine import get_ocr_backend
+
+
+# ------------------------------
+# Layout Model
+# ------------------------------
+def build_layout(data):
+    """Build a word/line/block layout model from Tesseract `image_to_data` output"""
+    words = []
+    lines = {}
+    line_ids = {}
+
+    for i in range(len(data['text'])):
+        text = data['text'][i]
+        if not text or not text.strip():
+            continue
+
+        line_key = (data['block_num'][i], data['par_num'][i], data['line_num'][i])
+        if line_key not in lines:
+            line_ids[line_key] = len(lines)
+            lines[line_key] = []
+        lines[line_key].append(len(words))
+
+        words.append({
+            "text": text,
+            "left": int(data['left'][i]),
+            "top": int(data['top'][i]),
+            "width": int(data['width'][i]),
+            "height": int(data['height'][i]),
+            "conf": int(float(data['conf'][i])),
+            "block": int(data['block_num'][i]),
+            "line_id": line_ids[line_key],
+        })
+
+    # Rebuild the plain-text view the same way Tesseract does: words joined by
+    # spaces, lines by newlines and a blank line between blocks
+    text_lines = []
+    previous_block = None
+    for indexes in lines.values():
+        block = words[indexes[0]]["block"]
+        if previous_block is not None and block != previous_block:
+            text_lines.append("")
+        text_lines.append(" ".join(words[i]["text"] for i in indexes))
+        previous_block = block
+
+    return {
+        "words": words,
+        "lines": list(lines.values()),
+        "text": "\n".join(text_lines),
+    }
+
+
+def run_layout(img):
+    """Run a single Tesseract pass over the image and return its layout model"""
+    data = get_ocr_backend().image_to_data(img)
+    return build_layout(data)
+
+
+def layout_words(layout, min_conf, region=None):
+    """
+    Return words above `min_conf` as {text, left, top, conf} dicts.
+    If `region` (x, y, w, h) is given, only words centred inside it are kept
+    and their coordinates are made relative to the region.
+    """
+    offset_x, offset_y = 0, 0
+    if region is not None:
+        offset_x, offset_y, region_w, region_h = region
+
+    selected = []
+    for word in layout["words"]:
+        if word["conf"] <= min_conf:
+            continue
+
+        if region is not None:
+            center_x = word["left"] + word["width"] / 2
+            center_y = word["top"] + word["height"] / 2
+            if not (offset_x <= center_x < offset_x + region_w and offset_y <= center_y < offset_y + region_h):
+                continue
+
+        selected.append({
+            "text": word["text"],
+            "left": word["left"] - offset_x,
+            "top": word["top"] - offset_y,
+            "conf": word["conf"],
+            "line_id": word["line_id"],
+        })
+
+    return selected
+
+
+# ------------------------------
+# Token Index
+# ------------------------------
+class TokenIndex:
+    """
+    Column arrays (left/top/conf/line id) over OCR tokens plus a row index:
+    token positions sorted by `top`, so "same line as y" is a binary-search
+    range query instead of a scan over every token.
+    """
+
+    def __init__(self, words):
+        self.text = [w["text"] for w in words]
+        self.lower = np.array([t.lower() for t in self.text], dtype=object)
+        self.left = np.array([w["left"] for w in words], dtype=np.int64)
+        self.top = np.array([w["top"] for w in words], dtype=np.int64)
+        self.conf = np.array([w["conf"] for w in words], dtype=np.int64)
+        self.line_id = np.array([w.get("line_id", -1) for w in words], dtype=np.int64)
+        self.has_digit = np.array([bool(re.search(r'\d', t)) for t in self.text], dtype=bool)
+
+        self._row_order = np.argsort(self.top, kind="stable")
+        self._row_tops = self.top[self._row_order]
+
+    def __len__(self):
+        return len(self.text)
+
+    def same_line(self, top, tolerance):
+        """Indices of tokens with |token.top - top| < tolerance, in reading order"""
+        start = np.searchsorted(self._row_tops, top - tolerance, side="right")
+        end = np.searchsorted(self._row_tops, top + tolerance, side="left")
+        return np.sort(self._row_order[start:end])
+
+    def find_phrase(self, phrase):
+        """Start indices where the phrase's words appear as consecutive tokens (case-insensitive)"""
+        parts = [part.lower() for part in phrase.split()]
+        count = len(self) - len(parts) + 1
+        if count <= 0:
+            return np.array([], dtype=np.int64)
+
+        mask = np.ones(count, dtype=bool)
+        for offset, part in enumerate(parts):
+            mask &= self.lower[offset:offset + count] == part
+        return np.flatnonzero(mask)
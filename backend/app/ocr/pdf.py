@@ -0,0 +1,54 @@
+import numpy as np
+
+# Optional: PDF invoices need PyMuPDF for rasterization and text-layer access
+try:
+    import pymupdf
+except ImportError:
+    pymupdf = None
+
+from app.ocr.layout import build_layout
+
+# Fewer words than this means a scanned page (or just a stamp), so OCR it
+TEXT_LAYER_MIN_WORDS = 5
+
+
+def is_pdf(filepath: str) -> bool:
+    with open(filepath, "rb") as f:
+        return f.read(5) == b"%PDF-"
+
+
+def open_pdf(filepath: str):
+    if pymupdf is None:
+        raise RuntimeError("PyMuPDF is not installed, cannot read PDF invoices")
+    return pymupdf.open(filepath)
+
+
+def render_page(page, dpi: int) -> np.ndarray:
+    """Rasterize one PDF page to a BGR array"""
+    pixmap = page.get_pixmap(dpi=dpi, colorspace=pymupdf.csRGB, alpha=False)
+    img = np.frombuffer(pixmap.samples, dtype=np.uint8).reshape(pixmap.height, pixmap.width, pixmap.n)
+    return np.ascontiguousarray(img[:, :, ::-1])
+
+
+def text_layer_words(page):
+    """Embedded words of the page, or None if it has no usable text layer (scanned page)"""
+    words = page.get_text("words")
+    if len(words) < TEXT_LAYER_MIN_WORDS:
+        return None
+    return words
+
+
+def text_layer_layout(words, zoom: float):
+    """Layout model from embedded words, in pixels of the rendered page (`zoom` = pixels per PDF point)"""
+    data = {column: [] for column in ["block_num", "par_num", "line_num", "left", "top", "width", "height", "conf", "text"]}
+    for x0, y0, x1, y1, text, block_no, line_no, _ in words:
+        data["block_num"].append(block_no + 1)
+        data["par_num"].append(1)
+        data["line_num"].append(line_no + 1)
+        data["left"].append(int(round(x0 * zoom)))
+        data["top"].append(int(round(y0 * zoom)))
+        data["width"].append(int(round((x1 - x0) * zoom)))
+        data["height"].append(int(round((y1 - y0) * zoom)))
+        data["conf"].append(100)  # embedded text is exact
+        data["text"].append(text)
+    return build_layout(data)
@@ -0,0 +1,30 @@
+import cv2
+import numpy as np
+
+# 16x16 gradient bits; 64-bit hashes can't tell apart invoices printed on one template
+HASH_SIZE = 16
+
+
+def dhash(gray: np.ndarray) -> str | None:
+    """
+    Difference hash of a page's ink, as a hex string (HASH_SIZE**2 bits).
+    The ink bounding box is hashed rather than the whole page, so margins,
+    crops and rescans at another resolution don't shift the grid.
+    """
+    _, ink = cv2.threshold(cv2.GaussianBlur(gray, (5, 5), 0), 0, 1, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    rows, cols = np.nonzero(ink)
+    if len(rows) == 0:
+        return None
+
+    # Percentiles instead of min/max so specks near the edges don't move the box
+    top, bottom = np.percentile(rows, [0.5, 99.5]).astype(int)
+    left, right = np.percentile(cols, [0.5, 99.5]).astype(int)
+    crop = ink[top:bottom + 1, left:right + 1].astype(np.float32)
+
+    small = cv2.resize(crop, (HASH_SIZE + 1, HASH_SIZE), interpolation=cv2.INTER_AREA)
+    bits = np.packbits((small[:, 1:] > small[:, :-1]).flatten())
+    return bits.tobytes().hex()
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
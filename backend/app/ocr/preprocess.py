@@ -1,5 +1,9 @@
+import cv2
+import numpy as np
 from PIL import Image, ImageFilter
 
+from app.config.settings import settings
+
 
 def preprocess_image(img: Image.Image) -> Image.Image:
     """
@@ -8,3 +12,59 @@ def preprocess_image(img: Image.Image) -> Image.Image:
     img = img.convert("L")
     img = img.filter(ImageFilter.SHARPEN)
     return img
+
+
+def estimate_skew(gray: np.ndarray) -> float:
+    """Angle (degrees) that straightens the text, from the min-area box of the ink pixels"""
+    _, ink = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    points = cv2.findNonZero(ink)
+    if points is None:
+        return 0.0
+
+    angle = cv2.minAreaRect(points)[-1]
+    # OpenCV versions disagree on the angle range; fold it into (-45, 45]
+    while angle > 45:
+        angle -= 90
+    while angle <= -45:
+        angle += 90
+    return float(angle)
+
+
+def normalize_page(img: np.ndarray, deskew: bool = True) -> dict:
+    """
+    Normalize a decoded page once for every OCR consumer:
+    downscale to OCR_TARGET_WIDTH, grayscale, deskew and binarize.
+    Returns {"gray", "binary", "scale", "angle"}; "binary" is inverted (ink = 255).
+    """
+    scale = 1.0
+    height, width = img.shape[:2]
+    if width > settings.OCR_TARGET_WIDTH:
+        # Tesseract time grows with pixel count; ~300 DPI A4 width is plenty
+        scale = settings.OCR_TARGET_WIDTH / width
+        img = cv2.resize(img, (settings.OCR_TARGET_WIDTH, int(round(height * scale))), interpolation=cv2.INTER_AREA)
+
+    gray = img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+
+    angle = estimate_skew(gray) if deskew else 0.0
+    if 0.5 <= abs(angle) <= settings.OCR_MAX_DESKEW_DEGREES:
+        height, width = gray.shape
+        matrix = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+        gray = cv2.warpAffine(gray, matrix, (width, height), flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+    else:
+        angle = 0.0
+
+    # Adaptive thresholding for table/contour detection
+    binary = cv2.adaptiveThreshold(
+        gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+        cv2.THRESH_BINARY_INV, 15, 8
+    )
+
+    return {"gray": gray, "binary": binary, "scale": scale, "angle": angle}
+
+
+def load_page(filepath: str) -> dict | None:
+    """Decode an image file once and normalize it; None if it cannot be decoded"""
+    img = cv2.imread(filepath)
+    if img is None:
+        return None
+    return normalize_page(img)
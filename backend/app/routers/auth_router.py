@@ -1,27 +1,42 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy.orm import Session
 
 from app.config.database import get_db
+from app.config.settings import settings
 from app.schemas.auth_schema import UserCreate, UserLogin, TokenResponse, UserResponse
 from app.services.auth_service import register_user, login_user
-from app.utils.dependencies import get_current_user
-from app.models.user_model import User
+from app.services.token_service import revoke_token
+from app.utils.dependencies import get_current_user, get_token_claims
+from app.utils.hashing import PasswordHashBusy
 
 router = APIRouter()
 
 
+def auth_busy_error() -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail="Too many sign-in attempts in progress, please retry shortly",
+        headers={"Retry-After": str(settings.PASSWORD_HASH_RETRY_AFTER_SECONDS)},
+    )
+
+
 @router.post("/register")
-def register(data: UserCreate, db: Session = Depends(get_db)):
+async def register(data: UserCreate, request: Request, db: Session = Depends(get_db)):
     try:
-        user = register_user(db, data)
+        user = await register_user(db, data, client_ip=request.client.host if request.client else None)
         return {"message": "User registered successfully", "id": user.id}
+    except PasswordHashBusy:
+        raise auth_busy_error()
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.post("/login", response_model=TokenResponse)
-def login(data: UserLogin, db: Session = Depends(get_db)):
-    result = login_user(db, data)
+async def login(data: UserLogin, request: Request, db: Session = Depends(get_db)):
+    try:
+        result = await login_user(db, data, client_ip=request.client.host if request.client else None)
+    except PasswordHashBusy:
+        raise auth_busy_error()
     if not result:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -35,6 +50,13 @@ def login(data: UserLogin, db: Session = Depends(get_db)):
 
 
 @router.get("/me", response_model=UserResponse)
-def get_me(current_user: User = Depends(get_current_user)):
+def get_me(current_user: UserResponse = Depends(get_current_user)):
     """Get current authenticated user"""
-    return UserResponse.from_orm(current_user)
+    return current_user
+
+
+@router.post("/logout")
+def logout(claims: dict = Depends(get_token_claims), db: Session = Depends(get_db)):
+    """Revoke the bearer token"""
+    revoke_token(db, claims)
+    return {"message": "Logged out"}
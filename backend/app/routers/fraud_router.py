@@ -1,13 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from pydantic import BaseModel
 
-from app.config.database import get_db
-from app.services.invoice_service import list_high_risk_invoices
-from app.services.fraud_service import get_fraud_summary
-from app.schemas.invoice_schema import InvoiceOut
-from app.utils.helpers import require_admin
+from app.config.database import get_async_read_db, get_db
+from app.services.invoice_service import list_high_risk_invoices_async
+from app.services.fraud_service import get_cached_fraud_summary, get_fraud_summary
+from app.schemas.invoice_schema import InvoiceOut, RescoreRequest
+from app.services.rescore_service import is_run_active, load_checkpoint, run_rescore, start_rescore
+from app.utils.dependencies import require_admin
 from app.models.invoice_model import Invoice
 
 router = APIRouter()
@@ -19,23 +24,63 @@ class FlagInvoiceRequest(BaseModel):
 
 
 @router.get("/summary")
-def fraud_summary(db: Session = Depends(get_db), admin=Depends(require_admin)):
-    return get_fraud_summary(db)
+async def fraud_summary(admin=Depends(require_admin)):
+    # Only a rebuild needs a thread (and a read-replica session)
+    return get_cached_fraud_summary() or await run_in_threadpool(get_fraud_summary)
+
+
+@router.post("/rescore")
+def rescore_invoices(
+    request: RescoreRequest,
+    background_tasks: BackgroundTasks,
+    admin=Depends(require_admin)
+):
+    """Re-score stored invoices (optionally filtered) in the background; poll GET /fraud/rescore/{run_id}"""
+    filters = request.model_dump(exclude={"chunk_size", "dry_run"})
+    checkpoint = start_rescore(filters, request.chunk_size, request.dry_run)
+    background_tasks.add_task(run_rescore, checkpoint["run_id"])
+    return JSONResponse(status_code=202, content=checkpoint)
+
+
+@router.post("/rescore/{run_id}/resume")
+def resume_rescore(
+    run_id: str,
+    background_tasks: BackgroundTasks,
+    admin=Depends(require_admin)
+):
+    """Continue an interrupted re-scoring run from its checkpoint"""
+    checkpoint = load_checkpoint(run_id)
+    if not checkpoint:
+        raise HTTPException(status_code=404, detail="Re-scoring run not found")
+    if is_run_active(checkpoint):
+        raise HTTPException(status_code=409, detail="Re-scoring run is already running")
+
+    background_tasks.add_task(run_rescore, run_id)
+    return JSONResponse(status_code=202, content=checkpoint)
+
+
+@router.get("/rescore/{run_id}")
+def get_rescore_status(run_id: str, admin=Depends(require_admin)):
+    """Progress of a re-scoring run (the checkpoint) and the path of its diff report"""
+    checkpoint = load_checkpoint(run_id)
+    if not checkpoint:
+        raise HTTPException(status_code=404, detail="Re-scoring run not found")
+    return checkpoint
 
 
 @router.get("/high-risk", response_model=List[InvoiceOut])
-def high_risk_invoices(
-    db: Session = Depends(get_db), 
+async def high_risk_invoices(
+    db: AsyncSession = Depends(get_async_read_db),
     admin=Depends(require_admin),
     min_risk: int = 70
 ):
     """Get high-risk invoices with optional risk threshold filter"""
-    return db.query(Invoice).filter(Invoice.risk_score >= min_risk).all()
+    return await list_high_risk_invoices_async(db, min_risk)
 
 
 @router.get("/filter", response_model=List[InvoiceOut])
-def filter_invoices(
-    db: Session = Depends(get_db),
+async def filter_invoices(
+    db: AsyncSession = Depends(get_async_read_db),
     admin=Depends(require_admin),
     category: Optional[str] = None,
     risk_level: Optional[str] = None
@@ -49,7 +94,7 @@ def filter_invoices(
     - vendor_mismatch: Vendor name doesn't match
     - invoice_mismatch: Invoice number doesn't match
     """
-    query = db.query(Invoice)
+    query = select(Invoice)
     
     if risk_level:
         query = query.filter(Invoice.risk_level == risk_level)
@@ -70,7 +115,7 @@ def filter_invoices(
             # Return all suspicious invoices (risk >= 50)
             query = query.filter(Invoice.risk_score >= 50)
     
-    return query.order_by(Invoice.risk_score.desc()).all()
+    return (await db.scalars(query.order_by(Invoice.risk_score.desc()))).all()
 
 
 @router.post("/flag/{invoice_id}")
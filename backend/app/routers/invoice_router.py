@@ -1,22 +1,69 @@
-from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException
+import zipfile
+from datetime import datetime
+
+from fastapi import APIRouter, BackgroundTasks, Depends, UploadFile, File, Form, HTTPException, Query, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 
-from app.config.database import get_db
-from app.schemas.invoice_schema import InvoiceCreate, InvoiceOut, InvoiceVerify
-from app.services.invoice_service import create_invoice, list_invoices, verify_invoice_by_admin
-from app.utils.helpers import get_current_user
+from app.config.database import get_async_read_db, get_db
+from app.config.settings import settings
+from app.ocr.executor import OcrQueueFull, run_invoice_ocr
+from app.models.invoice_model import Invoice
+from app.schemas.invoice_schema import InvoiceCreate, InvoiceOut, InvoiceVerify, InvoiceJobOut
+from app.services.batch_service import prepare_batch, stream_batch
+from app.services.export_service import EXPORT_FORMATS, stream_invoice_export
+from app.services.ingestion_service import run_ingestion_job, stream_job_events
+from app.services.invoice_service import (
+    create_invoice,
+    create_invoice_job,
+    get_invoice_job,
+    list_invoices_async,
+    list_pending_invoices_async,
+    save_invoice_file,
+    verify_invoice_by_admin,
+    UploadTooLarge,
+)
+from app.utils.dependencies import get_current_user, require_admin
 
 router = APIRouter()
 
+# GET /invoices page size when a cursor is passed without a limit
+DEFAULT_PAGE_SIZE = 50
+
+
+def ocr_busy_error() -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail="OCR queue is full, please retry shortly",
+        headers={"Retry-After": str(settings.OCR_RETRY_AFTER_SECONDS)},
+    )
+
+
+def get_authorized_job(db: Session, job_id: str, user):
+    """Load a job the user may see: admins see all, contractors only their own"""
+    job = get_invoice_job(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    if user.role != "admin":
+        invoice = db.query(Invoice).filter(Invoice.id == job.invoice_id).first()
+        if not invoice or invoice.submitted_by_user_id != user.id:
+            raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
 
 @router.post("/")
 async def upload_invoice(
+    background_tasks: BackgroundTasks,
     project_id: int = Form(...),
     invoice_number: str = Form(...),
     vendor_name: str = Form(...),
     amount: float = Form(...),
     file: UploadFile = File(...),
+    mode: str = Query("sync", pattern="^(sync|async)$"),
     db: Session = Depends(get_db),
     user=Depends(get_current_user),
 ):
@@ -24,6 +71,9 @@ async def upload_invoice(
     Upload invoice with OCR verification.
     Contractors use this to SUBMIT invoices (status: pending)
     Admins use this to VERIFY/CROSS-CHECK invoices
+
+    With mode=async the invoice is stored with status "processing" and a 202
+    with a job id is returned right away; poll GET /invoices/jobs/{job_id}.
     """
     payload = InvoiceCreate(
         project_id=project_id,
@@ -32,14 +82,90 @@ async def upload_invoice(
         amount=amount,
     )
 
-    # Determine role from user (User object, not dict)
+    # Determine role from the authenticated user
     user_role = user.role if hasattr(user, 'role') else "contractor"
     user_id = user.id
 
-    result = create_invoice(db, file, payload, user_role=user_role, user_id=user_id)
+    try:
+        file_path, file_hash = await run_in_threadpool(save_invoice_file, file)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+    if mode == "async":
+        job = await run_in_threadpool(
+            create_invoice_job, db, file_path, payload, user_role=user_role, user_id=user_id
+        )
+        background_tasks.add_task(run_ingestion_job, job.id, file_hash)
+        return JSONResponse(
+            status_code=202,
+            content={
+                "job_id": job.id,
+                "invoice_id": job.invoice_id,
+                "status": "processing",
+                "status_url": f"/invoices/jobs/{job.id}",
+                "message": "Invoice accepted for processing",
+            },
+        )
+
+    # OCR and DB work run off the event loop; cached scans skip the OCR pool
+    try:
+        ocr_output = await run_invoice_ocr(file_path, file_hash)
+    except OcrQueueFull:
+        raise ocr_busy_error()
+
+    result = await run_in_threadpool(
+        create_invoice, db, file_path, payload,
+        user_role=user_role, user_id=user_id, ocr_output=ocr_output,
+    )
     return result
 
 
+@router.post("/batch")
+async def upload_invoice_batch(
+    files: List[UploadFile] = File(...),
+    manifest: UploadFile = File(...),
+    db: Session = Depends(get_db),
+    user=Depends(get_current_user),
+):
+    """
+    Upload many invoices at once: ZIP archive(s) and/or individual files plus a
+    CSV/JSON manifest with filename, project_id, invoice_number, vendor_name, amount.
+    Streams NDJSON: one line per invoice once it is saved (with its id), then a summary.
+    """
+    user_role = user.role if hasattr(user, 'role') else "contractor"
+
+    try:
+        items = await run_in_threadpool(prepare_batch, db, files, manifest, user_role)
+    except (ValueError, zipfile.BadZipFile) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return StreamingResponse(
+        stream_batch(items, user_role, user.id),
+        media_type="application/x-ndjson",
+    )
+
+
+@router.get("/jobs/{job_id}", response_model=InvoiceJobOut)
+def get_job_status(
+    job_id: str,
+    db: Session = Depends(get_db),
+    user=Depends(get_current_user),
+):
+    """Progress of an asynchronous invoice upload"""
+    return get_authorized_job(db, job_id, user)
+
+
+@router.get("/jobs/{job_id}/events")
+def get_job_events(
+    job_id: str,
+    db: Session = Depends(get_db),
+    user=Depends(get_current_user),
+):
+    """Server-sent event stream of an asynchronous invoice upload's progress"""
+    get_authorized_job(db, job_id, user)
+    return StreamingResponse(stream_job_events(job_id), media_type="text/event-stream")
+
+
 @router.post("/verify/{invoice_id}")
 async def verify_invoice_action(
     invoice_id: int,
@@ -68,26 +194,78 @@ async def verify_invoice_action(
     return result
 
 
+def invoice_filters(
+    status: Optional[str] = None,
+    project_id: Optional[int] = None,
+    vendor: Optional[str] = None,
+    min_risk: Optional[int] = Query(None, ge=0, le=100),
+    max_risk: Optional[int] = Query(None, ge=0, le=100),
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None
+) -> dict:
+    """Query filters shared by the listing and the export"""
+    return {
+        "status": status,
+        "project_id": project_id,
+        "vendor": vendor,
+        "min_risk": min_risk,
+        "max_risk": max_risk,
+        "date_from": date_from,
+        "date_to": date_to,
+    }
+
+
 @router.get("/", response_model=List[InvoiceOut])
-def get_invoices(
-    db: Session = Depends(get_db), 
+async def get_invoices(
+    response: Response,
+    db: AsyncSession = Depends(get_async_read_db),
     user=Depends(get_current_user),
-    status: str = None
+    filters: dict = Depends(invoice_filters),
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=500)
 ):
-    """Get invoices, optionally filtered by status"""
-    invoices = list_invoices(db)
-    
-    if status:
-        invoices = [inv for inv in invoices if inv.status == status]
-    
+    """
+    Get invoices newest first, filtered in SQL.
+    Without `cursor` or `limit` every matching invoice is returned, as before paging.
+    Pages are keyset-based: pass `limit` (default 50 once a cursor is given) and the
+    X-Next-Cursor response header back as `cursor` (absent on the last page).
+    """
+    if limit is None and cursor:
+        limit = DEFAULT_PAGE_SIZE
+    try:
+        invoices, next_cursor = await list_invoices_async(db, cursor=cursor, limit=limit, **filters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return invoices
 
 
+@router.get("/export")
+def export_invoices(
+    admin=Depends(require_admin),
+    filters: dict = Depends(invoice_filters),
+    format: str = Query("csv", pattern="^(csv|parquet|ndjson)$")
+):
+    """Stream the invoice ledger (risk scores, fraud categories) as CSV, Parquet or NDJSON"""
+    try:
+        chunks = stream_invoice_export(format, filters)
+    except RuntimeError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+
+    media_type, extension = EXPORT_FORMATS[format]
+    return StreamingResponse(
+        chunks,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="invoices.{extension}"'},
+    )
+
+
 @router.get("/pending", response_model=List[InvoiceOut])
-def get_pending_invoices(
-    db: Session = Depends(get_db),
+async def get_pending_invoices(
+    db: AsyncSession = Depends(get_async_read_db),
     user=Depends(get_current_user)
 ):
     """Get all pending invoices for admin review"""
-    from app.models.invoice_model import Invoice
-    return db.query(Invoice).filter(Invoice.status == "pending").all()
+    return await list_pending_invoices_async(db)
@@ -1,10 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List
 
-from app.config.database import get_db
+from app.config.database import get_async_read_db, get_db
 from app.schemas.project_schema import ProjectCreate, ProjectUpdate, ProjectOut
-from app.services.project_service import create_project, list_projects, get_project, update_project
+from app.services.project_service import create_project, list_projects_async, get_project, update_project
 from app.utils.dependencies import require_admin
 
 router = APIRouter()
@@ -17,8 +18,8 @@ def create(data: ProjectCreate, db: Session = Depends(get_db), admin=Depends(req
 
 
 @router.get("/", response_model=List[ProjectOut])
-def get_all(db: Session = Depends(get_db)):
-    return list_projects(db)
+async def get_all(db: AsyncSession = Depends(get_async_read_db)):
+    return await list_projects_async(db)
 
 
 @router.get("/{project_id}", response_model=ProjectOut)
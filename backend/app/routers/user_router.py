@@ -1,20 +1,22 @@
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 
-from app.config.database import get_db
+from app.config.database import get_async_read_db
+from app.schemas.auth_schema import UserResponse
 from app.schemas.user_schema import UserBase
-from app.utils.helpers import get_current_user, require_admin
+from app.utils.dependencies import get_current_user, require_admin
 from app.models.user_model import User
 
 router = APIRouter()
 
 
 @router.get("/me", response_model=UserBase)
-def me(current_user: User = Depends(get_current_user)):
+def me(current_user: UserResponse = Depends(get_current_user)):
     return current_user
 
 
 @router.get("/", response_model=List[UserBase])
-def list_users(db: Session = Depends(get_db), admin=Depends(require_admin)):
-    return db.query(User).all()
+async def list_users(db: AsyncSession = Depends(get_async_read_db), admin=Depends(require_admin)):
+    return (await db.scalars(select(User))).all()
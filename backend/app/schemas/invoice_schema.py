@@ -1,5 +1,5 @@
-from pydantic import BaseModel, field_validator
-from typing import Optional
+from pydantic import BaseModel, Field, field_validator
+from typing import Optional, Any
 from datetime import datetime
 
 
@@ -42,3 +42,30 @@ class InvoiceOut(BaseModel):
 class InvoiceVerify(BaseModel):
     action: str  # "approve", "reject", "flag"
     notes: Optional[str] = None
+
+
+class InvoiceJobOut(BaseModel):
+    id: str
+    invoice_id: int
+    stage: str
+    progress: int
+    error: Optional[str] = None
+    result: Optional[dict[str, Any]] = None
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+class RescoreRequest(BaseModel):
+    """Filters (same as the invoice listing) and options for a bulk re-scoring run"""
+    status: Optional[str] = None
+    project_id: Optional[int] = None
+    vendor: Optional[str] = None
+    min_risk: Optional[int] = None
+    max_risk: Optional[int] = None
+    date_from: Optional[datetime] = None
+    date_to: Optional[datetime] = None
+    chunk_size: int = Field(5000, ge=100, le=50000)
+    dry_run: bool = False
@@ -1,26 +1,96 @@
 from pathlib import Path
-import random
+import threading
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from app.ai.preprocess import build_feature_matrix
 
 MODEL_PATH = Path("app/ai/model.pkl")
 
-# For now using a dummy scorer.
-# You can later load a real scikit-learn model from MODEL_PATH.
+# How often (seconds) to stat MODEL_PATH for a newer model
+MODEL_RELOAD_CHECK_SECONDS = 5.0
+
+# Loaded IsolationForest, reloaded when the file's mtime changes (e.g. after training)
+_model_state = {"model": None, "mtime": None, "checked": 0.0}
+_model_lock = threading.Lock()
+
+
+def get_model():
+    """The model at MODEL_PATH, loaded once per process; None until one has been trained"""
+    state = _model_state
+    now = time.monotonic()
+    if now - state["checked"] < MODEL_RELOAD_CHECK_SECONDS:
+        return state["model"]
+
+    with _model_lock:
+        if now - state["checked"] < MODEL_RELOAD_CHECK_SECONDS:
+            return state["model"]
+        try:
+            mtime = MODEL_PATH.stat().st_mtime
+        except FileNotFoundError:
+            mtime = None
 
+        if mtime != state["mtime"]:
+            try:
+                state["model"] = joblib.load(MODEL_PATH) if mtime is not None else None
+                state["mtime"] = mtime
+                if mtime is not None:
+                    print(f"Risk model loaded from {MODEL_PATH}")
+            except Exception as e:
+                # Keep the previous model (a half-written file is retried on the next check)
+                print(f"Risk model load error: {str(e)}")
+        state["checked"] = now
+        return state["model"]
 
-def score_invoice(amount: float, project_id: int, vendor_name: str):
+
+def risk_level(score: int) -> str:
+    if score >= 75:
+        return "high"
+    if score >= 40:
+        return "medium"
+    return "low"
+
+
+def decision_to_risk(decision: np.ndarray) -> np.ndarray:
     """
-    Returns (risk_score, risk_level)
-    Dummy logic: higher amounts => slightly higher risk.
+    Map IsolationForest decision_function values to 0-100 risk.
+    0 is the model's outlier threshold (-> 50); inliers score lower, outliers higher.
     """
-    base = min(max(amount / 100000 * 100, 5), 95)  # normalize
-    noise = random.randint(-10, 10)
-    score = int(min(max(base + noise, 0), 100))
+    return np.clip(np.rint(50 - decision * 100), 0, 100).astype(int)
 
-    if score >= 75:
-        level = "high"
-    elif score >= 40:
-        level = "medium"
+
+def score_invoices(invoices: list[dict]) -> list[tuple[int, str]]:
+    """
+    Score many invoices ({"amount", "project_id", "vendor_name"} plus the feature-store
+    features of each, see feature_service.get_invoice_features) with one vectorized
+    model call. Deterministic: the same inputs and model give the same scores.
+    """
+    if not invoices:
+        return []
+
+    df = pd.DataFrame(invoices)
+    df["amount"] = df["amount"].astype(float)
+
+    model = get_model()
+    if model is not None:
+        X = build_feature_matrix(df)
+        # Models trained on fewer features keep working after new ones are added
+        if hasattr(model, "feature_names_in_"):
+            X = X[list(model.feature_names_in_)]
+        scores = decision_to_risk(model.decision_function(X))
     else:
-        level = "low"
+        # No trained model yet: higher amounts => higher risk
+        scores = np.clip(df["amount"].to_numpy() / 100000 * 100, 5, 95).astype(int)
 
-    return score, level
+    return [(int(score), risk_level(int(score))) for score in scores]
+
+
+def score_invoice(amount: float, project_id: int, vendor_name: str, features: dict = None):
+    """
+    Returns (risk_score, risk_level)
+    """
+    invoice = {"amount": amount, "project_id": project_id, "vendor_name": vendor_name, **(features or {})}
+    return score_invoices([invoice])[0]
@@ -1,37 +1,63 @@
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from app.models.user_model import User
-from app.utils.hashing import hash_password, verify_password
+from app.utils.hashing import hash_password, run_password_hash, verify_and_update_password
 from app.utils.jwt_handler import create_access_token
-from app.schemas.auth_schema import UserCreate, UserLogin
+from app.schemas.auth_schema import UserCreate, UserLogin, UserResponse
 
 
-def register_user(db: Session, data: UserCreate) -> User:
-    existing = db.query(User).filter(User.email == data.email).first()
+def _get_user_by_email(db: Session, email: str) -> User | None:
+    return db.query(User).filter(User.email == email).first()
+
+
+def _add_user(db: Session, user: User) -> User:
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    return user
+
+
+def _upgrade_password_hash(db: Session, user: User, new_hash: str):
+    """Store a re-hashed password unless it was changed meanwhile (not a password change: tokens stay valid)"""
+    db.query(User).filter(User.id == user.id, User.password == user.password).update(
+        {"password": new_hash}, synchronize_session=False
+    )
+    db.commit()
+
+
+async def register_user(db: Session, data: UserCreate, client_ip: str = None) -> User:
+    existing = await run_in_threadpool(_get_user_by_email, db, data.email)
     if existing:
         raise ValueError("Email already registered")
 
+    password = await run_password_hash(hash_password, data.password, client_ip=client_ip, email=data.email)
     user = User(
         name=data.name,
         email=data.email,
-        password=hash_password(data.password),
+        password=password,
         role=data.role,
     )
-    db.add(user)
-    db.commit()
-    db.refresh(user)
-    return user
+    return await run_in_threadpool(_add_user, db, user)
 
 
-def login_user(db: Session, data: UserLogin) -> dict | None:
-    user = db.query(User).filter(User.email == data.email).first()
+async def login_user(db: Session, data: UserLogin, client_ip: str = None) -> dict | None:
+    user = await run_in_threadpool(_get_user_by_email, db, data.email)
     if not user:
         return None
 
-    if not verify_password(data.password, user.password):
+    valid, new_hash = await run_password_hash(
+        verify_and_update_password, data.password, user.password, client_ip=client_ip, email=data.email
+    )
+    if not valid:
         return None
 
-    token = create_access_token({"id": user.id, "email": user.email, "role": user.role})
+    profile = UserResponse.model_validate(user)  # read before the commit below expires `user`
+    if new_hash:
+        # Hashed with an older cost factor: upgrade it now that we know the password
+        await run_in_threadpool(_upgrade_password_hash, db, user, new_hash)
+
+    token = create_access_token({"id": profile.id, "email": profile.email, "role": profile.role})
     return {
         "access_token": token,
-        "user": user
+        "user": profile
     }
@@ -0,0 +1,303 @@
+import asyncio
+import csv
+import io
+import json
+import zipfile
+from itertools import islice
+from pathlib import PurePosixPath
+
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from sqlalchemy.orm import Session
+
+from app.config.database import SessionLocal
+from app.config.settings import settings
+from app.ocr.executor import run_invoice_ocr
+from app.schemas.invoice_schema import InvoiceCreate
+from app.services.feature_service import get_invoice_features, record_invoice
+from app.services.image_hash_service import BKTree, find_similar_invoices, register_image_hash
+from app.services.invoice_service import (
+    DUPLICATE_STATUSES,
+    UploadTooLarge,
+    assess_invoice,
+    build_invoice,
+    duplicate_key,
+    find_duplicate_keys,
+    invoice_feature_input,
+    store_invoice_stream,
+    verify_invoice,
+)
+
+MANIFEST_FIELDS = ["filename", "project_id", "invoice_number", "vendor_name", "amount"]
+
+# Most finished items saved by one bulk INSERT
+BATCH_INSERT_CHUNK = 100
+
+# Batches whose client disconnected, finishing in the background (referenced so they aren't collected)
+_detached_batches = set()
+
+
+def parse_manifest(content: bytes, filename: str) -> dict[str, dict]:
+    """
+    Read a CSV or JSON manifest of form fields, keyed by invoice file name.
+    CSV needs a header row; JSON is a list of objects. Both use MANIFEST_FIELDS.
+    """
+    text = content.decode("utf-8-sig")
+    if filename.lower().endswith(".json") or text.lstrip().startswith("["):
+        try:
+            rows = json.loads(text)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON manifest: {str(e)}")
+        if not isinstance(rows, list):
+            raise ValueError("JSON manifest must be a list of objects")
+    else:
+        rows = list(csv.DictReader(io.StringIO(text)))
+
+    manifest = {}
+    for row in rows:
+        if not isinstance(row, dict) or not row.get("filename"):
+            raise ValueError(f"Every manifest row needs {', '.join(MANIFEST_FIELDS)}")
+        manifest[PurePosixPath(str(row["filename"])).name] = row
+    return manifest
+
+
+def _iter_upload_entries(upload):
+    """(filename, stream) for an uploaded file, or for every file inside an uploaded ZIP"""
+    if upload.filename and upload.filename.lower().endswith(".zip"):
+        with zipfile.ZipFile(upload.file) as archive:
+            for info in archive.infolist():
+                name = PurePosixPath(info.filename)
+                if info.is_dir() or name.name.startswith(".") or "__MACOSX" in name.parts:
+                    continue
+                with archive.open(info) as stream:
+                    yield name.name, stream
+    else:
+        yield upload.filename, upload.file
+
+
+def prepare_batch(db: Session, uploads, manifest_upload, user_role: str) -> list[dict]:
+    """
+    Stream every file (and ZIP entry) to storage, pair it with its manifest row and
+    run the duplicate lookup for the whole batch in one query.
+    """
+    manifest = parse_manifest(manifest_upload.file.read(), manifest_upload.filename or "")
+
+    items = []
+    for upload in uploads:
+        for filename, stream in _iter_upload_entries(upload):
+            if len(items) >= settings.BATCH_MAX_ITEMS:
+                raise ValueError(f"Batch is limited to {settings.BATCH_MAX_ITEMS} invoices")
+
+            item = {"index": len(items), "filename": filename, "payload": None, "error": None}
+            items.append(item)
+
+            row = manifest.get(filename)
+            if row is None:
+                item["error"] = "No manifest row for this file"
+                continue
+            try:
+                item["payload"] = InvoiceCreate(**{field: row.get(field) for field in MANIFEST_FIELDS[1:]})
+                item["file_path"], item["file_hash"] = store_invoice_stream(stream, filename)
+            except ValidationError as e:
+                item["error"] = f"Invalid manifest row: {e.errors()[0]['msg']}"
+            except UploadTooLarge as e:
+                item["error"] = str(e)
+
+    # Duplicates: already stored, or repeated earlier in this batch
+    valid = [item for item in items if item["error"] is None]
+    seen = find_duplicate_keys(db, [item["payload"] for item in valid]) if user_role == "contractor" else set()
+    for item in valid:
+        key = duplicate_key(item["payload"])
+        item["is_duplicate"] = key in seen
+        if user_role == "contractor":
+            seen.add(key)
+
+    # Model features for the whole batch from the feature store
+    features = get_invoice_features(db, [invoice_feature_input(item["payload"]) for item in valid])
+    for item, item_features in zip(valid, features):
+        item["features"] = item_features
+    return items
+
+
+def _has_similar_image(image_hash: str | None) -> bool:
+    db = SessionLocal()
+    try:
+        return bool(find_similar_invoices(db, image_hash, DUPLICATE_STATUSES))
+    finally:
+        db.close()
+
+
+async def _process_item(item: dict, user_role: str, batch_hashes: BKTree) -> dict:
+    """OCR, verify and score one batch item"""
+    try:
+        ocr_output = await run_invoice_ocr(item["file_path"], item["file_hash"], background=True)
+        verification_result = await run_in_threadpool(
+            verify_invoice, item["file_path"], item["payload"], ocr_output
+        )
+
+        # Near-duplicate images: stored invoices, or items of this batch that finished first
+        image_hash = verification_result.get("image_hash")
+        if user_role == "contractor" and image_hash:
+            value = int(image_hash, 16)
+            if not item["is_duplicate"]:
+                item["is_duplicate"] = bool(batch_hashes.search(value, settings.IMAGE_HASH_MAX_DISTANCE))
+            batch_hashes.add(value, item["index"])
+            if not item["is_duplicate"]:
+                item["is_duplicate"] = await run_in_threadpool(_has_similar_image, image_hash)
+        # Model loading and scoring are CPU work: keep them off the event loop
+        assessment = await run_in_threadpool(
+            assess_invoice, None, item["payload"], verification_result, user_role,
+            is_duplicate=item["is_duplicate"], features=item["features"]
+        )
+        item["verification_result"] = verification_result
+        item["assessment"] = assessment
+    except Exception as e:
+        item["error"] = f"Processing failed: {str(e)}"
+    return item
+
+
+def _item_line(item: dict) -> str:
+    if item["error"]:
+        body = {"type": "item", "index": item["index"], "filename": item["filename"], "status": "error", "error": item["error"]}
+    else:
+        verification_result = item["verification_result"]
+        assessment = item["assessment"]
+        body = {
+            "type": "item",
+            "index": item["index"],
+            "filename": item["filename"],
+            "status": "processed",
+            "invoice_id": item["invoice_id"],
+            "invoice_status": assessment["status"],
+            "ocr_fields": verification_result["ocr_fields"],
+            "verification": verification_result["verification"],
+            "ai_risk": {
+                "score": assessment["risk_score"],
+                "level": assessment["risk_level"],
+                "fraud_score": verification_result["fraud_score"],
+                "fraud_category": assessment["fraud_category"],
+                "amount_mismatch_percentage": verification_result["amount_mismatch_percentage"],
+            },
+        }
+    return json.dumps(body) + "\n"
+
+
+def _insert_batch(items: list[dict], user_role: str, user_id: int):
+    """Insert processed items in one bulk INSERT and set each item's invoice_id"""
+    db = SessionLocal()
+    try:
+        invoices = [
+            build_invoice(
+                item["file_path"], item["payload"], item["verification_result"], item["assessment"],
+                user_role, user_id,
+            )
+            for item in items
+        ]
+        db.add_all(invoices)
+        for item in items:
+            payload = item["payload"]
+            record_invoice(db, payload.vendor_name, payload.project_id, payload.amount, item["assessment"]["status"])
+        db.commit()
+        for item, invoice in zip(items, invoices):
+            item["invoice_id"] = invoice.id
+            register_image_hash(invoice.id, invoice.image_hash)
+    finally:
+        db.close()
+
+
+def _store_items(items: list[dict], user_role: str, user_id: int):
+    """Save finished items; when the bulk INSERT fails, retry one by one so only the bad items error"""
+    try:
+        _insert_batch(items, user_role, user_id)
+        return
+    except Exception as e:
+        if len(items) == 1:
+            items[0]["error"] = f"Could not save invoice: {str(e)}"
+            return
+
+    for item in items:
+        try:
+            _insert_batch([item], user_role, user_id)
+        except Exception as e:
+            item["error"] = f"Could not save invoice: {str(e)}"
+
+
+async def _store_finished(items: list[dict], user_role: str, user_id: int):
+    for start in range(0, len(items), BATCH_INSERT_CHUNK):
+        await run_in_threadpool(_store_items, items[start:start + BATCH_INSERT_CHUNK], user_role, user_id)
+
+
+async def _process_bounded(queue, pending: set, user_role: str, batch_hashes: BKTree):
+    """
+    Yield lists of items as they finish, starting the next ones from `queue` so that at
+    most BATCH_MAX_IN_FLIGHT are in progress. `pending` holds the running tasks; whoever
+    takes over after an interruption passes the same queue and set to carry on.
+    """
+    while True:
+        for item in islice(queue, max(settings.BATCH_MAX_IN_FLIGHT - len(pending), 0)):
+            pending.add(asyncio.create_task(_process_item(item, user_role, batch_hashes)))
+        if not pending:
+            return
+        done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        pending -= done
+        yield [task.result() for task in done]
+
+
+async def _finish_detached(queue, pending: set, user_role: str, user_id: int, batch_hashes: BKTree):
+    """Process and save the items not yet reported when the client went away"""
+    saved = 0
+    try:
+        async for finished in _process_bounded(queue, pending, user_role, batch_hashes):
+            finished = [item for item in finished if not item["error"]]
+            await _store_finished(finished, user_role, user_id)
+            saved += len(finished)
+        print(f"Batch upload: saved {saved} invoice(s) finished after the client disconnected")
+    except Exception as e:
+        print(f"Batch upload: error finishing a disconnected batch: {str(e)}")
+
+
+async def stream_batch(items: list[dict], user_role: str, user_id: int):
+    """
+    Run the items a few at a time (BATCH_MAX_IN_FLIGHT) on the background OCR slots and
+    yield one NDJSON line per item once it is saved. Items that finish together are
+    saved in one bulk INSERT, so a client that disconnects keeps everything already
+    reported; the rest of the batch then finishes and is saved in the background.
+    """
+    processed = []
+    failed = 0
+
+    for item in items:
+        if item["error"]:
+            failed += 1
+            yield _item_line(item)
+
+    batch_hashes = BKTree()
+    queue = iter([item for item in items if not item["error"]])
+    pending = set()
+    complete = False
+    try:
+        async for finished in _process_bounded(queue, pending, user_role, batch_hashes):
+            await _store_finished([item for item in finished if not item["error"]], user_role, user_id)
+
+            for item in finished:
+                if item["error"]:
+                    failed += 1
+                else:
+                    processed.append(item)
+                yield _item_line(item)
+        complete = True
+    finally:
+        if not complete:
+            task = asyncio.create_task(_finish_detached(queue, pending, user_role, user_id, batch_hashes))
+            _detached_batches.add(task)
+            task.add_done_callback(_detached_batches.discard)
+
+    yield json.dumps({
+        "type": "summary",
+        "processed": len(processed),
+        "failed": failed,
+        "invoices": [
+            {"index": item["index"], "filename": item["filename"], "invoice_id": item["invoice_id"]}
+            for item in sorted(processed, key=lambda item: item["index"])
+        ],
+    }) + "\n"
@@ -0,0 +1,178 @@
+import csv
+import io
+import json
+
+# Optional: Parquet export needs pyarrow; CSV and NDJSON work without it
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+from app.config.database import ReadSessionLocal
+from app.models.invoice_model import Invoice
+from app.services.invoice_service import filter_invoices
+
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+# Rows fetched per round trip (server-side cursor) and rows per Parquet row group
+FETCH_ROWS = 2000
+PARQUET_ROW_GROUP_ROWS = 50000
+
+EXPORT_COLUMNS = [
+    Invoice.id,
+    Invoice.project_id,
+    Invoice.invoice_number,
+    Invoice.vendor_name,
+    Invoice.amount,
+    Invoice.risk_score,
+    Invoice.risk_level,
+    Invoice.fraud_category,
+    Invoice.amount_mismatch_percentage,
+    Invoice.status,
+    Invoice.uploaded_by,
+    Invoice.submitted_by_user_id,
+    Invoice.verified_by_user_id,
+    Invoice.created_at,
+    Invoice.verified_at,
+    Invoice.admin_notes,
+]
+EXPORT_FIELDS = [column.key for column in EXPORT_COLUMNS]
+NUMERIC_FIELDS = ["amount", "amount_mismatch_percentage"]  # Numeric -> float
+
+
+def _iter_rows(filters: dict):
+    """Ledger rows as plain tuples, streamed FETCH_ROWS at a time in listing order"""
+    db = ReadSessionLocal()
+    try:
+        query = filter_invoices(db.query(*EXPORT_COLUMNS), **filters)
+        query = query.order_by(Invoice.created_at.desc(), Invoice.id.desc())
+        yield from query.execution_options(stream_results=True).yield_per(FETCH_ROWS)
+    finally:
+        db.close()
+
+
+def _plain(row) -> dict:
+    record = dict(zip(EXPORT_FIELDS, row))
+    for key in NUMERIC_FIELDS:
+        if record[key] is not None:
+            record[key] = float(record[key])
+    for key in ("created_at", "verified_at"):
+        if record[key] is not None:
+            record[key] = record[key].isoformat()
+    return record
+
+
+def _export_csv(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    for count, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if count % FETCH_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _export_ndjson(rows):
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(_plain(row)))
+        if len(lines) == FETCH_ROWS:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands written bytes back to the response instead of keeping them"""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _parquet_schema():
+    return pa.schema([
+        ("id", pa.int64()),
+        ("project_id", pa.int64()),
+        ("invoice_number", pa.string()),
+        ("vendor_name", pa.string()),
+        ("amount", pa.float64()),
+        ("risk_score", pa.int32()),
+        ("risk_level", pa.string()),
+        ("fraud_category", pa.string()),
+        ("amount_mismatch_percentage", pa.float64()),
+        ("status", pa.string()),
+        ("uploaded_by", pa.string()),
+        ("submitted_by_user_id", pa.int64()),
+        ("verified_by_user_id", pa.int64()),
+        ("created_at", pa.timestamp("us")),
+        ("verified_at", pa.timestamp("us")),
+        ("admin_notes", pa.string()),
+    ])
+
+
+def _export_parquet(rows):
+    """One row group per PARQUET_ROW_GROUP_ROWS rows; each is flushed to the client when written"""
+    schema = _parquet_schema()
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="snappy")
+
+    def write_group(batch):
+        columns = list(zip(*batch))
+        for index in (EXPORT_FIELDS.index(key) for key in NUMERIC_FIELDS):
+            columns[index] = [None if value is None else float(value) for value in columns[index]]
+        writer.write_table(pa.Table.from_arrays(
+            [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+            schema=schema,
+        ))
+
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == PARQUET_ROW_GROUP_ROWS:
+            write_group(batch)
+            batch = []
+            yield sink.drain()
+    if batch:
+        write_group(batch)
+    writer.close()
+    yield sink.drain()
+
+
+def stream_invoice_export(export_format: str, filters: dict):
+    """Generator of response chunks for GET /invoices/export (runs on the threadpool)"""
+    if export_format == "parquet" and pq is None:
+        raise RuntimeError("Parquet export needs pyarrow installed")
+
+    rows = _iter_rows(filters)
+    if export_format == "csv":
+        return _export_csv(rows)
+    if export_format == "ndjson":
+        return _export_ndjson(rows)
+    return _export_parquet(rows)
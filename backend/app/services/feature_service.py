@@ -0,0 +1,205 @@
+from datetime import datetime, timedelta
+import math
+
+from sqlalchemy import Float, case, cast, func
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from app.models.feature_store_model import ProjectStats, VendorStats
+from app.models.invoice_model import Invoice
+from app.models.project_model import Project
+from app.utils.normalize import normalize_vendor_name
+
+# Vendor amount mean/variance are plain averages for the first 1/ALPHA invoices,
+# then exponentially weighted with ALPHA so they follow recent prices
+VENDOR_AMOUNT_ALPHA = 0.05
+# Project spend velocity is measured over tumbling windows of this length
+VELOCITY_WINDOW = timedelta(days=30)
+# Statuses counted per vendor (admin decisions and auto-flags)
+COUNTED_STATUSES = {"approved": "approved_count", "rejected": "rejected_count", "flagged": "flagged_count"}
+
+
+def _insert(db: Session):
+    """Dialect insert() that supports ON CONFLICT upserts"""
+    return postgresql_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+
+
+# ------------------------------
+# Incremental updates (same transaction as the invoice write, caller commits)
+# ------------------------------
+def record_invoice(db: Session, vendor_name: str, project_id: int, amount: float, status: str, created_at: datetime = None):
+    """Fold a newly inserted invoice into its vendor's and project's stats"""
+    amount = float(amount)
+    now = created_at or datetime.utcnow()
+
+    # Every right-hand side reads the row's old values, so concurrent workers can't lose updates
+    statement = _insert(db)(VendorStats).values(
+        vendor_key=normalize_vendor_name(vendor_name),
+        invoice_count=1,
+        amount_mean=amount,
+        amount_var=0.0,
+        updated_at=now,
+        **{column: int(status == counted) for counted, column in COUNTED_STATUSES.items()},
+    )
+    alpha = case(
+        (VendorStats.invoice_count + 1 < 1 / VENDOR_AMOUNT_ALPHA, 1.0 / (VendorStats.invoice_count + 1)),
+        else_=VENDOR_AMOUNT_ALPHA,
+    )
+    delta = amount - VendorStats.amount_mean
+    update = {
+        "invoice_count": VendorStats.invoice_count + 1,
+        "amount_mean": VendorStats.amount_mean + alpha * delta,
+        "amount_var": (1 - alpha) * (VendorStats.amount_var + alpha * delta * delta),
+        "updated_at": now,
+    }
+    if status in COUNTED_STATUSES:
+        column = COUNTED_STATUSES[status]
+        update[column] = getattr(VendorStats, column) + 1
+    db.execute(statement.on_conflict_do_update(index_elements=[VendorStats.vendor_key], set_=update))
+
+    window_open = ProjectStats.window_start > now - VELOCITY_WINDOW
+    statement = _insert(db)(ProjectStats).values(
+        project_id=project_id,
+        invoice_count=1,
+        amount_total=amount,
+        window_start=now,
+        window_spend=amount,
+        updated_at=now,
+    )
+    db.execute(statement.on_conflict_do_update(index_elements=[ProjectStats.project_id], set_={
+        "invoice_count": ProjectStats.invoice_count + 1,
+        "amount_total": ProjectStats.amount_total + amount,
+        "window_spend": case((window_open, ProjectStats.window_spend + amount), else_=amount),
+        "window_start": case((window_open, ProjectStats.window_start), else_=now),
+        "updated_at": now,
+    }))
+
+
+def record_status_change(db: Session, vendor_name: str, old_status: str, new_status: str):
+    """Move one invoice between the vendor's approved/rejected/flagged counters"""
+    if old_status == new_status:
+        return
+
+    update = {}
+    if old_status in COUNTED_STATUSES:
+        column = COUNTED_STATUSES[old_status]
+        update[column] = case((getattr(VendorStats, column) > 0, getattr(VendorStats, column) - 1), else_=0)
+    if new_status in COUNTED_STATUSES:
+        column = COUNTED_STATUSES[new_status]
+        update[column] = getattr(VendorStats, column) + 1
+    if update:
+        db.query(VendorStats).filter(
+            VendorStats.vendor_key == normalize_vendor_name(vendor_name)
+        ).update(update, synchronize_session=False)
+
+
+# ------------------------------
+# Reads for the risk model
+# ------------------------------
+def get_invoice_features(db: Session, invoices: list[dict], stored: bool = False) -> list[dict]:
+    """
+    Model features for invoices ({"amount", "project_id", "vendor_name"} each) from the
+    stored stats: primary-key lookups only, batched into one query per table.
+    stored=True is for invoices already folded into the stats (training on history, with
+    "status" in each dict): their own count and decision are left out of the vendor
+    features, so they look the way a new upload does at scoring time.
+    """
+    vendor_keys = {normalize_vendor_name(invoice["vendor_name"]) for invoice in invoices}
+    project_ids = {invoice["project_id"] for invoice in invoices}
+
+    vendors = {
+        row.vendor_key: row
+        for row in db.query(VendorStats).filter(VendorStats.vendor_key.in_(vendor_keys))
+    } if vendor_keys else {}
+    projects = {
+        row.project_id: row
+        for row in db.query(ProjectStats).filter(ProjectStats.project_id.in_(project_ids))
+    } if project_ids else {}
+    budgets = {
+        row.id: (float(row.budget or 0), float(row.utilized or 0))
+        for row in db.query(Project.id, Project.budget, Project.utilized).filter(Project.id.in_(project_ids))
+    } if project_ids else {}
+
+    now = datetime.utcnow()
+    features = []
+    for invoice in invoices:
+        amount = float(invoice["amount"])
+        vendor = vendors.get(normalize_vendor_name(invoice["vendor_name"]))
+        project = projects.get(invoice["project_id"])
+        budget, utilized = budgets.get(invoice["project_id"], (0.0, 0.0))
+
+        vendor_count = vendor.invoice_count if vendor else 0
+        vendor_std = math.sqrt(vendor.amount_var) if vendor and vendor.amount_var > 0 else 0.0
+        decided = (vendor.approved_count + vendor.rejected_count + vendor.flagged_count) if vendor else 0
+        rejected = (vendor.rejected_count + vendor.flagged_count) if vendor else 0
+        if stored and vendor:
+            vendor_count = max(vendor_count - 1, 0)
+            if invoice.get("status") in COUNTED_STATUSES:
+                decided = max(decided - 1, 0)
+                if invoice["status"] != "approved":
+                    rejected = max(rejected - 1, 0)
+
+        velocity = 0.0
+        if project and project.window_start and project.window_start > now - VELOCITY_WINDOW:
+            days = max((now - project.window_start).total_seconds() / 86400, 1.0)
+            velocity = project.window_spend / days
+
+        features.append({
+            "vendor_frequency": vendor_count,
+            "vendor_amount_zscore": (amount - vendor.amount_mean) / vendor_std if vendor_std else 0.0,
+            "vendor_rejection_rate": rejected / decided if decided else 0.0,
+            "project_spend_velocity": velocity,
+            "project_budget_utilization": utilized / budget if budget else 0.0,
+            "amount_to_budget": amount / budget if budget else 0.0,
+        })
+    return features
+
+
+# ------------------------------
+# Full rebuild (initial backfill, or after bulk imports that bypass record_invoice)
+# ------------------------------
+def rebuild_feature_store(db: Session):
+    """Recompute every vendor and project row from the invoices table (exact mean/variance)"""
+    now = datetime.utcnow()
+    db.query(VendorStats).delete()
+    db.query(ProjectStats).delete()
+
+    amount = cast(Invoice.amount, Float)
+    vendor_rows = db.query(
+        Invoice.vendor_key,
+        func.count(Invoice.id),
+        func.avg(amount),
+        func.avg(amount * amount),
+        *[func.sum(case((Invoice.status == status, 1), else_=0)) for status in COUNTED_STATUSES],
+    ).filter(Invoice.vendor_key.isnot(None)).group_by(Invoice.vendor_key)
+    for vendor_key, count, mean, mean_sq, approved, rejected, flagged in vendor_rows:
+        db.add(VendorStats(
+            vendor_key=vendor_key,
+            invoice_count=count,
+            amount_mean=float(mean or 0),
+            amount_var=max(float(mean_sq or 0) - float(mean or 0) ** 2, 0.0),
+            approved_count=int(approved or 0),
+            rejected_count=int(rejected or 0),
+            flagged_count=int(flagged or 0),
+            updated_at=now,
+        ))
+
+    in_window = Invoice.created_at > now - VELOCITY_WINDOW
+    project_rows = db.query(
+        Invoice.project_id,
+        func.count(Invoice.id),
+        func.sum(amount),
+        func.min(case((in_window, Invoice.created_at))),
+        func.sum(case((in_window, amount), else_=0)),
+    ).group_by(Invoice.project_id)
+    for project_id, count, total, window_start, window_spend in project_rows:
+        db.add(ProjectStats(
+            project_id=project_id,
+            invoice_count=count,
+            amount_total=float(total or 0),
+            window_start=window_start,
+            window_spend=float(window_spend or 0),
+            updated_at=now,
+        ))
+    db.commit()
@@ -1,16 +1,123 @@
+import threading
+import time
+
+from sqlalchemy import event, func
 from sqlalchemy.orm import Session
+
+from app.config.database import ReadSessionLocal, SessionLocal
+from app.config.settings import settings
 from app.models.invoice_model import Invoice
 
+# Cached summary, rebuilt from the primary after invoice writes commit (in this process) or
+# from the read replica after the TTL (writes from other workers). `generation` moves on
+# every invalidation so a rebuild that raced with a write is never served.
+_summary_cache = {"generation": 0, "built_generation": -1, "expires": 0.0, "value": None}
+_summary_lock = threading.Lock()
+
+
+def invalidate_fraud_summary():
+    _summary_cache["generation"] += 1
+
+
+@event.listens_for(Session, "after_flush")
+def _track_invoice_writes(session, flush_context):
+    if any(isinstance(obj, Invoice) for obj in (*session.new, *session.dirty, *session.deleted)):
+        session.info["invoices_changed"] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _track_invoice_bulk_writes(orm_execute_state):
+    if (orm_execute_state.is_update or orm_execute_state.is_delete) and any(
+        mapper.class_ is Invoice for mapper in orm_execute_state.all_mappers
+    ):
+        orm_execute_state.session.info["invoices_changed"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_on_commit(session):
+    if session.info.pop("invoices_changed", False):
+        invalidate_fraud_summary()
+
 
-def get_fraud_summary(db: Session):
-    total = db.query(Invoice).count()
-    high = db.query(Invoice).filter(Invoice.risk_level == "high").count()
-    medium = db.query(Invoice).filter(Invoice.risk_level == "medium").count()
-    low = db.query(Invoice).filter(Invoice.risk_level == "low").count()
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back_writes(session):
+    session.info.pop("invoices_changed", None)
+
+
+def compute_fraud_summary(db: Session) -> dict:
+    """All summary counts from one GROUP BY over (risk_level, fraud_category, status, project)"""
+    rows = db.query(
+        Invoice.risk_level,
+        Invoice.fraud_category,
+        Invoice.status,
+        Invoice.project_id,
+        func.count(Invoice.id),
+    ).group_by(
+        Invoice.risk_level, Invoice.fraud_category, Invoice.status, Invoice.project_id
+    ).all()
+
+    by_risk_level = {"high": 0, "medium": 0, "low": 0}
+    by_fraud_category = {}
+    by_status = {}
+    by_project = {}
+    total = 0
+    for risk_level, fraud_category, status, project_id, count in rows:
+        total += count
+        if risk_level in by_risk_level:
+            by_risk_level[risk_level] += count
+        category = fraud_category or "none"
+        by_fraud_category[category] = by_fraud_category.get(category, 0) + count
+        by_status[status] = by_status.get(status, 0) + count
+
+        project = by_project.setdefault(project_id, {"project_id": project_id, "total": 0, "high_risk": 0, "flagged": 0})
+        project["total"] += count
+        if risk_level == "high":
+            project["high_risk"] += count
+        if status == "flagged":
+            project["flagged"] += count
 
     return {
         "total_invoices": total,
-        "high_risk": high,
-        "medium_risk": medium,
-        "low_risk": low,
+        "high_risk": by_risk_level["high"],
+        "medium_risk": by_risk_level["medium"],
+        "low_risk": by_risk_level["low"],
+        "by_fraud_category": by_fraud_category,
+        "by_status": by_status,
+        "by_project": sorted(by_project.values(), key=lambda project: project["project_id"]),
     }
+
+
+def get_cached_fraud_summary() -> dict | None:
+    """The cached summary while it is current, else None (no IO, safe on the event loop)"""
+    cache = _summary_cache
+    if cache["built_generation"] == cache["generation"] and cache["expires"] > time.monotonic():
+        return cache["value"]
+    return None
+
+
+def get_fraud_summary(db: Session = None):
+    """Dashboard summary; served from cache unless invoices changed since it was built"""
+    cache = _summary_cache
+    if cache["built_generation"] == cache["generation"] and cache["expires"] > time.monotonic():
+        return cache["value"]
+
+    with _summary_lock:
+        # Another request may have rebuilt it while we waited
+        if cache["built_generation"] == cache["generation"] and cache["expires"] > time.monotonic():
+            return cache["value"]
+
+        generation = cache["generation"]
+        if db is None:
+            # After a write in this process the replica may not have it yet, so that rebuild
+            # reads the primary; the replica serves rebuilds that only follow the TTL
+            written = generation > 0 and cache["built_generation"] != generation
+            with (SessionLocal if written else ReadSessionLocal)() as read_db:
+                value = compute_fraud_summary(read_db)
+        else:
+            value = compute_fraud_summary(db)
+        cache.update(
+            value=value,
+            built_generation=generation,
+            expires=time.monotonic() + settings.FRAUD_SUMMARY_TTL_SECONDS,
+        )
+        return value
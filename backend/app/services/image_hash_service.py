@@ -0,0 +1,176 @@
+from pathlib import Path
+import threading
+
+from sqlalchemy.orm import Session
+
+from app.config.database import SessionLocal
+from app.config.settings import settings
+from app.models.invoice_model import Invoice
+from app.ocr.invoice_ocr import compute_image_hash
+from app.ocr.phash import hamming_distance
+
+# Invoices hashed per commit by backfill_image_hashes
+BACKFILL_CHUNK_SIZE = 500
+
+
+class BKTree:
+    """Burkhard-Keller tree over integer hashes with Hamming distance"""
+
+    def __init__(self):
+        self._root = None  # [hash, [invoice ids], {distance: child}]
+        self.size = 0
+
+    def add(self, value: int, item):
+        self.size += 1
+        if self._root is None:
+            self._root = [value, [item], {}]
+            return
+        node = self._root
+        while True:
+            distance = hamming_distance(value, node[0])
+            if distance == 0:
+                node[1].append(item)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value, [item], {}]
+                return
+            node = child
+
+    def search(self, value: int, radius: int) -> list[tuple[int, object]]:
+        """(distance, item) for every stored hash within `radius` of `value`"""
+        matches = []
+        stack = [self._root] if self._root is not None else []
+        while stack:
+            node = stack.pop()
+            distance = hamming_distance(value, node[0])
+            if distance <= radius:
+                matches.extend((distance, item) for item in node[1])
+            # Triangle inequality: only children in [d - r, d + r] can hold matches
+            for child_distance, child in node[2].items():
+                if distance - radius <= child_distance <= distance + radius:
+                    stack.append(child)
+        return matches
+
+
+# Process-wide index of stored invoice hashes, filled from the DB on first use
+_tree = BKTree()
+_indexed_ids = set()
+_last_loaded_id = 0
+# Deferred uploads past the watermark whose hash is written once their OCR job finishes
+_processing_ids = set()
+_lock = threading.Lock()
+
+
+def _add(invoice_id: int, image_hash: str):
+    if invoice_id not in _indexed_ids:
+        _indexed_ids.add(invoice_id)
+        _tree.add(int(image_hash, 16), invoice_id)
+
+
+def _index_row(invoice_id: int, image_hash: str | None, status: str):
+    if image_hash:
+        _add(invoice_id, image_hash)
+    if status == "processing":
+        _processing_ids.add(invoice_id)
+    else:
+        # The job sets the hash and the final status in one commit
+        _processing_ids.discard(invoice_id)
+
+
+def _refresh(db: Session):
+    """
+    Pull hashes of invoices inserted since the last lookup (also by other workers),
+    and of deferred uploads whose job has finished since (possibly on another worker)
+    """
+    global _last_loaded_id
+    pending = sorted(_processing_ids)
+    for start in range(0, len(pending), 500):
+        batch = pending[start:start + 500]
+        rows = db.query(Invoice.id, Invoice.image_hash, Invoice.status).filter(Invoice.id.in_(batch)).all()
+        for invoice_id, image_hash, status in rows:
+            _index_row(invoice_id, image_hash, status)
+        # Deleted while processing
+        _processing_ids.difference_update(set(batch) - {row[0] for row in rows})
+
+    rows = db.query(Invoice.id, Invoice.image_hash, Invoice.status).filter(
+        Invoice.id > _last_loaded_id
+    ).order_by(Invoice.id).yield_per(5000)
+    for invoice_id, image_hash, status in rows:
+        _index_row(invoice_id, image_hash, status)
+        _last_loaded_id = invoice_id
+
+
+def register_image_hash(invoice_id: int, image_hash: str | None):
+    """Index a hash set after insert (deferred ingestion fills it in once OCR finishes)"""
+    if image_hash:
+        with _lock:
+            _add(invoice_id, image_hash)
+
+
+def find_similar_invoices(
+    db: Session,
+    image_hash: str | None,
+    statuses: list[str],
+    exclude_invoice_id: int = None
+) -> list[int]:
+    """Ids of invoices in `statuses` whose image is within IMAGE_HASH_MAX_DISTANCE bits, closest first"""
+    if not image_hash:
+        return []
+
+    with _lock:
+        _refresh(db)
+        matches = _tree.search(int(image_hash, 16), settings.IMAGE_HASH_MAX_DISTANCE)
+
+    candidate_ids = [invoice_id for _, invoice_id in sorted(matches) if invoice_id != exclude_invoice_id]
+    if not candidate_ids:
+        return []
+
+    # Status changes after indexing, so filter the handful of candidates by primary key
+    rows = db.query(Invoice.id).filter(
+        Invoice.id.in_(candidate_ids[:500]),
+        Invoice.status.in_(statuses)
+    ).all()
+    found = {row[0] for row in rows}
+    return [invoice_id for invoice_id in candidate_ids if invoice_id in found]
+
+
+def backfill_image_hashes(chunk_size: int = BACKFILL_CHUNK_SIZE) -> tuple[int, int]:
+    """
+    Hash the stored files of invoices uploaded before image_hash existed, a chunk per
+    commit. Missing or unreadable files are left unhashed. Returns (hashed, checked).
+    """
+    hashed = checked = 0
+    last_id = 0
+    db = SessionLocal()
+    try:
+        while True:
+            rows = db.query(Invoice.id, Invoice.file_path).filter(
+                Invoice.id > last_id,
+                Invoice.image_hash.is_(None),
+                # Deferred uploads get their hash when their OCR job finishes
+                Invoice.status != "processing",
+            ).order_by(Invoice.id).limit(chunk_size).all()
+            if not rows:
+                break
+
+            updates = []
+            for invoice_id, file_path in rows:
+                image_hash = None
+                # Paths are relative to the backend directory; uploads made on Windows use backslashes
+                path = Path(file_path.replace("\\", "/")) if file_path else None
+                if path is not None and path.exists():
+                    image_hash = compute_image_hash(str(path))
+                if image_hash:
+                    updates.append({"id": invoice_id, "image_hash": image_hash})
+            if updates:
+                db.bulk_update_mappings(Invoice, updates)
+            db.commit()
+
+            hashed += len(updates)
+            checked += len(rows)
+            last_id = rows[-1].id
+            print(f"  {checked} invoices checked, {hashed} hashed")
+        return hashed, checked
+    finally:
+        db.close()
@@ -0,0 +1,129 @@
+import asyncio
+from datetime import datetime, timedelta
+import json
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, or_, update
+from sqlalchemy.orm import Session
+
+from app.config.database import SessionLocal
+from app.config.settings import settings
+from app.models.invoice_job_model import InvoiceJob
+from app.models.invoice_model import Invoice
+from app.ocr.executor import run_invoice_ocr
+from app.schemas.invoice_schema import InvoiceJobOut
+from app.services.invoice_service import (
+    TERMINAL_STAGES,
+    JobFinished,
+    complete_invoice_job,
+    fail_invoice_job,
+    get_invoice_job,
+    job_worker_id,
+    update_invoice_job,
+)
+
+EVENT_POLL_SECONDS = 1.0
+
+
+def _get_job_file_path(db, job_id: str) -> str:
+    job = get_invoice_job(db, job_id)
+    invoice = db.query(Invoice).filter(Invoice.id == job.invoice_id).first()
+    return invoice.file_path
+
+
+async def run_ingestion_job(job_id: str, file_hash: str = None):
+    """Background pipeline: OCR on the worker pool, then verification, duplicate check and scoring"""
+    db = SessionLocal()
+    try:
+        file_path = await run_in_threadpool(_get_job_file_path, db, job_id)
+        await run_in_threadpool(update_invoice_job, db, job_id, "ocr", 10)
+
+        # Accepted jobs wait for a background OCR slot instead of being rejected
+        ocr_output = await run_invoice_ocr(file_path, file_hash, background=True)
+
+        await run_in_threadpool(complete_invoice_job, db, job_id, ocr_output)
+    except JobFinished:
+        print(f"Invoice ingestion job {job_id} was finished elsewhere; dropping its result")
+    except Exception as e:
+        print(f"Invoice ingestion job {job_id} failed: {str(e)}")
+        await run_in_threadpool(fail_invoice_job, db, job_id, str(e))
+    finally:
+        db.close()
+
+
+def touch_owned_jobs(db: Session) -> int:
+    """Heartbeat every unfinished job this process owns, running or still waiting for OCR"""
+    result = db.execute(
+        update(InvoiceJob)
+        .where(InvoiceJob.owner == job_worker_id(), InvoiceJob.stage.notin_(TERMINAL_STAGES))
+        # A heartbeat is not progress: keep updated_at (and the job's event stream) as it was
+        .values(heartbeat_at=datetime.utcnow(), updated_at=InvoiceJob.updated_at)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return result.rowcount
+
+
+def fail_stale_jobs(db: Session) -> int:
+    """
+    Fail unfinished jobs whose owner stopped heartbeating INGESTION_STALE_JOB_MINUTES ago.
+    Background tasks die with their process, so those jobs would stay "processing" forever;
+    their invoices go to an admin for manual review like any other failed job. Jobs of live
+    workers are left alone however long they wait for OCR.
+    """
+    cutoff = datetime.utcnow() - timedelta(minutes=settings.INGESTION_STALE_JOB_MINUTES)
+    job_ids = [row.id for row in db.query(InvoiceJob.id).filter(
+        InvoiceJob.stage.notin_(TERMINAL_STAGES),
+        or_(InvoiceJob.owner.is_(None), InvoiceJob.owner != job_worker_id()),
+        # Jobs from before owners were recorded only have updated_at to go by
+        func.coalesce(InvoiceJob.heartbeat_at, InvoiceJob.updated_at, InvoiceJob.created_at) < cutoff,
+    ).all()]
+    # fail_invoice_job skips a job that finished since the query
+    failed = 0
+    for job_id in job_ids:
+        job = fail_invoice_job(db, job_id, "Processing was interrupted: its worker stopped")
+        failed += job.stage == "failed"
+    return failed
+
+
+async def watch_ingestion_jobs():
+    """Every INGESTION_HEARTBEAT_SECONDS: heartbeat this process's jobs and recover orphaned ones"""
+    while True:
+        db = SessionLocal()
+        try:
+            await run_in_threadpool(touch_owned_jobs, db)
+            failed = await run_in_threadpool(fail_stale_jobs, db)
+            if failed:
+                print(f"⚠️ Marked {failed} orphaned invoice job(s) as failed")
+        except Exception as e:
+            print(f"⚠️ Error checking invoice jobs: {e}")
+        finally:
+            db.close()
+        await asyncio.sleep(settings.INGESTION_HEARTBEAT_SECONDS)
+
+
+def _load_job_snapshot(job_id: str) -> dict | None:
+    db = SessionLocal()
+    try:
+        job = get_invoice_job(db, job_id)
+        return InvoiceJobOut.model_validate(job).model_dump(mode="json") if job else None
+    finally:
+        db.close()
+
+
+async def stream_job_events(job_id: str):
+    """Server-sent events with the job state, emitted on every change until it finishes"""
+    last_sent = None
+    while True:
+        snapshot = await run_in_threadpool(_load_job_snapshot, job_id)
+        if snapshot is None:
+            yield "event: error\ndata: {\"detail\": \"Job not found\"}\n\n"
+            return
+
+        if snapshot != last_sent:
+            yield f"event: progress\ndata: {json.dumps(snapshot)}\n\n"
+            last_sent = snapshot
+
+        if snapshot["stage"] in TERMINAL_STAGES:
+            return
+        await asyncio.sleep(EVENT_POLL_SECONDS)
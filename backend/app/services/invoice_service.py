@@ -1,36 +1,87 @@
+from datetime import datetime
 from pathlib import Path
-from sqlalchemy.orm import Session
+from sqlalchemy import Select, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Query, Session
+import base64
+import hashlib
 import os
-import re
+import socket
 from uuid import uuid4
 
+from app.config.settings import settings
 from app.models.invoice_model import Invoice
+from app.models.invoice_job_model import InvoiceJob
 from app.schemas.invoice_schema import InvoiceCreate
 from app.ocr.invoice_ocr import process_invoice_ocr
 from app.services.ai_service import score_invoice
+from app.services.feature_service import get_invoice_features, record_invoice, record_status_change
+from app.services.image_hash_service import find_similar_invoices, register_image_hash
+from app.utils.normalize import invoice_number_digits, normalize_invoice_number, normalize_vendor_name
 
 UPLOAD_DIR = Path("uploads/invoices")
+# Rejected/flagged invoices don't count as duplicates
+DUPLICATE_STATUSES = ["approved", "pending"]
+UPLOAD_CHUNK_SIZE = 1024 * 1024
 
 
-def save_invoice_file(file) -> str:
-    """Save uploaded file with unique filename"""
+class UploadTooLarge(ValueError):
+    """Raised when an upload exceeds MAX_UPLOAD_BYTES"""
+
+
+def save_invoice_file(file) -> tuple[str, str]:
+    """
+    Stream an uploaded file to content-addressed storage.
+    Returns (file_path, sha256); identical uploads share one file on disk.
+    """
+    return store_invoice_stream(file.file, file.filename)
+
+
+def store_invoice_stream(stream, filename: str) -> tuple[str, str]:
+    """Content-addressed write of any readable binary stream (upload body, ZIP entry)"""
     UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
-    
-    # Generate unique filename
-    file_extension = file.filename.split('.')[-1] if '.' in file.filename else 'jpg'
-    unique_filename = f"{uuid4()}.{file_extension}"
-    file_path = UPLOAD_DIR / unique_filename
-    
-    with open(file_path, "wb") as f:
-        f.write(file.file.read())
-    return str(file_path)
 
+    file_extension = filename.rsplit('.', 1)[-1].lower() if filename and '.' in filename else 'jpg'
+    if not file_extension.isalnum() or len(file_extension) > 5:
+        file_extension = 'jpg'
+
+    # Write to a temp file while hashing, enforcing the size limit chunk by chunk
+    digest = hashlib.sha256()
+    size = 0
+    temp_path = UPLOAD_DIR / f".{uuid4()}.part"
+    try:
+        with open(temp_path, "wb") as f:
+            for chunk in iter(lambda: stream.read(UPLOAD_CHUNK_SIZE), b""):
+                size += len(chunk)
+                if size > settings.MAX_UPLOAD_BYTES:
+                    raise UploadTooLarge(
+                        f"File is too large (max {settings.MAX_UPLOAD_BYTES // (1024 * 1024)} MB)"
+                    )
+                digest.update(chunk)
+                f.write(chunk)
+
+        file_hash = digest.hexdigest()
+        hash_dir = UPLOAD_DIR / file_hash[:2]
+        existing = next(hash_dir.glob(f"{file_hash}.*"), None) if hash_dir.exists() else None
+        if existing is not None:
+            file_path = existing
+        else:
+            file_path = hash_dir / f"{file_hash}.{file_extension}"
+            hash_dir.mkdir(parents=True, exist_ok=True)
+            os.replace(temp_path, file_path)
+    finally:
+        if temp_path.exists():
+            temp_path.unlink()
 
-def verify_invoice(filepath: str, user_data):
+    return str(file_path), file_hash
+
+
+def verify_invoice(filepath: str, user_data, ocr_output: dict = None):
     """Verify invoice by comparing user input with OCR extracted data"""
     
-    # Process OCR
-    ocr_output = process_invoice_ocr(filepath)
+    # Process OCR (skipped when the caller already ran it on the OCR pool)
+    if ocr_output is None:
+        ocr_output = process_invoice_ocr(filepath)
     
     fields = ocr_output["ocr_fields"]
     table = ocr_output["ocr_table"]
@@ -45,8 +96,8 @@ def verify_invoice(filepath: str, user_data):
     # Invoice number comparison - flexible matching
     if fields["invoice_number_ocr"] and user_data.invoice_number:
         # Clean both values - remove all non-alphanumeric except digits
-        ocr_inv = re.sub(r'[^\d]', '', fields["invoice_number_ocr"])
-        user_inv = re.sub(r'[^\d]', '', str(user_data.invoice_number))
+        ocr_inv = invoice_number_digits(fields["invoice_number_ocr"])
+        user_inv = invoice_number_digits(user_data.invoice_number)
         # Match if numbers are equal or one contains the other
         verification["invoice_number_match"] = (
             ocr_inv == user_inv or 
@@ -56,8 +107,8 @@ def verify_invoice(filepath: str, user_data):
     
     # Vendor name comparison - fuzzy matching
     if fields["vendor_name_ocr"] and user_data.vendor_name:
-        ocr_vendor = fields["vendor_name_ocr"].lower().strip()
-        user_vendor = user_data.vendor_name.lower().strip()
+        ocr_vendor = normalize_vendor_name(fields["vendor_name_ocr"])
+        user_vendor = normalize_vendor_name(user_data.vendor_name)
         # Match if one contains the other or they're equal
         verification["vendor_match"] = (
             ocr_vendor == user_vendor or 
@@ -137,33 +188,46 @@ def verify_invoice(filepath: str, user_data):
         "verification": verification,
         "fraud_score": int(min(fraud_score, 100)),  # Cap at 100 and ensure integer
         "fraud_category": fraud_category,
-        "amount_mismatch_percentage": round(amount_mismatch_pct, 2)
+        "amount_mismatch_percentage": round(amount_mismatch_pct, 2),
+        "image_hash": ocr_output.get("image_hash")
     }
 
 
-def create_invoice(
+def assess_invoice(
     db: Session,
-    file,
     payload: InvoiceCreate,
+    verification_result: dict,
     user_role: str = "contractor",
-    user_id: int = None
-):
-    """Create invoice with OCR verification and fraud detection"""
-    file_path = save_invoice_file(file)
-
-    # Verify invoice using OCR
-    verification_result = verify_invoice(file_path, payload)
-
+    exclude_invoice_id: int = None,
+    is_duplicate: bool = None,
+    features: dict = None
+) -> dict:
+    """
+    Run the duplicate check and risk scoring for a verified invoice.
+    Batch callers pass `is_duplicate` and model `features` from bulk lookups
+    to skip the per-invoice queries.
+    """
     # Check for duplicate invoice (only if submitted by contractor, not during testing/admin upload)
     fraud_category = verification_result["fraud_category"]
     if user_role == "contractor":
-        existing_invoice = db.query(Invoice).filter(
-            Invoice.invoice_number == payload.invoice_number,
-            Invoice.vendor_name == payload.vendor_name,
-            Invoice.status.in_(["approved", "pending"])  # Don't count rejected/flagged as duplicates
-        ).first()
+        if is_duplicate is None:
+            vendor_key, invoice_number_key = duplicate_key(payload)
+            query = db.query(Invoice.id).filter(
+                Invoice.vendor_key == vendor_key,
+                Invoice.invoice_number_key == invoice_number_key,
+                Invoice.status.in_(DUPLICATE_STATUSES)
+            )
+            if exclude_invoice_id is not None:
+                query = query.filter(Invoice.id != exclude_invoice_id)
+            is_duplicate = query.first() is not None
+
+            # Same physical bill re-photographed, possibly with a different typed number
+            if not is_duplicate:
+                is_duplicate = bool(find_similar_invoices(
+                    db, verification_result.get("image_hash"), DUPLICATE_STATUSES, exclude_invoice_id
+                ))
         
-        if existing_invoice:
+        if is_duplicate:
             fraud_category = "duplicate"
             verification_result["fraud_score"] = min(verification_result["fraud_score"] + 40, 100)
 
@@ -177,13 +241,21 @@ def create_invoice(
         adjusted_risk_score = 0
     else:
         # Some mismatches detected - combine fraud score with AI analysis
+        if features is None:
+            features = get_invoice_features(db, [invoice_feature_input(payload)])[0]
         base_risk_score, _ = score_invoice(
             amount=payload.amount,
             project_id=payload.project_id,
             vendor_name=payload.vendor_name,
+            features=features,
         )
         adjusted_risk_score = int(min(base_risk_score + fraud_score, 100))
     
+    return {**risk_outcome(adjusted_risk_score), "fraud_category": fraud_category}
+
+
+def risk_outcome(adjusted_risk_score: int) -> dict:
+    """Risk level and initial status for a combined risk score"""
     if adjusted_risk_score >= 80:
         risk_level = "high"
         status = "flagged"  # Auto-flag high risk invoices
@@ -194,34 +266,30 @@ def create_invoice(
         risk_level = "low"
         status = "pending"
 
-    invoice = Invoice(
-        project_id=payload.project_id,
-        invoice_number=payload.invoice_number,
-        vendor_name=payload.vendor_name,
-        amount=payload.amount,
-        risk_score=adjusted_risk_score,
-        risk_level=risk_level,
-        fraud_category=fraud_category,
-        amount_mismatch_percentage=verification_result["amount_mismatch_percentage"],
-        file_path=file_path,
-        uploaded_by=user_role,
-        status=status,
-        submitted_by_user_id=user_id if user_role == "contractor" else None,
-    )
-    db.add(invoice)
-    db.commit()
-    db.refresh(invoice)
+    return {
+        "risk_score": adjusted_risk_score,
+        "risk_level": risk_level,
+        "status": status,
+    }
+
+
+def invoice_feature_input(payload) -> dict:
+    return {"amount": payload.amount, "project_id": payload.project_id, "vendor_name": payload.vendor_name}
+
 
+def build_invoice_result(invoice: Invoice, verification_result: dict, assessment: dict) -> dict:
+    """Response body shared by synchronous uploads and finished ingestion jobs"""
+    status = assessment["status"]
     return {
         "invoice": invoice,
         "ocr_fields": verification_result["ocr_fields"],
         "ocr_table": verification_result["ocr_table"],
         "verification": verification_result["verification"],
         "ai_risk": {
-            "score": adjusted_risk_score,
-            "level": risk_level,
+            "score": assessment["risk_score"],
+            "level": assessment["risk_level"],
             "fraud_score": verification_result["fraud_score"],
-            "fraud_category": fraud_category,
+            "fraud_category": assessment["fraud_category"],
             "amount_mismatch_percentage": verification_result["amount_mismatch_percentage"]
         },
         "status": status,
@@ -229,6 +297,208 @@ def create_invoice(
     }
 
 
+def create_invoice(
+    db: Session,
+    file_path: str,
+    payload: InvoiceCreate,
+    user_role: str = "contractor",
+    user_id: int = None,
+    ocr_output: dict = None
+):
+    """Create invoice for an already saved file with OCR verification and fraud detection"""
+    # Verify invoice using OCR
+    verification_result = verify_invoice(file_path, payload, ocr_output)
+    assessment = assess_invoice(db, payload, verification_result, user_role)
+
+    invoice = build_invoice(file_path, payload, verification_result, assessment, user_role, user_id)
+    db.add(invoice)
+    record_invoice(db, payload.vendor_name, payload.project_id, payload.amount, invoice.status)
+    db.commit()
+    db.refresh(invoice)
+    register_image_hash(invoice.id, invoice.image_hash)
+
+    return build_invoice_result(invoice, verification_result, assessment)
+
+
+def build_invoice(
+    file_path: str,
+    payload: InvoiceCreate,
+    verification_result: dict,
+    assessment: dict,
+    user_role: str = "contractor",
+    user_id: int = None
+) -> Invoice:
+    """Invoice row for a verified and scored upload (not yet added to the session)"""
+    return Invoice(
+        project_id=payload.project_id,
+        invoice_number=payload.invoice_number,
+        vendor_name=payload.vendor_name,
+        amount=payload.amount,
+        risk_score=assessment["risk_score"],
+        risk_level=assessment["risk_level"],
+        fraud_category=assessment["fraud_category"],
+        amount_mismatch_percentage=verification_result["amount_mismatch_percentage"],
+        fraud_score=verification_result["fraud_score"],
+        ocr_fields=verification_result["ocr_fields"],
+        file_path=file_path,
+        image_hash=verification_result.get("image_hash"),
+        uploaded_by=user_role,
+        status=assessment["status"],
+        submitted_by_user_id=user_id if user_role == "contractor" else None,
+    )
+
+
+def duplicate_key(payload) -> tuple[str, str]:
+    """(vendor_key, invoice_number_key) as stored on Invoice and covered by ix_invoices_duplicate_key"""
+    return normalize_vendor_name(payload.vendor_name), normalize_invoice_number(payload.invoice_number)
+
+
+def find_duplicate_keys(db: Session, payloads: list[InvoiceCreate]) -> set[tuple[str, str]]:
+    """Bulk duplicate lookup: duplicate_key() pairs that already exist"""
+    keys = list({duplicate_key(payload) for payload in payloads})
+    existing = set()
+    for start in range(0, len(keys), 500):
+        rows = db.query(Invoice.vendor_key, Invoice.invoice_number_key).filter(
+            tuple_(Invoice.vendor_key, Invoice.invoice_number_key).in_(keys[start:start + 500]),
+            Invoice.status.in_(DUPLICATE_STATUSES)
+        ).all()
+        existing.update((row[0], row[1]) for row in rows)
+    return existing
+
+
+# ------------------------------
+# Deferred ingestion ("accept and process later")
+# ------------------------------
+# A job in one of these stages is never written again
+TERMINAL_STAGES = ("completed", "failed")
+# Tells worker processes apart, including ones forked from the same parent
+_WORKER_BOOT = uuid4().hex[:8]
+
+
+class JobFinished(RuntimeError):
+    """Raised when a job was completed or failed (e.g. by recovery) while still being worked on"""
+
+
+def job_worker_id() -> str:
+    """Owner recorded on the jobs this process runs"""
+    return f"{socket.gethostname()}:{os.getpid()}:{_WORKER_BOOT}"
+
+
+def create_invoice_job(
+    db: Session,
+    file_path: str,
+    payload: InvoiceCreate,
+    user_role: str = "contractor",
+    user_id: int = None
+) -> InvoiceJob:
+    """Insert a placeholder invoice with status "processing" and the job that will fill it in"""
+    invoice = Invoice(
+        project_id=payload.project_id,
+        invoice_number=payload.invoice_number,
+        vendor_name=payload.vendor_name,
+        amount=payload.amount,
+        file_path=file_path,
+        uploaded_by=user_role,
+        status="processing",
+        submitted_by_user_id=user_id if user_role == "contractor" else None,
+    )
+    db.add(invoice)
+    db.flush()
+    record_invoice(db, payload.vendor_name, payload.project_id, payload.amount, invoice.status)
+
+    job = InvoiceJob(
+        id=uuid4().hex, invoice_id=invoice.id, stage="queued", progress=0,
+        owner=job_worker_id(), heartbeat_at=datetime.utcnow(),
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def get_invoice_job(db: Session, job_id: str) -> InvoiceJob | None:
+    return db.query(InvoiceJob).filter(InvoiceJob.id == job_id).first()
+
+
+def _write_unfinished_job(db: Session, job_id: str, **values) -> None:
+    """
+    UPDATE the job only while it is unfinished, so completion can't overwrite a job that
+    recovery failed (or the reverse); raises JobFinished, with the transaction rolled back.
+    """
+    result = db.execute(
+        update(InvoiceJob)
+        .where(InvoiceJob.id == job_id, InvoiceJob.stage.notin_(TERMINAL_STAGES))
+        .values(**values)
+    )
+    if result.rowcount != 1:
+        db.rollback()
+        raise JobFinished(f"Invoice job {job_id} has already finished")
+
+
+def update_invoice_job(db: Session, job_id: str, stage: str, progress: int) -> InvoiceJob:
+    _write_unfinished_job(db, job_id, stage=stage, progress=progress)
+    db.commit()
+    return get_invoice_job(db, job_id)
+
+
+def complete_invoice_job(db: Session, job_id: str, ocr_output: dict) -> InvoiceJob:
+    """Verify, de-duplicate and score the job's invoice from its OCR output"""
+    job = update_invoice_job(db, job_id, "verifying", 70)
+    invoice = db.query(Invoice).filter(Invoice.id == job.invoice_id).first()
+    payload = InvoiceCreate(
+        project_id=invoice.project_id,
+        invoice_number=invoice.invoice_number,
+        vendor_name=invoice.vendor_name,
+        amount=float(invoice.amount),
+    )
+
+    verification_result = verify_invoice(invoice.file_path, payload, ocr_output)
+    update_invoice_job(db, job_id, "scoring", 85)
+    assessment = assess_invoice(
+        db, payload, verification_result, invoice.uploaded_by, exclude_invoice_id=invoice.id
+    )
+
+    # Claim the job before touching the invoice (the order fail_invoice_job locks them in);
+    # nothing below is written if recovery failed the job in the meantime
+    _write_unfinished_job(db, job_id, stage="completed", progress=100)
+    invoice.risk_score = assessment["risk_score"]
+    invoice.risk_level = assessment["risk_level"]
+    invoice.fraud_category = assessment["fraud_category"]
+    invoice.amount_mismatch_percentage = verification_result["amount_mismatch_percentage"]
+    invoice.fraud_score = verification_result["fraud_score"]
+    invoice.ocr_fields = verification_result["ocr_fields"]
+    record_status_change(db, invoice.vendor_name, invoice.status, assessment["status"])
+    invoice.status = assessment["status"]
+    invoice.image_hash = verification_result.get("image_hash")
+
+    result = build_invoice_result(invoice, verification_result, assessment)
+    result.pop("invoice")
+    job.result = result
+    db.commit()
+    db.refresh(job)
+    register_image_hash(invoice.id, invoice.image_hash)
+    return job
+
+
+def fail_invoice_job(db: Session, job_id: str, error: str) -> InvoiceJob:
+    """Mark the job failed and hand its invoice to an admin for manual review (no-op once finished)"""
+    db.rollback()
+    try:
+        _write_unfinished_job(db, job_id, stage="failed", error=error)
+    except JobFinished:
+        return get_invoice_job(db, job_id)
+
+    job = get_invoice_job(db, job_id)
+    invoice = db.query(Invoice).filter(Invoice.id == job.invoice_id).first()
+    if invoice and invoice.status == "processing":
+        invoice.status = "pending"
+        invoice.admin_notes = f"Automatic processing failed: {error}"
+
+    db.commit()
+    db.refresh(job)
+    return job
+
+
 def verify_invoice_by_admin(
     db: Session,
     invoice_id: int,
@@ -243,6 +513,7 @@ def verify_invoice_by_admin(
     if not invoice:
         return {"error": "Invoice not found"}
     
+    record_status_change(db, invoice.vendor_name, invoice.status, action)
     invoice.status = action  # "approved", "rejected", "flagged"
     invoice.verified_by_user_id = admin_id
     invoice.verified_at = datetime.utcnow()
@@ -257,9 +528,92 @@ def verify_invoice_by_admin(
     }
 
 
-def list_invoices(db: Session):
-    return db.query(Invoice).all()
+# ------------------------------
+# Listing: SQL filters + keyset pagination on (created_at, id)
+# ------------------------------
+def filter_invoices(
+    query: Query | Select,
+    status: str = None,
+    project_id: int = None,
+    vendor: str = None,
+    min_risk: int = None,
+    max_risk: int = None,
+    date_from: datetime = None,
+    date_to: datetime = None
+) -> Query | Select:
+    """Apply the listing filters (to a Query or a select()); every one is covered by an index on invoices"""
+    if status:
+        query = query.filter(Invoice.status == status)
+    if project_id is not None:
+        query = query.filter(Invoice.project_id == project_id)
+    if vendor:
+        query = query.filter(Invoice.vendor_key == normalize_vendor_name(vendor))
+    if min_risk is not None:
+        query = query.filter(Invoice.risk_score >= min_risk)
+    if max_risk is not None:
+        query = query.filter(Invoice.risk_score <= max_risk)
+    if date_from is not None:
+        query = query.filter(Invoice.created_at >= date_from)
+    if date_to is not None:
+        query = query.filter(Invoice.created_at < date_to)
+    return query
+
+
+def encode_cursor(invoice: Invoice) -> str:
+    """Opaque cursor pointing just past `invoice` in (created_at, id) descending order"""
+    raw = f"{invoice.created_at.isoformat()}|{invoice.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, invoice_id = raw.split("|")
+        return datetime.fromisoformat(created_at), int(invoice_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def _invoice_page_statement(cursor: str, limit: int | None, filters: dict) -> Select:
+    statement = filter_invoices(select(Invoice), **filters)
+    if cursor:
+        created_at, invoice_id = decode_cursor(cursor)
+        statement = statement.filter(tuple_(Invoice.created_at, Invoice.id) < (created_at, invoice_id))
+
+    statement = statement.order_by(Invoice.created_at.desc(), Invoice.id.desc())
+    # One extra row tells whether another page exists without a COUNT(*)
+    return statement.limit(limit + 1) if limit is not None else statement
+
+
+def _invoice_page(invoices: list[Invoice], limit: int | None) -> tuple[list[Invoice], str | None]:
+    if limit is not None and len(invoices) > limit:
+        invoices = invoices[:limit]
+        return invoices, encode_cursor(invoices[-1])
+    return invoices, None
+
+
+def list_invoices(db: Session, cursor: str = None, limit: int | None = 50, **filters) -> tuple[list[Invoice], str | None]:
+    """
+    One page of invoices, newest first. Returns (invoices, next_cursor);
+    next_cursor is None on the last page. limit=None returns every remaining invoice.
+    """
+    invoices = db.scalars(_invoice_page_statement(cursor, limit, filters)).all()
+    return _invoice_page(list(invoices), limit)
+
+
+async def list_invoices_async(db: AsyncSession, cursor: str = None, limit: int | None = 50, **filters) -> tuple[list[Invoice], str | None]:
+    """list_invoices() on an AsyncSession"""
+    invoices = (await db.scalars(_invoice_page_statement(cursor, limit, filters))).all()
+    return _invoice_page(list(invoices), limit)
+
+
+async def list_pending_invoices_async(db: AsyncSession) -> list[Invoice]:
+    return list((await db.scalars(select(Invoice).filter(Invoice.status == "pending"))).all())
 
 
 def list_high_risk_invoices(db: Session, threshold: int = 70):
     return db.query(Invoice).filter(Invoice.risk_score >= threshold).all()
+
+
+async def list_high_risk_invoices_async(db: AsyncSession, threshold: int = 70) -> list[Invoice]:
+    return list((await db.scalars(select(Invoice).filter(Invoice.risk_score >= threshold))).all())
@@ -2,8 +2,8 @@ import re
 from pathlib import Path
 from typing import Dict, Any
 from PIL import Image
-import pytesseract
 
+from app.ocr.engine import get_ocr_backend
 from app.ocr.preprocess import preprocess_image
 
 
@@ -15,7 +15,7 @@ def extract_invoice_fields(image_path: str) -> Dict[str, Any]:
     img = Image.open(img_path)
     img = preprocess_image(img)
 
-    text = pytesseract.image_to_string(img)
+    text = get_ocr_backend().image_to_string(img)
 
     # Normalize text for better matching
     text_lower = text.lower()
@@ -1,3 +1,5 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from app.models.project_model import Project
 from app.schemas.project_schema import ProjectCreate, ProjectUpdate
@@ -21,6 +23,10 @@ def list_projects(db: Session) -> list[Project]:
     return db.query(Project).all()
 
 
+async def list_projects_async(db: AsyncSession) -> list[Project]:
+    return list((await db.scalars(select(Project))).all())
+
+
 def get_project(db: Session, project_id: int) -> Project | None:
     return db.query(Project).filter(Project.id == project_id).first()
 
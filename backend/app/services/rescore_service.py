@@ -0,0 +1,296 @@
+import csv
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+from uuid import uuid4
+
+from app.config.database import SessionLocal
+from app.models.invoice_model import Invoice
+from app.schemas.invoice_schema import InvoiceCreate
+from app.services.ai_service import score_invoices
+from app.services.feature_service import get_invoice_features
+from app.services.fraud_service import invalidate_fraud_summary
+from app.services.invoice_service import filter_invoices, risk_outcome, verify_invoice
+
+RESCORE_DIR = Path("uploads/rescore")
+DEFAULT_CHUNK_SIZE = 5000
+# A "running" checkpoint not updated for this long belongs to a worker that died
+STALE_RUN_SECONDS = 300
+FILTER_KEYS = ["status", "project_id", "vendor", "min_risk", "max_risk", "date_from", "date_to"]
+REPORT_FIELDS = [
+    "invoice_id", "old_risk_score", "new_risk_score",
+    "old_risk_level", "new_risk_level", "old_fraud_category", "new_fraud_category",
+]
+
+RESCORE_COLUMNS = [
+    Invoice.id,
+    Invoice.project_id,
+    Invoice.invoice_number,
+    Invoice.vendor_name,
+    Invoice.amount,
+    Invoice.file_path,
+    Invoice.risk_score,
+    Invoice.risk_level,
+    Invoice.fraud_category,
+    Invoice.fraud_score,
+    Invoice.ocr_fields,
+]
+
+
+def new_run_id() -> str:
+    return f"{datetime.utcnow():%Y%m%d-%H%M%S}-{uuid4().hex[:6]}"
+
+
+def checkpoint_path(run_id: str) -> Path:
+    return RESCORE_DIR / f"{run_id}.checkpoint.json"
+
+
+def report_path(run_id: str) -> Path:
+    return RESCORE_DIR / f"{run_id}.diff.csv"
+
+
+def pending_path(run_id: str) -> Path:
+    """Report rows of the chunk being committed, kept until they reach the report"""
+    return RESCORE_DIR / f"{run_id}.pending.json"
+
+
+def load_checkpoint(run_id: str) -> dict | None:
+    try:
+        return json.loads(checkpoint_path(run_id).read_text())
+    except FileNotFoundError:
+        return None
+
+
+def is_run_active(checkpoint: dict) -> bool:
+    if checkpoint["state"] != "running":
+        return False
+    age = datetime.utcnow() - datetime.fromisoformat(checkpoint["updated_at"])
+    return age.total_seconds() < STALE_RUN_SECONDS
+
+
+def _write_atomic(path: Path, data):
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(data, indent=2))
+    tmp.replace(path)  # atomic: a crash never leaves a half-written file
+
+
+def _save_checkpoint(checkpoint: dict):
+    checkpoint["updated_at"] = datetime.utcnow().isoformat()
+    _write_atomic(checkpoint_path(checkpoint["run_id"]), checkpoint)
+
+
+# ------------------------------
+# Diff report: appended after each chunk commits. The checkpoint records how many bytes
+# of it are complete, so rows written after the last checkpoint (and a half-written line)
+# are cut off on resume; rows are also written at most once per invoice id.
+# ------------------------------
+def _open_report(checkpoint: dict):
+    """Open the report for appending, trimmed to the checkpoint; returns (file, reported invoice ids)"""
+    report = report_path(checkpoint["run_id"])
+    report.touch()
+    if "report_bytes" in checkpoint and report.stat().st_size > checkpoint["report_bytes"]:
+        with open(report, "r+b") as report_file:
+            report_file.truncate(checkpoint["report_bytes"])
+
+    with open(report, newline="") as report_file:
+        reported_ids = {int(row["invoice_id"]) for row in csv.DictReader(report_file)}
+
+    report_file = open(report, "a", newline="")
+    if report_file.tell() == 0:
+        csv.DictWriter(report_file, fieldnames=REPORT_FIELDS).writeheader()
+    return report_file, reported_ids
+
+
+def _append_report(report_file, reported_ids: set, changes: list[dict]) -> int:
+    """Append the rows of invoices not reported yet and make them durable; returns the count"""
+    rows = [change for change in changes if change["invoice_id"] not in reported_ids]
+    csv.DictWriter(report_file, fieldnames=REPORT_FIELDS).writerows(rows)
+    report_file.flush()
+    os.fsync(report_file.fileno())
+    reported_ids.update(row["invoice_id"] for row in rows)
+    return len(rows)
+
+
+def _chunk_landed(db, updates: list[dict]) -> bool:
+    """Whether a pending chunk committed before the crash (one transaction: check one invoice)"""
+    update = updates[0]
+    row = db.query(Invoice.risk_score, Invoice.risk_level, Invoice.fraud_category).filter(
+        Invoice.id == update["id"]
+    ).first()
+    return row is not None and tuple(row) == (update["risk_score"], update["risk_level"], update["fraud_category"])
+
+
+def _query_filters(filters: dict) -> dict:
+    """Checkpoint filters (JSON) back to filter_invoices() arguments"""
+    filters = {key: value for key, value in filters.items() if value is not None}
+    for key in ("date_from", "date_to"):
+        if isinstance(filters.get(key), str):
+            filters[key] = datetime.fromisoformat(filters[key])
+    return filters
+
+
+def _rescore_chunk(db, rows) -> tuple[list[dict], list[dict], int]:
+    """(bulk update mappings, level-change report rows, skipped count) for one chunk"""
+    scored = []
+    skipped = 0
+    for row in rows:
+        if row.ocr_fields:
+            # Re-run verification against the stored OCR output with the current thresholds
+            payload = InvoiceCreate.model_construct(
+                project_id=row.project_id,
+                invoice_number=row.invoice_number,
+                vendor_name=row.vendor_name,
+                amount=float(row.amount),
+            )
+            verification = verify_invoice(row.file_path, payload, {"ocr_fields": row.ocr_fields, "ocr_table": []})
+            fraud_score = verification["fraud_score"]
+            fraud_category = verification["fraud_category"]
+            if row.fraud_category == "duplicate":
+                fraud_score = min(fraud_score + 40, 100)
+                fraud_category = "duplicate"
+        elif row.fraud_score is not None:
+            fraud_score = row.fraud_score
+            fraud_category = row.fraud_category
+        else:
+            # Uploaded before fraud_score/ocr_fields were stored: nothing to recompute from
+            skipped += 1
+            continue
+        scored.append((row, fraud_score, fraud_category))
+
+    # One vectorized model call for every invoice that has mismatches (same rule as assess_invoice)
+    needs_model = [item for item in scored if item[1] != 0]
+    inputs = [
+        {"amount": float(row.amount), "project_id": row.project_id, "vendor_name": row.vendor_name}
+        for row, _, _ in needs_model
+    ]
+    features = get_invoice_features(db, inputs) if inputs else []
+    model_scores = score_invoices([{**invoice, **extra} for invoice, extra in zip(inputs, features)])
+    model_score_by_id = {row.id: score for (row, _, _), (score, _) in zip(needs_model, model_scores)}
+
+    updates = []
+    changes = []
+    for row, fraud_score, fraud_category in scored:
+        risk_score = int(min(model_score_by_id[row.id] + fraud_score, 100)) if fraud_score else 0
+        risk_level = risk_outcome(risk_score)["risk_level"]
+        if (risk_score, risk_level, fraud_category) == (row.risk_score, row.risk_level, row.fraud_category):
+            continue
+
+        updates.append({
+            "id": row.id,
+            "risk_score": risk_score,
+            "risk_level": risk_level,
+            "fraud_category": fraud_category,
+            "fraud_score": fraud_score,
+        })
+        if risk_level != row.risk_level:
+            changes.append({
+                "invoice_id": row.id,
+                "old_risk_score": row.risk_score,
+                "new_risk_score": risk_score,
+                "old_risk_level": row.risk_level,
+                "new_risk_level": risk_level,
+                "old_fraud_category": row.fraud_category,
+                "new_fraud_category": fraud_category,
+            })
+    return updates, changes, skipped
+
+
+def start_rescore(filters: dict = None, chunk_size: int = DEFAULT_CHUNK_SIZE, dry_run: bool = False) -> dict:
+    """Create the checkpoint for a new run; run_rescore() then does the work"""
+    RESCORE_DIR.mkdir(parents=True, exist_ok=True)
+    filters = filters or {}
+    checkpoint = {
+        "run_id": new_run_id(),
+        "filters": {
+            key: value.isoformat() if isinstance(value, datetime) else value
+            for key, value in filters.items() if key in FILTER_KEYS and value is not None
+        },
+        "chunk_size": chunk_size,
+        "dry_run": dry_run,
+        "state": "pending",
+        "last_id": 0,
+        "processed": 0,
+        "updated": 0,
+        "level_changes": 0,
+        "skipped": 0,
+        "error": None,
+        "started_at": datetime.utcnow().isoformat(),
+    }
+    checkpoint["report"] = str(report_path(checkpoint["run_id"]))
+    _save_checkpoint(checkpoint)
+    return checkpoint
+
+
+def run_rescore(run_id: str) -> dict:
+    """
+    Re-score every invoice matching the run's filters in id order, chunk by chunk.
+    Each chunk is committed first, then its report rows and the checkpoint are saved,
+    so calling this again with the same run_id after a crash or restart resumes where
+    it stopped without losing or repeating report rows.
+    """
+    checkpoint = load_checkpoint(run_id)
+    if checkpoint is None:
+        raise ValueError(f"Unknown re-scoring run: {run_id}")
+    if checkpoint["state"] == "completed":
+        return checkpoint
+
+    checkpoint["state"] = "running"
+    checkpoint["error"] = None
+    _save_checkpoint(checkpoint)
+
+    filters = _query_filters(checkpoint["filters"])
+    pending = pending_path(run_id)
+    db = SessionLocal()
+    report_file = None
+    try:
+        report_file, reported_ids = _open_report(checkpoint)
+
+        if pending.exists():
+            # Crashed between committing a chunk and reporting it: re-scoring that chunk
+            # again finds nothing to change, so its report rows and counts come from here
+            chunk = json.loads(pending.read_text())
+            if _chunk_landed(db, chunk["updates"]):
+                checkpoint["level_changes"] += _append_report(report_file, reported_ids, chunk["changes"])
+                checkpoint["report_bytes"] = report_file.tell()
+                checkpoint["updated"] += len(chunk["updates"])
+                _save_checkpoint(checkpoint)
+            pending.unlink()
+
+        while True:
+            rows = filter_invoices(db.query(*RESCORE_COLUMNS), **filters).filter(
+                Invoice.id > checkpoint["last_id"]
+            ).order_by(Invoice.id).limit(checkpoint["chunk_size"]).all()
+            if not rows:
+                break
+
+            updates, changes, skipped = _rescore_chunk(db, rows)
+            if updates and not checkpoint["dry_run"]:
+                _write_atomic(pending, {"updates": updates, "changes": changes})
+                db.bulk_update_mappings(Invoice, updates)
+            db.commit()
+
+            checkpoint["level_changes"] += _append_report(report_file, reported_ids, changes)
+            checkpoint["report_bytes"] = report_file.tell()
+            checkpoint["last_id"] = rows[-1].id
+            checkpoint["processed"] += len(rows)
+            checkpoint["updated"] += len(updates)
+            checkpoint["skipped"] += skipped
+            _save_checkpoint(checkpoint)
+            pending.unlink(missing_ok=True)
+
+        checkpoint["state"] = "completed"
+        _save_checkpoint(checkpoint)
+        return checkpoint
+    except Exception as e:
+        db.rollback()
+        checkpoint["state"] = "failed"
+        checkpoint["error"] = str(e)
+        _save_checkpoint(checkpoint)
+        raise
+    finally:
+        if report_file is not None:
+            report_file.close()
+        db.close()
+        if not checkpoint["dry_run"]:
+            invalidate_fraud_summary()
@@ -0,0 +1,187 @@
+from collections import OrderedDict
+from datetime import datetime, timedelta
+import calendar
+import threading
+import time
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from app.config.database import SessionLocal
+from app.config.settings import settings
+from app.models.token_revocation_model import TokenRevocation
+from app.models.user_model import User
+from app.schemas.auth_schema import UserResponse
+
+# Changing any of these invalidates the user's existing tokens
+TOKEN_USER_FIELDS = ("role", "email", "password")
+
+
+def _timestamp(value: datetime) -> float:
+    """Naive UTC datetime -> unix seconds with microseconds (the unit of the iat/exp claims)"""
+    return calendar.timegm(value.utctimetuple()) + value.microsecond / 1_000_000
+
+
+# ------------------------------
+# User cache: user id -> (expires, UserResponse), least recently used evicted first
+# ------------------------------
+_user_cache = OrderedDict()
+_user_cache_lock = threading.Lock()
+
+
+def get_cached_user(user_id: int) -> UserResponse | None:
+    """The user behind a token if it is cached (no IO, safe on the event loop)"""
+    with _user_cache_lock:
+        entry = _user_cache.get(user_id)
+        if entry and entry[0] > time.monotonic():
+            _user_cache.move_to_end(user_id)
+            return entry[1]
+    return None
+
+
+def load_token_user(user_id: int) -> UserResponse | None:
+    """Cache miss: one primary-key lookup, then cache the user"""
+    now = time.monotonic()
+    db = SessionLocal()
+    try:
+        user = db.query(User).filter(User.id == user_id).first()
+        user = UserResponse.model_validate(user) if user else None
+    finally:
+        db.close()
+    if user is None:
+        return None
+
+    with _user_cache_lock:
+        _user_cache[user_id] = (now + settings.AUTH_USER_CACHE_TTL_SECONDS, user)
+        _user_cache.move_to_end(user_id)
+        while len(_user_cache) > settings.AUTH_USER_CACHE_SIZE:
+            _user_cache.popitem(last=False)
+    return user
+
+
+def invalidate_user(user_id: int):
+    with _user_cache_lock:
+        _user_cache.pop(user_id, None)
+
+
+# ------------------------------
+# Revocation list, mirrored from token_revocations and refreshed every few seconds
+# ------------------------------
+_revoked_tokens = {}  # jti -> expires (unix seconds)
+_revoked_users = {}  # user id -> tokens issued before this (unix seconds, sub-second) are revoked
+_revocation_state = {"last_id": 0, "checked": None}
+_revocation_lock = threading.Lock()
+
+
+def _apply_revocation(revocation: TokenRevocation):
+    if revocation.jti:
+        _revoked_tokens[revocation.jti] = _timestamp(revocation.expires_at)
+    if revocation.user_id is not None:
+        revoked_at = _timestamp(revocation.revoked_at)
+        _revoked_users[revocation.user_id] = max(_revoked_users.get(revocation.user_id, 0), revoked_at)
+        invalidate_user(revocation.user_id)
+
+
+def revocations_due() -> bool:
+    """True when the revocation list should be refreshed from the database"""
+    checked = _revocation_state["checked"]
+    return checked is None or time.monotonic() - checked >= settings.AUTH_REVOCATION_REFRESH_SECONDS
+
+
+def refresh_revocations():
+    """Pick up revocations written since the last refresh (by any worker)"""
+    state = _revocation_state
+    if not revocations_due():
+        return
+
+    with _revocation_lock:
+        # Another thread may have refreshed it while we waited
+        if not revocations_due():
+            return
+        db = SessionLocal()
+        try:
+            rows = db.query(TokenRevocation).filter(
+                TokenRevocation.id > state["last_id"],
+                TokenRevocation.expires_at > datetime.utcnow(),
+            ).order_by(TokenRevocation.id).all()
+            for revocation in rows:
+                _apply_revocation(revocation)
+                state["last_id"] = revocation.id
+        except Exception as e:
+            # Keep the list we have; retried on the next check
+            print(f"Token revocation refresh error: {str(e)}")
+        finally:
+            db.close()
+
+        # Entries past their expiry only cover tokens that have expired anyway
+        cutoff = time.time()
+        for jti in [jti for jti, expires in _revoked_tokens.items() if expires < cutoff]:
+            del _revoked_tokens[jti]
+        user_cutoff = cutoff - settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+        for user_id in [user_id for user_id, revoked_at in _revoked_users.items() if revoked_at < user_cutoff]:
+            del _revoked_users[user_id]
+        state["checked"] = time.monotonic()
+
+
+def is_token_revoked(claims: dict) -> bool:
+    """Check against the in-memory list; call refresh_revocations() first when revocations_due()"""
+    if claims.get("jti") in _revoked_tokens:
+        return True
+    # Tokens from before iat was added count as issued at 0; tokens from before iat kept
+    # microseconds carry whole seconds, so they fall before a revocation in their second
+    return claims.get("iat", 0) < _revoked_users.get(claims["id"], 0)
+
+
+def _revocation(**values) -> TokenRevocation:
+    now = datetime.utcnow()
+    return TokenRevocation(
+        revoked_at=now,
+        expires_at=now + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES),
+        **values,
+    )
+
+
+def revoke_token(db: Session, claims: dict):
+    """Revoke one token (logout); tokens without a jti can only be revoked per user"""
+    if claims.get("jti"):
+        revocation = _revocation(jti=claims["jti"])
+        revocation.expires_at = datetime.utcfromtimestamp(claims["exp"])
+    else:
+        revocation = _revocation(user_id=claims["id"])
+    db.add(revocation)
+    db.query(TokenRevocation).filter(TokenRevocation.expires_at <= datetime.utcnow()).delete()
+    db.commit()
+    _apply_revocation(revocation)
+
+
+def revoke_user_tokens(db: Session, user_id: int):
+    """Revoke every token issued to a user so far; the caller commits"""
+    db.add(_revocation(user_id=user_id))
+
+
+# ------------------------------
+# Keep tokens in step with the users table: changing a user's role, email or password
+# (or deleting them) revokes their tokens in the same transaction
+# ------------------------------
+@event.listens_for(Session, "before_flush")
+def _revoke_on_user_change(session, flush_context, instances):
+    changed = [user for user in session.deleted if isinstance(user, User)]
+    changed += [
+        user for user in session.dirty
+        if isinstance(user, User) and any(inspect(user).attrs[field].history.has_changes() for field in TOKEN_USER_FIELDS)
+    ]
+    for user in changed:
+        revoke_user_tokens(session, user.id)
+        session.info.setdefault("users_changed", set()).add(user.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _evict_changed_users(session):
+    for user_id in session.info.pop("users_changed", ()):
+        _revoked_users[user_id] = max(_revoked_users.get(user_id, 0), time.time())
+        invalidate_user(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back_users(session):
+    session.info.pop("users_changed", None)
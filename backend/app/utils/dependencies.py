@@ -1,42 +1,59 @@
 from fastapi import Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
-from app.config.database import get_db
 from app.utils.jwt_handler import decode_token
-from app.models.user_model import User
+from app.schemas.auth_schema import UserResponse
+from app.services.token_service import (
+    get_cached_user,
+    is_token_revoked,
+    load_token_user,
+    refresh_revocations,
+    revocations_due,
+)
 
 security = HTTPBearer()
 
+# The auth dependencies are async and only leave the event loop for the occasional
+# database read, so authenticated async routes never wait for a threadpool thread.
 
-def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-) -> User:
+
+def _unauthorized(detail: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=detail,
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+async def get_token_claims(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
     """
-    Dependency to get the current authenticated user from JWT token
+    Dependency returning the verified claims (id, email, role, iat, jti) of the bearer token
     """
-    token = credentials.credentials
-    payload = decode_token(token)
-    
+    payload = decode_token(credentials.credentials)
     if not payload or "id" not in payload:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    
-    user = db.query(User).filter(User.id == payload["id"]).first()
+        raise _unauthorized("Invalid authentication credentials")
+    if revocations_due():
+        await run_in_threadpool(refresh_revocations)
+    if is_token_revoked(payload):
+        raise _unauthorized("Token has been revoked")
+    return payload
+
+
+async def get_current_user(claims: dict = Depends(get_token_claims)) -> UserResponse:
+    """
+    Dependency to get the current authenticated user from JWT token.
+    Served from the user cache, so most requests don't touch the database.
+    """
+    user = get_cached_user(claims["id"]) or await run_in_threadpool(load_token_user, claims["id"])
     if not user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="User not found",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    
+        raise _unauthorized("User not found")
+    # The signed role/email are what authorization relies on: they must still be current
+    if user.role != claims.get("role") or user.email != claims.get("email"):
+        raise _unauthorized("Token is out of date, please log in again")
     return user
 
 
-def require_admin(current_user: User = Depends(get_current_user)) -> User:
+async def require_admin(current_user: UserResponse = Depends(get_current_user)) -> UserResponse:
     """
     Dependency to ensure the current user is an admin
     """
@@ -48,7 +65,7 @@ def require_admin(current_user: User = Depends(get_current_user)) -> User:
     return current_user
 
 
-def require_contractor(current_user: User = Depends(get_current_user)) -> User:
+async def require_contractor(current_user: UserResponse = Depends(get_current_user)) -> UserResponse:
     """
     Dependency to ensure the current user is a contractor
     """
@@ -1,10 +1,16 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
 from passlib.context import CryptContext
 
-# Configure bcrypt with explicit rounds to avoid version issues
+from app.config.settings import settings
+
+# Configure bcrypt with explicit rounds to avoid version issues.
+# Hashes made with any other cost are re-hashed on the next successful login.
 pwd_cxt = CryptContext(
     schemes=["bcrypt"],
     deprecated="auto",
-    bcrypt__rounds=12
+    bcrypt__rounds=settings.PASSWORD_BCRYPT_ROUNDS
 )
 
 
@@ -17,3 +23,72 @@ def hash_password(password: str) -> str:
 
 def verify_password(plain: str, hashed: str) -> bool:
     return pwd_cxt.verify(plain, hashed)
+
+
+def verify_and_update_password(plain: str, hashed: str) -> tuple[bool, str | None]:
+    """(valid, new hash): the new hash is set when `hashed` uses an outdated cost factor"""
+    return pwd_cxt.verify_and_update(plain, hashed)
+
+
+# ------------------------------
+# Bounded hashing pool for the auth routes (bcrypt releases the GIL, so threads run in parallel)
+# ------------------------------
+class PasswordHashBusy(Exception):
+    """Raised when password hashing is at its overall, per-IP or per-email limit"""
+
+
+_pool = None
+_slots = None
+_in_flight = {}  # ("ip" | "email", value) -> hashes running or queued
+
+
+def get_hash_pool() -> ThreadPoolExecutor:
+    """Create the hashing pool on first use"""
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+    return _pool
+
+
+def _get_slots() -> asyncio.Semaphore:
+    global _slots
+    if _slots is None:
+        _slots = asyncio.Semaphore(settings.PASSWORD_HASH_MAX_PENDING)
+    return _slots
+
+
+async def run_password_hash(fn, *args, client_ip: str = None, email: str = None):
+    """
+    Run `fn(*args)` (hash_password, verify_and_update_password) on the hashing pool.
+    Raises PasswordHashBusy instead of queueing when every slot is taken, or when the
+    client IP or the email already has its maximum number of hashes in flight.
+    """
+    limits = []
+    if client_ip:
+        limits.append((("ip", client_ip), settings.PASSWORD_HASH_MAX_PER_IP))
+    if email:
+        limits.append((("email", email.lower()), settings.PASSWORD_HASH_MAX_PER_EMAIL))
+
+    slots = _get_slots()
+    if slots.locked() or any(_in_flight.get(key, 0) >= limit for key, limit in limits):
+        raise PasswordHashBusy()
+
+    # Counters are only touched on the event loop thread, so no lock is needed
+    for key, _ in limits:
+        _in_flight[key] = _in_flight.get(key, 0) + 1
+    try:
+        async with slots:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(get_hash_pool(), fn, *args)
+    finally:
+        for key, _ in limits:
+            _in_flight[key] -= 1
+            if not _in_flight[key]:
+                del _in_flight[key]
+
+
+def shutdown_hash_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
@@ -1,4 +1,6 @@
 from datetime import datetime, timedelta
+import time
+from uuid import uuid4
 from jose import jwt, JWTError
 from app.config.settings import settings
 
@@ -6,7 +8,10 @@ from app.config.settings import settings
 def create_access_token(data: dict) -> str:
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
+    # iat and jti let a single token, or all of a user's older tokens, be revoked.
+    # iat keeps microseconds so a token issued in the same second as a revocation
+    # is ordered correctly against it
+    to_encode.update({"exp": expire, "iat": round(time.time(), 6), "jti": uuid4().hex})
     return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
 
 
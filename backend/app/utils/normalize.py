@@ -0,0 +1,23 @@
+import re
+
+
+def invoice_number_digits(value) -> str:
+    """Digits of an invoice number ("INV-0042" -> "0042"), as compared by verification"""
+    return re.sub(r'[^\d]', '', str(value or ""))
+
+
+def normalize_invoice_number(value) -> str:
+    """
+    Duplicate-check key for an invoice number: its digits without leading zeros,
+    so "INV-0042", "inv 42" and "42" collide. Numbers without digits fall back to
+    their lowercased letters.
+    """
+    digits = invoice_number_digits(value)
+    if digits:
+        return digits.lstrip("0") or "0"
+    return re.sub(r'[^a-z]', '', str(value or "").lower())
+
+
+def normalize_vendor_name(value) -> str:
+    """Duplicate-check key for a vendor: lowercased, whitespace collapsed"""
+    return " ".join(str(value or "").lower().split())
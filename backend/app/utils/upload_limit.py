@@ -0,0 +1,52 @@
+from typing import Callable
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+# Form fields and multipart boundaries sent alongside a single uploaded file
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+
+def _too_large(limit: int) -> str:
+    return f"Upload is too large (max {limit // (1024 * 1024)} MB)"
+
+
+class UploadLimitMiddleware:
+    """
+    Cap request bodies on upload routes while they arrive. The form parser spools every
+    file to disk before the endpoint runs, so the size checks made while storing a file
+    come too late to spare the disk: bodies with a larger Content-Length are rejected
+    unread, and streamed (chunked) bodies fail with a 413 once they pass the limit.
+    `limits` maps a path to a callable returning its limit in bytes (read per request).
+    """
+
+    def __init__(self, app, limits: dict[str, Callable[[], int]]):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        get_limit = self.limits.get(scope.get("path")) if scope["type"] == "http" else None
+        if get_limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        limit = get_limit()
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length and content_length.isdigit() and int(content_length) > limit:
+            response = JSONResponse(status_code=413, content={"detail": _too_large(limit)})
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # Raised inside the form parser; FastAPI passes HTTPExceptions through
+                    raise HTTPException(status_code=413, detail=_too_large(limit))
+            return message
+
+        await self.app(scope, limited_receive, send)
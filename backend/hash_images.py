@@ -0,0 +1,25 @@
+"""
+Compute the perceptual image hash (near-duplicate detection) of invoices stored
+before image_hash existed
+Run this with: python hash_images.py [--chunk-size 500]
+Safe to re-run: only invoices without a hash are read.
+"""
+import argparse
+
+from app.services.image_hash_service import BACKFILL_CHUNK_SIZE, backfill_image_hashes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hash the stored files of invoices that have no image hash")
+    parser.add_argument("--chunk-size", type=int, default=BACKFILL_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    hashed, checked = backfill_image_hashes(args.chunk_size)
+    print(f"✅ Hashed {hashed} of {checked} invoice files (missing or unreadable files are skipped)")
+    if hashed:
+        # Running API workers index new ids only; older ones are picked up on restart
+        print("Restart the API so running workers index the new hashes")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,24 @@
+import asyncio
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from sqlalchemy import text
 
 from app.routers import auth_router, project_router, invoice_router, fraud_router, user_router
-from app.config.database import Base, engine, SessionLocal
+from app.config.database import SessionLocal, dispose_async_engines, get_pool_stats
+from app.config.settings import settings
+from app.migrations.runner import run_migrations
 from app.models.user_model import User
-from app.utils.hashing import hash_password
+from app.ocr.engine import bootstrap_engine, get_engine_state
+from app.ocr.executor import is_ocr_saturated, shutdown_ocr_pool
+from app.services.ingestion_service import watch_ingestion_jobs
+from app.utils.hashing import hash_password, shutdown_hash_pool
+from app.utils.upload_limit import MULTIPART_OVERHEAD_BYTES, UploadLimitMiddleware
 
-# Create tables
-Base.metadata.create_all(bind=engine)
+# Bring the schema up to date (tables, columns and indexes)
+if settings.AUTO_MIGRATE:
+    run_migrations()
 
 app = FastAPI(title="AI-Based Panchayat Fund Utilization Tracker API")
 
@@ -48,6 +59,51 @@ def seed_default_users():
     finally:
         db.close()
 
+@app.on_event("startup")
+def bootstrap_ocr_engine():
+    """Detect Tesseract once so uploads don't probe it per request"""
+    bootstrap_engine()
+
+
+@app.on_event("startup")
+async def start_ingestion_job_watcher():
+    """Heartbeat this worker's async upload jobs and fail those of workers that died"""
+    app.state.job_watcher = asyncio.create_task(watch_ingestion_jobs())
+
+
+@app.on_event("shutdown")
+def stop_ingestion_job_watcher():
+    """Stop heartbeating; other workers recover this one's unfinished jobs"""
+    app.state.job_watcher.cancel()
+
+
+@app.on_event("shutdown")
+def stop_ocr_workers():
+    """Stop the OCR worker processes"""
+    shutdown_ocr_pool()
+
+
+@app.on_event("shutdown")
+async def close_async_database():
+    """Close the async engines' pooled connections"""
+    await dispose_async_engines()
+
+
+@app.on_event("shutdown")
+def stop_hash_workers():
+    """Stop the password hashing threads"""
+    shutdown_hash_pool()
+
+# Upload size limits, enforced before the form parser spools the body to disk
+# (added before CORS so that its 413s still carry CORS headers)
+app.add_middleware(
+    UploadLimitMiddleware,
+    limits={
+        "/invoices/": lambda: settings.MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES,
+        "/invoices/batch": lambda: settings.MAX_BATCH_UPLOAD_BYTES,
+    },
+)
+
 # CORS (open for dev; restrict in prod)
 app.add_middleware(
     CORSMiddleware,
@@ -55,6 +111,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Let browser clients read the GET /invoices page cursor
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Routers
@@ -68,3 +126,38 @@ app.include_router(user_router.router, prefix="/users", tags=["Users"])
 @app.get("/")
 def root():
     return {"message": "Fund Tracker Backend is running 🚀"}
+
+
+@app.get("/health")
+def health():
+    """Liveness probe: the process is up"""
+    return {"status": "ok"}
+
+
+@app.get("/ready")
+def ready():
+    """Readiness probe: database reachable and OCR engine detected"""
+    database_ok = True
+    db = SessionLocal()
+    try:
+        db.execute(text("SELECT 1"))
+    except Exception:
+        database_ok = False
+    finally:
+        db.close()
+
+    engine_state = get_engine_state()
+    body = {
+        "status": "ready" if database_ok and engine_state["available"] else "unavailable",
+        "database": database_ok,
+        "database_pool": get_pool_stats(),
+        "ocr": {
+            "available": engine_state["available"],
+            "backend": engine_state["backend"],
+            "version": engine_state["version"],
+            "languages": engine_state["languages"],
+            "error": engine_state["error"],
+            "queue_full": is_ocr_saturated(),
+        },
+    }
+    return JSONResponse(status_code=200 if body["status"] == "ready" else 503, content=body)
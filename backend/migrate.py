@@ -0,0 +1,28 @@
+"""
+Bring the database schema up to date (app/migrations/versions, applied in order)
+Run this with: python migrate.py          (apply pending migrations)
+               python migrate.py --status (list applied and pending migrations)
+"""
+import argparse
+
+from app.migrations.runner import applied_versions, load_migrations, run_migrations
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply pending schema migrations")
+    parser.add_argument("--status", action="store_true", help="list migrations without applying them")
+    args = parser.parse_args()
+
+    if args.status:
+        applied = applied_versions()
+        for migration in load_migrations():
+            version = migration.__name__.rsplit(".", 1)[-1]
+            print(f"{'✓' if version in applied else ' '} {version}")
+        return
+
+    applied = run_migrations()
+    print(f"✅ {len(applied)} migration(s) applied" if applied else "✅ Database schema is up to date")
+
+
+if __name__ == "__main__":
+    main()
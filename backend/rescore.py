@@ -0,0 +1,50 @@
+"""
+Re-score invoices with the current verification thresholds and risk model
+Run this with: python rescore.py [--status pending] [--project-id 3] [--dry-run]
+Resume an interrupted run with: python rescore.py --resume <run_id>
+"""
+import argparse
+from datetime import datetime
+
+from app.services.rescore_service import DEFAULT_CHUNK_SIZE, run_rescore, start_rescore
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-score stored invoices in chunks")
+    parser.add_argument("--resume", metavar="RUN_ID", help="continue a previous run from its checkpoint")
+    parser.add_argument("--status")
+    parser.add_argument("--project-id", type=int)
+    parser.add_argument("--vendor")
+    parser.add_argument("--min-risk", type=int)
+    parser.add_argument("--max-risk", type=int)
+    parser.add_argument("--date-from", type=datetime.fromisoformat)
+    parser.add_argument("--date-to", type=datetime.fromisoformat)
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--dry-run", action="store_true", help="write the diff report without updating invoices")
+    args = parser.parse_args()
+
+    if args.resume:
+        run_id = args.resume
+    else:
+        filters = {
+            "status": args.status,
+            "project_id": args.project_id,
+            "vendor": args.vendor,
+            "min_risk": args.min_risk,
+            "max_risk": args.max_risk,
+            "date_from": args.date_from,
+            "date_to": args.date_to,
+        }
+        run_id = start_rescore(filters, args.chunk_size, args.dry_run)["run_id"]
+        print(f"Started re-scoring run {run_id}")
+
+    checkpoint = run_rescore(run_id)
+    print(
+        f"✅ {checkpoint['processed']} invoices processed, {checkpoint['updated']} updated, "
+        f"{checkpoint['level_changes']} risk level changes, {checkpoint['skipped']} skipped"
+    )
+    print(f"Diff report: {checkpoint['report']}")
+
+
+if __name__ == "__main__":
+    main()
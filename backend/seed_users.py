@@ -3,12 +3,13 @@ Seed script to create default users
 Run this with: python seed_users.py
 """
 from sqlalchemy.orm import Session
-from app.config.database import SessionLocal, engine, Base
+from app.config.database import SessionLocal
+from app.migrations.runner import run_migrations
 from app.models.user_model import User
 from app.utils.hashing import hash_password
 
 # Create tables if they don't exist
-Base.metadata.create_all(bind=engine)
+run_migrations()
 
 def seed_default_users():
     db: Session = SessionLocal()
@@ -0,0 +1,72 @@
+"""
+The cached fraud summary reflects this process's invoice writes at once, even while the
+read replica lags behind. Run from the backend directory: python -m pytest tests
+"""
+import os
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("SECRET_KEY", "test")
+
+import pytest
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from app.migrations.runner import run_migrations
+from app.models.invoice_model import Invoice
+from app.services import fraud_service
+
+
+def _invoice(number: str) -> Invoice:
+    return Invoice(
+        project_id=1, invoice_number=number, vendor_name="Acme Traders", amount=100,
+        file_path="", status="pending", risk_level="low",
+    )
+
+
+@pytest.fixture
+def databases(tmp_path, monkeypatch):
+    """(primary, replica) session factories; the replica never catches up"""
+    engines = [create_engine(f"sqlite:///{tmp_path / name}") for name in ("primary.db", "replica.db")]
+    factories = []
+    for engine in engines:
+        run_migrations(engine)
+        factory = sessionmaker(bind=engine)
+        with factory() as db:
+            db.add(_invoice("INV-1"))
+            db.commit()
+        factories.append(factory)
+
+    monkeypatch.setattr(fraud_service, "SessionLocal", factories[0])
+    monkeypatch.setattr(fraud_service, "ReadSessionLocal", factories[1])
+    monkeypatch.setattr(fraud_service, "_summary_cache", {
+        "generation": 0, "built_generation": -1, "expires": 0.0, "value": None,
+    })
+    yield factories
+    for engine in engines:
+        engine.dispose()
+
+
+def test_summary_after_a_write_reads_the_primary(databases):
+    primary, _ = databases
+    assert fraud_service.get_fraud_summary()["total_invoices"] == 1
+
+    with primary() as db:
+        db.add(_invoice("INV-2"))
+        db.commit()
+
+    assert fraud_service.get_fraud_summary()["total_invoices"] == 2
+    assert fraud_service.get_cached_fraud_summary()["total_invoices"] == 2
+
+
+def test_summary_after_the_ttl_reads_the_replica(databases):
+    _, replica = databases
+    fraud_service.get_fraud_summary()
+
+    # Another worker's write, arriving through replication rather than this process
+    with replica.kw["bind"].begin() as connection:
+        connection.execute(insert(Invoice).values(
+            project_id=1, invoice_number="INV-3", vendor_name="Acme Traders", amount=100, file_path="",
+        ))
+    fraud_service._summary_cache["expires"] = 0.0
+
+    assert fraud_service.get_fraud_summary()["total_invoices"] == 2
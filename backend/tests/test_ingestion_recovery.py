@@ -0,0 +1,89 @@
+"""
+Recovery of async upload jobs whose worker died, racing the workers still running jobs.
+Run from the backend directory: python -m pytest tests
+"""
+import os
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("SECRET_KEY", "test")
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app.migrations.runner import run_migrations
+from app.models.invoice_job_model import InvoiceJob
+from app.models.invoice_model import Invoice
+from app.schemas.invoice_schema import InvoiceCreate
+from app.services.ingestion_service import fail_stale_jobs, touch_owned_jobs
+from app.services.invoice_service import (
+    JobFinished,
+    complete_invoice_job,
+    create_invoice_job,
+    fail_invoice_job,
+    update_invoice_job,
+)
+
+LONG_AGO = datetime.utcnow() - timedelta(hours=2)
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}")
+    run_migrations(engine)
+    with Session(engine) as session:
+        yield session
+    engine.dispose()
+
+
+def _job(db, owner=None, heartbeat_at=None) -> str:
+    """A job waiting for OCR since long ago; owner=None keeps this process as its owner"""
+    payload = InvoiceCreate(project_id=1, invoice_number="INV-1", vendor_name="Acme Traders", amount=100)
+    job = create_invoice_job(db, "uploads/invoices/scan.png", payload)
+    update_invoice_job(db, job.id, "ocr", 10)
+    job = db.get(InvoiceJob, job.id)
+    job.updated_at = LONG_AGO
+    if owner:
+        job.owner = owner
+        job.heartbeat_at = heartbeat_at
+    db.commit()
+    return job.id
+
+
+def test_jobs_of_live_workers_are_not_failed(db):
+    own = _job(db)
+    other = _job(db, owner="other-host:1:alive", heartbeat_at=datetime.utcnow())
+    touch_owned_jobs(db)
+
+    assert fail_stale_jobs(db) == 0
+    assert {job.stage for job in db.query(InvoiceJob).filter(InvoiceJob.id.in_([own, other]))} == {"ocr"}
+
+
+def test_completion_does_not_overwrite_a_recovered_job(db):
+    job_id = _job(db, owner="other-host:1:dead", heartbeat_at=LONG_AGO)
+
+    assert fail_stale_jobs(db) == 1
+    # The owner turns out to be alive after all and finishes OCR
+    with pytest.raises(JobFinished):
+        complete_invoice_job(db, job_id, {"extracted_fields": {}})
+
+    job = db.get(InvoiceJob, job_id)
+    invoice = db.get(Invoice, job.invoice_id)
+    assert (job.stage, job.result) == ("failed", None)
+    assert invoice.status == "pending"
+    assert invoice.admin_notes.startswith("Automatic processing failed")
+
+
+def test_recovery_does_not_fail_a_completed_job(db):
+    job_id = _job(db, owner="other-host:1:dead", heartbeat_at=LONG_AGO)
+    # Completed between the recovery query and its update
+    job = db.get(InvoiceJob, job_id)
+    job.stage = "completed"
+    db.get(Invoice, job.invoice_id).status = "approved"
+    db.commit()
+
+    job = fail_invoice_job(db, job_id, "Processing was interrupted: its worker stopped")
+    assert (job.stage, job.error) == ("completed", None)
+    assert db.get(Invoice, job.invoice_id).status == "approved"
@@ -0,0 +1,75 @@
+"""
+Keyset pagination of GET /invoices over a migrated database that still holds
+legacy rows (created_at stored without microseconds, many in the same second).
+Run from the backend directory: python -m pytest tests
+"""
+import os
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("SECRET_KEY", "test")
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+from app.migrations.runner import run_migrations
+from app.services.invoice_service import list_invoices
+
+LEGACY_ROWS = 16
+NEW_ROWS = 8
+
+INSERT_INVOICE = text(
+    "INSERT INTO invoices (project_id, invoice_number, vendor_name, amount, file_path, status, created_at) "
+    "VALUES (1, :number, 'Acme Traders', 100, '', 'pending', :created_at)"
+)
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'invoices.db'}")
+    with engine.begin() as connection:
+        # A pre-migration database, with created_at added by the old migrate scripts
+        connection.execute(text(
+            "CREATE TABLE invoices (id INTEGER NOT NULL PRIMARY KEY, project_id INTEGER NOT NULL, "
+            "invoice_number VARCHAR NOT NULL, vendor_name VARCHAR NOT NULL, amount NUMERIC NOT NULL, "
+            "risk_score INTEGER, risk_level VARCHAR, file_path VARCHAR NOT NULL, "
+            "status TEXT DEFAULT 'pending', created_at TIMESTAMP)"
+        ))
+        connection.execute(INSERT_INVOICE, [
+            {"number": f"INV-{index}", "created_at": f"2025-11-29 05:01:{25 + index // 8:02d}"}
+            for index in range(LEGACY_ROWS)
+        ])
+    run_migrations(engine)
+
+    with Session(engine) as session:
+        # Rows in the format the ORM writes, in the same minute as the legacy ones
+        session.execute(INSERT_INVOICE, [
+            {"number": f"NEW-{index}", "created_at": f"2025-11-29 05:01:{41 + index // 4:02d}.{index:06d}"}
+            for index in range(NEW_ROWS)
+        ])
+        session.commit()
+        yield session
+    engine.dispose()
+
+
+def _walk(db, limit, **filters):
+    """Invoice ids over every page; fails instead of looping when a cursor repeats pages"""
+    seen, cursor = [], None
+    for _ in range(LEGACY_ROWS + NEW_ROWS + 1):
+        invoices, cursor = list_invoices(db, cursor=cursor, limit=limit, **filters)
+        seen.extend(invoice.id for invoice in invoices)
+        if cursor is None:
+            return seen
+    pytest.fail(f"Pagination did not finish: {len(seen)} rows, {len(set(seen))} unique")
+
+
+@pytest.mark.parametrize("limit", [1, 3, 10, 50])
+def test_every_invoice_is_listed_exactly_once(db, limit):
+    seen = _walk(db, limit)
+    assert sorted(seen) == list(range(1, LEGACY_ROWS + NEW_ROWS + 1))
+    assert len(seen) == len(set(seen))
+
+
+def test_pages_are_newest_first(db):
+    seen = _walk(db, 5, status="pending")
+    assert seen == sorted(seen, reverse=True)
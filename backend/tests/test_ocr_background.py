@@ -0,0 +1,85 @@
+"""
+A running batch upload keeps to its own OCR slots: interactive uploads are not turned
+away with a 429 while it runs. Run from the backend directory: python -m pytest tests
+"""
+import os
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("SECRET_KEY", "test")
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.config.settings import settings
+from app.ocr import executor
+from app.services import batch_service
+
+BATCH_SIZE = 30
+OCR_SECONDS = 0.02
+
+
+def _fake_ocr(file_path: str) -> dict:
+    time.sleep(OCR_SECONDS)
+    return {"ocr_status": "failed", "ocr_fields": {}, "ocr_table": []}
+
+
+@pytest.fixture
+def ocr_pool(monkeypatch):
+    pool = ThreadPoolExecutor(max_workers=2)
+    monkeypatch.setattr(executor, "get_ocr_pool", lambda: pool)
+    monkeypatch.setattr(executor, "process_invoice_ocr", _fake_ocr)
+    monkeypatch.setattr(executor, "_slots", None)
+    monkeypatch.setattr(executor, "_background_slots", None)
+    monkeypatch.setattr(settings, "OCR_CACHE_MAX_BYTES", 0)
+    monkeypatch.setattr(settings, "OCR_MAX_PENDING", 2)
+    monkeypatch.setattr(settings, "OCR_BACKGROUND_MAX_PENDING", 1)
+    monkeypatch.setattr(settings, "BATCH_MAX_IN_FLIGHT", 4)
+    yield pool
+    pool.shutdown()
+
+
+def _batch_items() -> list[dict]:
+    return [
+        {"index": index, "filename": f"scan-{index}.png", "payload": None, "error": None,
+         "file_path": f"scan-{index}.png", "file_hash": f"{index:064x}", "is_duplicate": False, "features": None}
+        for index in range(BATCH_SIZE)
+    ]
+
+
+def test_interactive_uploads_are_served_while_a_batch_runs(ocr_pool, monkeypatch):
+    in_flight = max_in_flight = 0
+    run_invoice_ocr = batch_service.run_invoice_ocr
+
+    async def counted_ocr(*args, **kwargs):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        try:
+            return await run_invoice_ocr(*args, **kwargs)
+        finally:
+            in_flight -= 1
+
+    monkeypatch.setattr(batch_service, "run_invoice_ocr", counted_ocr)
+
+    async def scenario():
+        lines = []
+
+        async def consume():
+            async for line in batch_service.stream_batch(_batch_items(), "admin", 1):
+                lines.append(line)
+
+        batch = asyncio.create_task(consume())
+        await asyncio.sleep(OCR_SECONDS)
+        # Interactive uploads one after another, as the batch keeps going
+        for index in range(5):
+            await executor.run_invoice_ocr(f"upload-{index}.png", f"{index:063x}f")
+        assert not batch.done()
+        await batch
+        return lines
+
+    lines = asyncio.run(scenario())
+    assert len(lines) == BATCH_SIZE + 1
+    assert max_in_flight <= settings.BATCH_MAX_IN_FLIGHT
@@ -0,0 +1,55 @@
+"""
+OCR result cache shared by workers running two engine versions (a rolling upgrade).
+Run from the backend directory: python -m pytest tests
+"""
+import os
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("SECRET_KEY", "test")
+
+import json
+
+import pytest
+
+from app.config.settings import settings
+from app.ocr.cache import get_cached_ocr, store_cached_ocr
+
+OLD_VERSION = "tesseract 5.3:eng"
+NEW_VERSION = "tesseract 5.4:eng"
+
+
+def _output(invoice_number: str) -> dict:
+    return {"ocr_fields": {"invoice_number": invoice_number}, "ocr_table": [], "ocr_status": "ok"}
+
+
+def _size(invoice_number: str) -> int:
+    output = _output(invoice_number)
+    return len(json.dumps({**output, "image_hash": None}))
+
+
+@pytest.fixture(autouse=True)
+def cache_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "OCR_CACHE_PATH", str(tmp_path / "ocr_cache.db"))
+    monkeypatch.setattr(settings, "OCR_CACHE_MAX_BYTES", 1024 * 1024)
+
+
+def test_versions_do_not_evict_each_other():
+    store_cached_ocr("a" * 64, OLD_VERSION, _output("OLD-1"))
+    store_cached_ocr("a" * 64, NEW_VERSION, _output("NEW-1"))
+    store_cached_ocr("b" * 64, OLD_VERSION, _output("OLD-2"))
+
+    assert get_cached_ocr("a" * 64, OLD_VERSION)["ocr_fields"]["invoice_number"] == "OLD-1"
+    assert get_cached_ocr("a" * 64, NEW_VERSION)["ocr_fields"]["invoice_number"] == "NEW-1"
+    assert get_cached_ocr("b" * 64, NEW_VERSION) is None
+
+
+def test_unused_versions_age_out_least_recently_used_first(monkeypatch):
+    monkeypatch.setattr(settings, "OCR_CACHE_MAX_BYTES", 2 * _size("INV-0"))
+    store_cached_ocr("a" * 64, OLD_VERSION, _output("INV-0"))
+    store_cached_ocr("b" * 64, NEW_VERSION, _output("INV-1"))
+    get_cached_ocr("a" * 64, OLD_VERSION)
+    store_cached_ocr("c" * 64, NEW_VERSION, _output("INV-2"))
+
+    assert get_cached_ocr("a" * 64, OLD_VERSION) is not None
+    assert get_cached_ocr("b" * 64, NEW_VERSION) is None
+    assert get_cached_ocr("c" * 64, NEW_VERSION) is not None